@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Dict, Generic, List
+from typing import Callable, Dict, Generic, List, Optional
 from problem import HeuristicFunction, Problem, S, A, Solution
+from search_stats import SearchStats
 
 # This is an abstract class for all goal based agents
 class GoalBasedAgent(ABC, Generic[S, A]):
@@ -22,17 +23,22 @@ class HumanAgent(GoalBasedAgent[S, A]):
         return self.user_input_fn(problem, state)
 
 # This agent applies an uninformed search algorithm to find the solution to goal for the given state
+# If "stats" is given, it is passed to the search function to accumulate the statistics of every search done by the agent
 class UninformedSearchAgent(GoalBasedAgent[S, A]):
-    def __init__(self, search_fn: Callable[[Problem[S, A], S], Solution]) -> None:
+    def __init__(self, search_fn: Callable[[Problem[S, A], S], Solution], stats: Optional[SearchStats] = None) -> None:
         super().__init__()
         self.search_fn = search_fn
+        self.stats = stats
         # The policy will store the action to do for each state so as not to search again after each observation
         self.policy: Dict[S, A] = {}
     
     def act(self, problem: Problem[S, A], state: S) -> A:
         # This state is not stored in the policy, we need to search for a solution 
         if state not in self.policy:
-            solution = self.search_fn(problem, state)
+            if self.stats is None:
+                solution = self.search_fn(problem, state)
+            else:
+                solution = self.search_fn(problem, state, stats=self.stats)
             # if no solution was found, we return None
             if solution is None:
                 self.policy[state] = None
@@ -45,18 +51,24 @@ class UninformedSearchAgent(GoalBasedAgent[S, A]):
         return self.policy.get(state)
 
 # This agent applies an informed search algorithm to find the solution to goal for the given state
+# If "stats" is given, it is passed to the search function to accumulate the statistics of every search done by the agent
 class InformedSearchAgent(GoalBasedAgent[S, A]):
-    def __init__(self, search_fn: Callable[[Problem[S, A], S, HeuristicFunction], Solution], heuristic: HeuristicFunction) -> None:
+    def __init__(self, search_fn: Callable[[Problem[S, A], S, HeuristicFunction], Solution], heuristic: HeuristicFunction,
+                 stats: Optional[SearchStats] = None) -> None:
         super().__init__()
         self.search_fn = search_fn
         self.heuristic = heuristic
+        self.stats = stats
         # The policy will store the action to do for each state so as not to search again after each observation
         self.policy: Dict[S, A] = {}
     
     def act(self, problem: Problem[S, A], state: S) -> A:
         # This state is not stored in the policy, we need to search for a solution 
         if state not in self.policy:
-            solution = self.search_fn(problem, state, self.heuristic)
+            if self.stats is None:
+                solution = self.search_fn(problem, state, self.heuristic)
+            else:
+                solution = self.search_fn(problem, state, self.heuristic, stats=self.stats)
             # if no solution was found, we return None
             if solution is None:
                 self.policy[state] = None
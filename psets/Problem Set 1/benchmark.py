@@ -0,0 +1,715 @@
+from typing import Callable, List, Tuple
+from problem import Problem, S, A, Solution
+from problems import get_heuristic, load_problem, print_table, solution_cost
+from search_stats import SearchStats
+import argparse, glob, os, time
+
+# This file contains benchmarks for the search algorithms and problem formulations
+# Each benchmark is a sub-command, for example:
+#   python benchmark.py ucs parks/*.txt
+
+# Run a function "repeat" times and return its result with the best elapsed time (in seconds)
+def timed(fn: Callable, *args, repeat: int = 1) -> Tuple[object, float]:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+# Return the search function with the given name, informed search functions are bound to the heuristic
+def get_search_function(name: str, heuristic_name: str = "zero") -> Callable:
+    import search
+    functions = {
+        "bfs": search.BreadthFirstSearch,
+        "dfs": search.DepthFirstSearch,
+        "ucs": search.UniformCostSearch,
+        "astar": search.AStarSearch,
+        "gbfs": search.BestFirstSearch,
+    }
+    function = functions[name]
+    if name in ("astar", "gbfs"):
+        heuristic = get_heuristic(heuristic_name)
+        return lambda problem, state, **kwargs: function(problem, state, heuristic, **kwargs)
+    return function
+
+# Measure the peak memory (in bytes) allocated while running a function
+def peak_memory(fn: Callable, *args) -> int:
+    import tracemalloc
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+# Measure the time, expansion rate and peak memory of search algorithms
+# The peak memory is measured in a separate run since tracing the allocations slows down the search
+def benchmark_search(args: argparse.Namespace):
+    rows = []
+    for path in args.paths:
+        for name in args.algorithms:
+            search_fn = get_search_function(name, args.heuristic)
+            problem = load_problem(path)
+            initial_state = problem.get_initial_state()
+            # The time is measured without statistics, then the statistics are collected in another run
+            solution, elapsed = timed(search_fn, problem, initial_state)
+            stats = SearchStats()
+            search_fn(load_problem(path), initial_state, stats=stats)
+            memory = peak_memory(search_fn, load_problem(path), initial_state)
+            rows.append([
+                path,
+                name,
+                solution_cost(problem, initial_state, solution),
+                stats.expanded,
+                stats.generated,
+                stats.heuristic_calls,
+                stats.peak_frontier,
+                f"{elapsed:.4f}",
+                f"{stats.expanded / elapsed:.0f}",
+                f"{memory / 2**20:.2f}"
+            ])
+    print_table(["Problem", "Algorithm", "Cost", "Expanded", "Generated", "Heuristic", "Peak frontier",
+                 "Time (s)", "Nodes/s", "Peak (MiB)"], rows)
+
+# The uniform cost search as it was before the heap-based implementation
+# It is kept here as a reference: pop_frontier does a linear scan for every pop and improving a cost does another one
+def list_uniform_cost_search(problem: Problem[S, A], initial_state: S) -> Solution:
+    def pop_frontier(frontier):
+        i = 0
+        min_cost, min_state, curr_path = frontier[0]
+        for index, (cost, state, path) in enumerate(frontier):
+            if (min_cost > cost):
+                min_cost = cost
+                min_state = state
+                curr_path = path
+                i = index
+        del frontier[i]
+        return min_cost, min_state, curr_path
+
+    frontier = [(0, initial_state, [])]
+    visited = dict([(initial_state, 0)])
+    explored = set()
+    while frontier:
+        cost, state, path_taken = pop_frontier(frontier)
+        if problem.is_goal(state):
+            return path_taken
+        explored.add(state)
+        for action in problem.get_actions(state):
+            successor = problem.get_successor(state, action)
+            new_cost = cost + problem.get_cost(state, action)
+            if successor not in explored and successor not in visited:
+                visited[successor] = new_cost
+                frontier.append((new_cost, successor, path_taken + [action]))
+            elif successor in visited and new_cost < visited[successor]:
+                visited[successor] = new_cost
+                for index, (_, s, _) in enumerate(frontier):
+                    if s == successor:
+                        frontier[index] = (new_cost, successor, path_taken + [action])
+                        break
+    return None
+
+# Compare the heap-based UCS against the list-based one
+# Both must return the exact same solution since they expand the states in the same order
+def benchmark_ucs(args: argparse.Namespace):
+    from search import UniformCostSearch
+    rows = []
+    for path in args.paths:
+        problem = load_problem(path)
+        initial_state = problem.get_initial_state()
+        heap_solution, heap_time = timed(UniformCostSearch, problem, initial_state, repeat=args.repeat)
+        list_solution, list_time = timed(list_uniform_cost_search, problem, initial_state, repeat=args.repeat)
+        if heap_solution != list_solution:
+            print(f"ERROR: The solutions for '{path}' do not match")
+        rows.append([
+            path,
+            solution_cost(problem, initial_state, heap_solution),
+            f"{list_time:.4f}",
+            f"{heap_time:.4f}",
+            f"{list_time / heap_time:.2f}x"
+        ])
+    print_table(["Problem", "Cost", "List (s)", "Heap (s)", "Speedup"], rows)
+
+# Measure how HDA* scales with the number of workers compared to the sequential A*
+# The optimal cost must be the same for every number of workers
+def benchmark_hdastar(args: argparse.Namespace):
+    from search import AStarSearch
+    from hdastar import HashDistributedAStarSearch
+    heuristic = get_heuristic(args.heuristic)
+    rows = []
+    for path in args.paths:
+        problem = load_problem(path)
+        initial_state = problem.get_initial_state()
+        stats = SearchStats()
+        solution = AStarSearch(problem, initial_state, heuristic, stats=stats)
+        sequential_cost = solution_cost(problem, initial_state, solution)
+        sequential_time = stats.wall_time["total"]
+        rows.append([path, "A*", sequential_cost, stats.expanded, f"{sequential_time:.4f}", "1.00x"])
+        for workers in args.workers:
+            problem = load_problem(path)
+            stats = SearchStats()
+            solution = HashDistributedAStarSearch(problem, initial_state, heuristic, workers=workers, batch_size=args.batch_size, stats=stats)
+            cost = solution_cost(problem, initial_state, solution)
+            if cost != sequential_cost:
+                print(f"ERROR: HDA* with {workers} workers found a solution with cost {cost} instead of {sequential_cost} for '{path}'")
+            elapsed = stats.wall_time["total"]
+            rows.append([path, f"HDA* ({workers})", cost, stats.expanded, f"{elapsed:.4f}", f"{sequential_time / elapsed:.2f}x"])
+    print(f"CPU cores: {os.cpu_count()}")
+    print_table(["Problem", "Algorithm", "Cost", "Expanded", "Time (s)", "Speedup"], rows)
+
+# Measure the latency and throughput of the asyncio search service on random queries (routing queries for graphs)
+# Each query is drawn from a set of "unique" distinct queries, so concurrent duplicates are answered by a single search
+# The baseline solves every query one after the other with blocking calls in the current process
+def benchmark_service(args: argparse.Namespace):
+    import asyncio, random
+    from search_service import LocalClient, SearchRequest, SearchService, solve_request
+    from graph import GraphRoutingProblem
+    rng = random.Random(args.seed)
+    distinct = []
+    for _ in range(args.unique):
+        path = rng.choice(args.paths)
+        problem = load_problem(path)
+        if isinstance(problem, GraphRoutingProblem):
+            names = sorted(node.name for node in problem.adjacency)
+            distinct.append(SearchRequest(path, rng.choice(names), rng.choice(names), args.algorithm))
+        else:
+            # Other problems have a single query per file
+            distinct.append(SearchRequest(path, algorithm=args.algorithm))
+    requests = [rng.choice(distinct) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    for request in requests:
+        solve_request(request)
+    baseline_time = time.perf_counter() - start
+
+    async def run_clients(workers: int):
+        async with SearchService(workers, args.batch_size) as service:
+            clients = [LocalClient(service) for _ in range(args.concurrency)]
+            async def run_client(client: LocalClient, queries: List[SearchRequest]):
+                for request in queries:
+                    response = await client.send(request)
+                    if response.status == "failed":
+                        print(response.error)
+            start = time.perf_counter()
+            await asyncio.gather(*(run_client(client, requests[index::args.concurrency]) for index, client in enumerate(clients)))
+            elapsed = time.perf_counter() - start
+            latencies = sorted(latency for client in clients for latency in client.latencies)
+            return elapsed, latencies, service.searches, service.deduplicated
+
+    percentile = lambda values, p: values[min(len(values) - 1, int(p * len(values)))]
+    rows = [["blocking", "-", f"{baseline_time:.3f}", f"{len(requests) / baseline_time:.0f}", "-", "-", "-", len(requests), 0]]
+    for workers in args.workers:
+        elapsed, latencies, searches, deduplicated = asyncio.run(run_clients(workers))
+        rows.append([
+            "service", workers, f"{elapsed:.3f}", f"{len(requests) / elapsed:.0f}",
+            f"{1000 * percentile(latencies, 0.5):.2f}", f"{1000 * percentile(latencies, 0.95):.2f}", f"{1000 * latencies[-1]:.2f}",
+            searches, deduplicated
+        ])
+    print(f"{len(requests)} queries ({args.unique} distinct) from {args.concurrency} concurrent clients on {os.cpu_count()} CPU cores")
+    print_table(["Mode", "Workers", "Time (s)", "Queries/s", "p50 (ms)", "p95 (ms)", "Max (ms)", "Searches", "Deduplicated"], rows)
+
+# Compare the Point-based SokobanProblem against the compact SokobanBitboardProblem
+# Both must return the exact same solution since they have the same actions in the same order
+def benchmark_sokoban(args: argparse.Namespace):
+    from sokoban import SokobanProblem, SokobanBitboardProblem
+    rows = []
+    for path in args.paths:
+        for name in args.algorithms:
+            search_fn = get_search_function(name)
+            results = []
+            for problem in (SokobanProblem.from_file(path), SokobanBitboardProblem.from_file(path)):
+                stats = SearchStats()
+                solution = search_fn(problem, problem.get_initial_state(), stats=stats)
+                results.append((solution, stats.expanded, stats.wall_time["total"]))
+            (point_solution, expanded, point_time), (bitboard_solution, _, bitboard_time) = results
+            if point_solution != bitboard_solution:
+                print(f"ERROR: The solutions of {name} for '{path}' do not match")
+            rows.append([
+                path, name, len(point_solution) if point_solution is not None else None, expanded,
+                f"{expanded / point_time:.0f}", f"{expanded / bitboard_time:.0f}", f"{point_time / bitboard_time:.2f}x"
+            ])
+    print_table(["Problem", "Algorithm", "Cost", "Expanded", "Point (nodes/s)", "Bitboard (nodes/s)", "Speedup"], rows)
+
+# Compare the Point-based ParkingProblem against the compact CompactParkingProblem
+# Both must return the exact same solution since they have the same actions in the same order
+def benchmark_parking(args: argparse.Namespace):
+    from parking import ParkingProblem, CompactParkingProblem
+    rows = []
+    for path in args.paths:
+        for name in args.algorithms:
+            search_fn = get_search_function(name)
+            results = []
+            for problem in (ParkingProblem.from_file(path), CompactParkingProblem.from_file(path)):
+                stats = SearchStats()
+                solution = search_fn(problem, problem.get_initial_state(), stats=stats)
+                _, elapsed = timed(search_fn, problem, problem.get_initial_state(), repeat=args.repeat)
+                results.append((solution, stats.expanded, elapsed))
+            (point_solution, expanded, point_time), (compact_solution, _, compact_time) = results
+            if point_solution != compact_solution:
+                print(f"ERROR: The solutions of {name} for '{path}' do not match")
+            problem = ParkingProblem.from_file(path)
+            rows.append([
+                path, name, solution_cost(problem, problem.get_initial_state(), point_solution), expanded,
+                f"{expanded / point_time:.0f}", f"{expanded / compact_time:.0f}", f"{point_time / compact_time:.2f}x"
+            ])
+    print_table(["Problem", "Algorithm", "Cost", "Expanded", "Point (nodes/s)", "Compact (nodes/s)", "Speedup"], rows)
+
+# Compare the parking heuristics with A* against UCS (which is A* with a zero heuristic) on the compact parking problem
+# With "--check", the searches run on ParkingProblem where every successor is checked for the consistency of the heuristic
+def benchmark_parking_heuristic(args: argparse.Namespace):
+    from parking import ParkingProblem, CompactParkingProblem
+    from search import AStarSearch
+    rows = []
+    for path in args.paths:
+        results = []
+        for name in args.heuristics:
+            heuristic = get_heuristic(name)
+            problem = CompactParkingProblem.from_file(path)
+            stats = SearchStats()
+            solution = AStarSearch(problem, problem.get_initial_state(), heuristic, stats=stats)
+            _, elapsed = timed(AStarSearch, problem, problem.get_initial_state(), heuristic, repeat=args.repeat)
+            if args.check:
+                from helpers.heuristic_checks import test_heuristic_consistency
+                get_successor = ParkingProblem.get_successor
+                ParkingProblem.get_successor = test_heuristic_consistency(heuristic)(get_successor)
+                try:
+                    checked_problem = ParkingProblem.from_file(path)
+                    AStarSearch(checked_problem, checked_problem.get_initial_state(), heuristic)
+                finally:
+                    ParkingProblem.get_successor = get_successor
+            cost = solution_cost(problem, problem.get_initial_state(), solution)
+            results.append((name, cost, stats, elapsed))
+        _, base_cost, base_stats, base_time = results[0]
+        for name, cost, stats, elapsed in results:
+            if cost != base_cost:
+                print(f"ERROR: The cost of '{path}' with the {name} heuristic is {cost} instead of {base_cost}")
+            rows.append([path, name, cost, stats.expanded, f"{base_stats.expanded / max(stats.expanded, 1):.2f}x",
+                         stats.heuristic_calls, f"{elapsed:.4f}", f"{base_time / elapsed:.2f}x"])
+    print_table(["Problem", "Heuristic", "Cost", "Expanded", "Reduction", "Heuristic calls", "Time (s)", "Speedup"], rows)
+
+# Compare the conflict-based search against the uniform cost search over the joint states of the cars
+# Both run on CompactParkingProblem with a time limit per lot (CBS takes minutes on lots where the cars block each other, such as park5)
+# The expansions of CBS are the nodes of its constraint trees
+def benchmark_cbs(args: argparse.Namespace):
+    from parking import CompactParkingProblem
+    from parking_cbs import conflict_based_steps
+    from search import uniform_cost_steps
+    from search_stepper import SearchStepper
+    rows = []
+    for path in args.paths:
+        problem = CompactParkingProblem.from_file(path)
+        initial_state = problem.get_initial_state()
+        results = []
+        for steps_fn in (uniform_cost_steps, conflict_based_steps):
+            stats = SearchStats()
+            stepper = SearchStepper(steps_fn(problem, initial_state, stats=stats), stats)
+            done = stepper.run(timeout=args.time_limit)
+            cost = solution_cost(problem, initial_state, stepper.solution) if done else "timeout"
+            results.append((cost, stats.expanded, stats.wall_time["total"]))
+        (ucs_cost, ucs_expanded, ucs_time), (cbs_cost, cbs_expanded, cbs_time) = results
+        if isinstance(ucs_cost, (int, float)) and isinstance(cbs_cost, (int, float)) and ucs_cost != cbs_cost:
+            print(f"ERROR: The cost of CBS for '{path}' is {cbs_cost} instead of {ucs_cost}")
+        rows.append([path, len(initial_state.cars), ucs_cost, ucs_expanded, f"{ucs_time:.3f}", cbs_cost, cbs_expanded, f"{cbs_time:.3f}"])
+    print_table(["Problem", "Cars", "UCS cost", "UCS expanded", "UCS (s)", "CBS cost", "CBS nodes", "CBS (s)"], rows)
+
+# Compare UCS and A* (with the parking heuristic) with and without the partial-order reduction of parking_reduction.py
+# The reduced searches expand every state once like the plain ones, so the gain is in the generated (duplicate) successors
+def benchmark_reduction(args: argparse.Namespace):
+    from parking import CompactParkingProblem
+    from parking_heuristic import parking_heuristic
+    from parking_reduction import reduced_astar_steps
+    from search import astar_steps
+    from search_stepper import SearchStepper
+    zero = lambda *_: 0
+    rows = []
+    for path in args.paths:
+        problem = CompactParkingProblem.from_file(path)
+        initial_state = problem.get_initial_state()
+        for name, heuristic in (("ucs", zero), ("astar", parking_heuristic)):
+            results = []
+            for steps_fn in (astar_steps, reduced_astar_steps):
+                stats = SearchStats()
+                stepper = SearchStepper(steps_fn(problem, initial_state, heuristic, stats=stats), stats)
+                done = stepper.run(timeout=args.time_limit)
+                cost = solution_cost(problem, initial_state, stepper.solution) if done else "timeout"
+                results.append((cost, stats.expanded, stats.generated, stats.wall_time["total"]))
+            (cost, expanded, generated, elapsed), (reduced_cost, reduced_expanded, reduced_generated, reduced_time) = results
+            if "timeout" not in (cost, reduced_cost) and cost != reduced_cost:
+                print(f"ERROR: The cost of the reduced {name} for '{path}' is {reduced_cost} instead of {cost}")
+            rows.append([path, name, cost, expanded, reduced_expanded, generated, reduced_generated,
+                         f"{generated / max(reduced_generated, 1):.2f}x", f"{elapsed:.3f}", f"{reduced_time:.3f}"])
+    print_table(["Problem", "Algorithm", "Cost", "Expanded", "Reduced expanded", "Generated", "Reduced generated",
+                 "Reduction", "Time (s)", "Reduced (s)"], rows)
+
+# Measure how the parking searches scale on random lots (see parking_generator.py)
+# Every combination of size, density and number of cars is generated with "--lots" seeds and solved by every algorithm
+# on CompactParkingProblem with a time limit. The peak memory is measured in a second run with tracemalloc
+# which stops after the same number of expansions (since tracing the allocations slows down the search)
+def benchmark_parking_scaling(args: argparse.Namespace):
+    import csv, itertools, tracemalloc
+    from parking import CompactParkingProblem
+    from parking_cbs import conflict_based_steps
+    from parking_generator import generate_lot
+    from search_stepper import SearchStepper
+    def create_stepper(name: str, problem: CompactParkingProblem, stats: SearchStats = None) -> SearchStepper:
+        if name == "cbs":
+            return SearchStepper(conflict_based_steps(problem, problem.get_initial_state(), stats=stats), stats)
+        heuristic = get_heuristic(args.heuristic) if name in ("astar", "gbfs", "idastar", "wastar") else None
+        return SearchStepper.create(name, problem, problem.get_initial_state(), heuristic, stats=stats)
+    header = ["Size", "Density", "Cars", "Seed", "Algorithm", "Status", "Cost", "Expanded", "Time (s)", "Nodes/s", "Peak (MiB)"]
+    rows = []
+    for size, density, car_count in itertools.product(args.sizes, args.densities, args.cars):
+        width, height = (int(value) for value in size.split('x'))
+        for seed in range(args.seed, args.seed + args.lots):
+            try:
+                text = generate_lot(width, height, density, car_count, seed)
+            except ValueError as error:
+                print(f"Skipping {size} lot with density {density} and {car_count} cars: {error}")
+                break
+            for name in args.algorithms:
+                problem = CompactParkingProblem.from_text(text)
+                stats = SearchStats()
+                stepper = create_stepper(name, problem, stats)
+                done = stepper.run(timeout=args.time_limit)
+                elapsed = stats.wall_time["total"]
+                tracemalloc.start()
+                try:
+                    create_stepper(name, CompactParkingProblem.from_text(text)).run(max_expansions=None if done else stepper.expanded)
+                    _, peak = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+                status = "timeout" if not done else "unsolvable" if stepper.solution is None else "solved"
+                cost = solution_cost(problem, problem.get_initial_state(), stepper.solution) if done else None
+                rows.append([size, density, car_count, seed, name, status, cost, stats.expanded, f"{elapsed:.3f}",
+                             f"{stats.expanded / max(elapsed, 1e-9):.0f}", f"{peak / 2**20:.2f}"])
+                print(' '.join(str(cell) for cell in rows[-1]), flush=True)
+    print()
+    print_table(header, rows)
+    if args.output:
+        with open(args.output, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+# Compare searching over player steps (SokobanProblem) against searching over crate pushes (SokobanPushProblem)
+# The push solutions are expanded back into moves and checked by playing them in SokobanProblem
+def benchmark_pushes(args: argparse.Namespace):
+    import search
+    from sokoban import SokobanProblem
+    from sokoban_push import push_search
+    functions = {"bfs": search.BreadthFirstSearch, "ucs": search.UniformCostSearch, "astar": search.AStarSearch, "gbfs": search.BestFirstSearch}
+    rows = []
+    for path in args.paths:
+        for name in args.algorithms:
+            search_fn = functions[name]
+            # The heuristic is passed to push_search (instead of being bound to the search function) so that it adapts it to the push states
+            heuristic_args = (get_heuristic(args.heuristic),) if name in ("astar", "gbfs") else ()
+            problem = SokobanProblem.from_file(path)
+            initial_state = problem.get_initial_state()
+            step_stats, push_stats = SearchStats(), SearchStats()
+            step_solution = search_fn(problem, initial_state, *heuristic_args, stats=step_stats)
+            push_solution = push_search(search_fn)(problem, initial_state, *heuristic_args, stats=push_stats)
+            state = initial_state
+            for action in push_solution or []:
+                state = problem.get_successor(state, action)
+            if push_solution is not None and not problem.is_goal(state):
+                print(f"ERROR: The push solution of {name} for '{path}' does not solve the level")
+            rows.append([
+                path, name, len(step_solution), len(push_solution), step_stats.expanded, push_stats.expanded,
+                f"{step_stats.expanded / push_stats.expanded:.0f}x",
+                f"{step_stats.wall_time['total']:.3f}", f"{push_stats.wall_time['total']:.3f}"
+            ])
+    print_table(["Problem", "Algorithm", "Moves (steps)", "Moves (pushes)", "Expanded (steps)", "Expanded (pushes)",
+                 "Reduction", "Time steps (s)", "Time pushes (s)"], rows)
+
+# Measure the cost of hashing states with their cached Zobrist hash compared to hashing their contents (as they were hashed before)
+# The states are the ones reached by a breadth first search, and the end-to-end time of a uniform cost search is reported too
+def benchmark_hashing(args: argparse.Namespace):
+    from sokoban import SokobanState
+    from search import UniformCostSearch
+    rows = []
+    for path in args.paths:
+        problem = load_problem(path)
+        initial_state = problem.get_initial_state()
+        states = [initial_state]
+        visited = {initial_state}
+        for state in states:
+            if len(states) >= args.states: break
+            for action in problem.get_actions(state):
+                successor = problem.get_successor(state, action)
+                if successor not in visited:
+                    visited.add(successor)
+                    states.append(successor)
+        if isinstance(initial_state, SokobanState):
+            # The generated hash of the dataclass before the Zobrist hash was added
+            content_hash = lambda state: hash((state.layout, state.player, state.crates))
+        else:
+            content_hash = tuple.__hash__
+        def hash_all(hash_fn):
+            for _ in range(args.repeat):
+                for state in states:
+                    hash_fn(state)
+        _, zobrist_time = timed(hash_all, hash, repeat=3)
+        _, content_time = timed(hash_all, content_hash, repeat=3)
+        count = args.repeat * len(states)
+        _, search_time = timed(lambda: UniformCostSearch(load_problem(path), initial_state), repeat=3)
+        rows.append([
+            path, len(states), f"{1e9 * content_time / count:.0f}", f"{1e9 * zobrist_time / count:.0f}",
+            f"{content_time / zobrist_time:.2f}x", f"{search_time:.4f}"
+        ])
+    print_table(["Problem", "States", "Content hash (ns)", "Zobrist hash (ns)", "Speedup", "UCS (s)"], rows)
+
+# Compare the deadlock analyses used by strong_heuristic with A*: the corners only (as the heuristic did before),
+# the dead squares, and the dead squares with the freeze and 2x2 block patterns
+# The push problem is solved with and without pruning the pushes that lead to a deadlock
+def benchmark_deadlocks(args: argparse.Namespace):
+    from search import AStarSearch
+    from sokoban import SokobanProblem
+    from sokoban_deadlocks import DeadlockAnalysis, corner_squares
+    from sokoban_heuristic import strong_heuristic
+    from sokoban_push import SokobanPushProblem
+    rows = []
+    for path in args.paths:
+        layout = SokobanProblem.from_file(path).layout
+        analyses = {
+            "corners": DeadlockAnalysis(layout, corner_squares(layout), patterns=False),
+            "dead squares": DeadlockAnalysis(layout, patterns=False),
+            "dead squares + patterns": DeadlockAnalysis(layout),
+        }
+        for name, analysis in analyses.items():
+            problem = SokobanProblem.from_file(path)
+            # The heuristic reads the analysis from the problem cache
+            problem.cache()["deadlocks"] = analysis
+            stats = SearchStats()
+            solution = AStarSearch(problem, problem.get_initial_state(), strong_heuristic, stats=stats)
+            rows.append([path, "steps", name, len(solution), stats.expanded, f"{stats.wall_time['total']:.3f}"])
+        for prune in (False, True):
+            problem = SokobanProblem.from_file(path)
+            push_problem = SokobanPushProblem(problem, prune_deadlocks=prune)
+            heuristic = push_problem.adapt_heuristic(strong_heuristic)
+            stats = SearchStats()
+            solution = AStarSearch(push_problem, push_problem.get_initial_state(), heuristic, stats=stats)
+            rows.append([path, "pushes", "pruned pushes" if prune else "no pruning", len(solution), stats.expanded,
+                         f"{stats.wall_time['total']:.3f}"])
+    print_table(["Problem", "Actions", "Deadlocks", "Cost", "Expanded", "Time (s)"], rows)
+
+# Measure the time to build the pattern database of each level (in an empty folder) and to load it again from its file,
+# then compare A* with the strong heuristic against the pattern heuristic over player steps and over crate pushes
+def benchmark_patterns(args: argparse.Namespace):
+    import tempfile
+    from search import AStarSearch
+    from sokoban import SokobanProblem
+    from sokoban_heuristic import strong_heuristic
+    from sokoban_pdb import PatternDatabase, pattern_heuristic
+    from sokoban_push import SokobanPushProblem
+    build_rows, search_rows = [], []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for path in args.paths:
+            layout = SokobanProblem.from_file(path).layout
+            PatternDatabase.loaded.clear()
+            database, build_time = timed(PatternDatabase.load, layout, cache_dir)
+            PatternDatabase.loaded.clear()
+            _, load_time = timed(PatternDatabase.load, layout, cache_dir)
+            build_rows.append([path, len(layout.cells), os.path.getsize(database.path), f"{build_time:.3f}", f"{1000 * load_time:.3f}"])
+            for actions in ("steps", "pushes"):
+                for name, heuristic in (("strong", strong_heuristic), ("pattern", pattern_heuristic)):
+                    problem = SokobanProblem.from_file(path)
+                    if actions == "pushes":
+                        problem = SokobanPushProblem(problem)
+                        heuristic = problem.adapt_heuristic(heuristic)
+                    stats = SearchStats()
+                    solution = AStarSearch(problem, problem.get_initial_state(), heuristic, stats=stats)
+                    search_rows.append([path, actions, name, len(solution), stats.expanded, f"{stats.wall_time['total']:.3f}"])
+    print_table(["Problem", "Cells", "File size (bytes)", "Build (s)", "Load (ms)"], build_rows)
+    print()
+    print_table(["Problem", "Actions", "Heuristic", "Cost", "Expanded", "Time (s)"], search_rows)
+
+# Measure the number of strong heuristic calls per second by crate count on generated open rooms,
+# and the matching alone with the Hungarian algorithm against enumerating the permutations
+# The crates and goals are placed on every other cell away from the walls, so no state is deadlocked
+def benchmark_matching(args: argparse.Namespace):
+    import random
+    from mathutils import Point
+    from sokoban import SokobanProblem, SokobanState
+    from sokoban_heuristic import crate_goal_matrix, hungarian, minimum_iteration, strong_heuristic
+    random.seed(args.seed)
+    size = 2 * args.room + 3
+    spots = [Point(x, y) for y in range(2, size - 2, 2) for x in range(2, size - 2, 2)]
+    rows = []
+    for count in args.crates:
+        goals = set(random.sample(spots, count))
+        lines = []
+        for y in range(size):
+            line = ''
+            for x in range(size):
+                if x in (0, size - 1) or y in (0, size - 1): line += '#'
+                elif (x, y) == (1, 1): line += '@'
+                elif Point(x, y) in goals: line += '.'
+                else: line += ' '
+            lines.append(line)
+        problem = SokobanProblem.from_text('\n'.join(lines))
+        player = problem.get_initial_state().player
+        states = [SokobanState(problem.layout, player, frozenset(random.sample(spots, count))) for _ in range(args.states)]
+        strong_heuristic(problem, states[0])
+        _, heuristic_time = timed(lambda: [strong_heuristic(problem, state) for state in states], repeat=3)
+        cell_indices = problem.layout.cell_indices
+        matrices = [crate_goal_matrix(problem, [cell_indices[crate] for crate in state.crates]) for state in states]
+        _, hungarian_time = timed(lambda: [hungarian(matrix) for matrix in matrices], repeat=3)
+        enumeration_rate = "-"
+        if count <= args.max_enumeration:
+            _, enumeration_time = timed(lambda: [minimum_iteration(matrix) for matrix in matrices])
+            enumeration_rate = f"{len(states) / enumeration_time:.0f}"
+        rows.append([count, f"{len(states) / heuristic_time:.0f}", f"{len(states) / hungarian_time:.0f}", enumeration_rate])
+    print_table(["Crates", "strong_heuristic (calls/s)", "Hungarian (calls/s)", "Permutations (calls/s)"], rows)
+
+# Compare A* with the strong heuristic computed from scratch against the incremental strong heuristic
+# Both have the same values so the searches must return the same solution after the same expansions
+def benchmark_incremental(args: argparse.Namespace):
+    from search import AStarSearch
+    from sokoban import SokobanProblem
+    from sokoban_heuristic import incremental_strong_heuristic, strong_heuristic
+    rows = []
+    for path in args.paths:
+        results = []
+        for heuristic in (strong_heuristic, incremental_strong_heuristic):
+            problem = SokobanProblem.from_file(path)
+            stats = SearchStats()
+            solution = AStarSearch(problem, problem.get_initial_state(), heuristic, stats=stats)
+            _, elapsed = timed(AStarSearch, problem, problem.get_initial_state(), heuristic, repeat=args.repeat)
+            results.append((solution, stats, elapsed))
+        (solution, stats, scratch_time), (incremental_solution, incremental_stats, incremental_time) = results
+        if solution != incremental_solution or stats.expanded != incremental_stats.expanded:
+            print(f"ERROR: The incremental heuristic changed the search of '{path}'")
+        rows.append([path, len(solution), stats.expanded, stats.heuristic_calls, f"{scratch_time:.3f}", f"{incremental_time:.3f}",
+                     f"{scratch_time / incremental_time:.2f}x"])
+    print_table(["Problem", "Cost", "Expanded", "Heuristic calls", "Scratch (s)", "Incremental (s)", "Speedup"], rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the search algorithms")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    ucs_parser = subparsers.add_parser("ucs", help="compare the heap-based UCS against the list-based UCS")
+    ucs_parser.add_argument("paths", nargs="*", default=sorted(glob.glob("parks/*.txt")) + ["levels/level1.txt", "levels/level2.txt"],
+                            help="paths to the problems to solve")
+    ucs_parser.add_argument("--repeat", "-r", type=int, default=3, help="the number of runs to take the best time from")
+    ucs_parser.set_defaults(run=benchmark_ucs)
+
+    search_parser = subparsers.add_parser("search", help="measure the time, expansion rate and peak memory of the search algorithms")
+    search_parser.add_argument("paths", nargs="*", default=["levels/level1.txt", "levels/level2.txt", "levels/level3.txt"],
+                               help="paths to the problems to solve")
+    search_parser.add_argument("--algorithms", "-a", nargs="+", default=["bfs", "dfs", "ucs", "astar", "gbfs"],
+                               choices=["bfs", "dfs", "ucs", "astar", "gbfs"], help="the search algorithms to run")
+    search_parser.add_argument("--heuristic", "-hf", default="zero", choices=["zero", "weak", "strong", "pattern", "graph"],
+                               help="the heuristic used by A* and Greedy Best First Search")
+    search_parser.set_defaults(run=benchmark_search)
+
+    hdastar_parser = subparsers.add_parser("hdastar", help="measure the scaling of HDA* with the number of workers")
+    hdastar_parser.add_argument("paths", nargs="*", default=["levels/level2.txt", "levels/level3.txt", "levels/level4.txt"],
+                                help="paths to the problems to solve")
+    hdastar_parser.add_argument("--workers", "-w", type=int, nargs="+", default=[1, 2, 4, 8], help="the numbers of workers to try")
+    hdastar_parser.add_argument("--batch-size", "-bs", type=int, default=256,
+                                help="the maximum number of nodes expanded by each worker per round")
+    hdastar_parser.add_argument("--heuristic", "-hf", default="strong", choices=["zero", "weak", "strong", "pattern", "graph"],
+                                help="the heuristic used by A* and HDA*")
+    hdastar_parser.set_defaults(run=benchmark_hdastar)
+
+    service_parser = subparsers.add_parser("service", help="measure the latency and throughput of the asyncio search service")
+    service_parser.add_argument("paths", nargs="*", default=sorted(glob.glob("graphs/*.json")), help="paths to the problems to query")
+    service_parser.add_argument("--queries", "-q", type=int, default=2000, help="the number of queries")
+    service_parser.add_argument("--unique", "-u", type=int, default=200, help="the number of distinct queries")
+    service_parser.add_argument("--concurrency", "-c", type=int, default=64, help="the number of concurrent clients")
+    service_parser.add_argument("--workers", "-w", type=int, nargs="+", default=[1, 2, 4], help="the numbers of worker processes to try")
+    service_parser.add_argument("--batch-size", "-bs", type=int, default=8, help="the maximum number of queries sent to a worker at once")
+    service_parser.add_argument("--algorithm", "-a", default="astar", choices=["bfs", "dfs", "ucs", "astar", "gbfs", "bibfs", "biucs", "biastar"],
+                                help="the search algorithm")
+    service_parser.add_argument("--seed", "-s", type=int, default=0, help="the seed of the random queries")
+    service_parser.set_defaults(run=benchmark_service)
+
+    sokoban_parser = subparsers.add_parser("sokoban", help="compare the Point-based and bitboard Sokoban states")
+    sokoban_parser.add_argument("paths", nargs="*", default=sorted(glob.glob("levels/*.txt")), help="paths to the levels to solve")
+    sokoban_parser.add_argument("--algorithms", "-a", nargs="+", default=["bfs"], choices=["bfs", "dfs", "ucs"],
+                                help="the search algorithms to run")
+    sokoban_parser.set_defaults(run=benchmark_sokoban)
+
+    parking_parser = subparsers.add_parser("parking", help="compare the Point-based and compact parking states")
+    parking_parser.add_argument("paths", nargs="*", default=sorted(glob.glob("parks/*.txt")), help="paths to the parking lots to solve")
+    parking_parser.add_argument("--algorithms", "-a", nargs="+", default=["bfs", "ucs"], choices=["bfs", "dfs", "ucs"],
+                                help="the search algorithms to run")
+    parking_parser.add_argument("--repeat", "-r", type=int, default=20, help="the number of runs to take the best time from")
+    parking_parser.set_defaults(run=benchmark_parking)
+
+    parking_heuristic_parser = subparsers.add_parser("parking-heuristic", help="compare the parking heuristics with A* against UCS")
+    parking_heuristic_parser.add_argument("paths", nargs="*", default=sorted(glob.glob("parks/*.txt")),
+                                          help="paths to the parking lots to solve")
+    parking_heuristic_parser.add_argument("--heuristics", "-hf", nargs="+", default=["zero", "distance", "parking"],
+                                          choices=["zero", "distance", "parking"], help="the heuristics to compare (the first one is the baseline)")
+    parking_heuristic_parser.add_argument("--repeat", "-r", type=int, default=5, help="the number of runs to take the best time from")
+    parking_heuristic_parser.add_argument("--check", "-c", action="store_true", default=False,
+                                          help="check that the heuristics are consistent on every action of the searches")
+    parking_heuristic_parser.set_defaults(run=benchmark_parking_heuristic)
+
+    cbs_parser = subparsers.add_parser("cbs", help="compare the conflict-based search against the joint-space UCS on parking lots")
+    cbs_parser.add_argument("paths", nargs="*", default=sorted(glob.glob("parks/*.txt")), help="paths to the parking lots to solve")
+    cbs_parser.add_argument("--time-limit", "-t", type=float, default=10.0, help="the time limit of each search (in seconds)")
+    cbs_parser.set_defaults(run=benchmark_cbs)
+
+    reduction_parser = subparsers.add_parser("reduction", help="compare the parking searches with and without the partial-order reduction")
+    reduction_parser.add_argument("paths", nargs="*", default=sorted(glob.glob("parks/*.txt")), help="paths to the parking lots to solve")
+    reduction_parser.add_argument("--time-limit", "-t", type=float, default=60.0, help="the time limit of each search (in seconds)")
+    reduction_parser.set_defaults(run=benchmark_reduction)
+
+    scaling_parser = subparsers.add_parser("parking-scaling", help="measure how the parking searches scale on random lots")
+    scaling_parser.add_argument("--sizes", "-s", nargs="+", default=["6x3", "8x4", "10x5"], help="the sizes of the lots (WIDTHxHEIGHT)")
+    scaling_parser.add_argument("--densities", "-d", nargs="+", type=float, default=[0.5, 0.8],
+                                help="the fractions of the cells that are passages")
+    scaling_parser.add_argument("--cars", "-c", nargs="+", type=int, default=[2, 3, 4], help="the numbers of cars")
+    scaling_parser.add_argument("--lots", "-n", type=int, default=3, help="the number of random lots (seeds) per combination")
+    scaling_parser.add_argument("--seed", type=int, default=0, help="the seed of the first lot of every combination")
+    scaling_parser.add_argument("--algorithms", "-a", nargs="+", default=["bfs", "ucs", "astar"],
+                                choices=["bfs", "dfs", "ucs", "astar", "gbfs", "idastar", "wastar", "cbs"], help="the search algorithms to run")
+    scaling_parser.add_argument("--heuristic", "-hf", default="parking", choices=["zero", "distance", "parking"],
+                                help="the heuristic used by the informed search algorithms")
+    scaling_parser.add_argument("--time-limit", "-t", type=float, default=10.0, help="the time limit of each search (in seconds)")
+    scaling_parser.add_argument("--output", "-o", help="write the results to this CSV file")
+    scaling_parser.set_defaults(run=benchmark_parking_scaling)
+
+    pushes_parser = subparsers.add_parser("pushes", help="compare searching over player steps against searching over crate pushes")
+    pushes_parser.add_argument("paths", nargs="*", default=sorted(glob.glob("levels/*.txt")), help="paths to the levels to solve")
+    pushes_parser.add_argument("--algorithms", "-a", nargs="+", default=["bfs", "astar"], choices=["bfs", "ucs", "astar", "gbfs"],
+                               help="the search algorithms to run")
+    pushes_parser.add_argument("--heuristic", "-hf", default="strong", choices=["zero", "strong", "pattern"],
+                               help="the heuristic used by A* and Greedy Best First Search")
+    pushes_parser.set_defaults(run=benchmark_pushes)
+
+    hashing_parser = subparsers.add_parser("hashing", help="compare the cached Zobrist hashes against hashing the state contents")
+    hashing_parser.add_argument("paths", nargs="*", default=["levels/level2.txt", "levels/level3.txt"] + sorted(glob.glob("parks/*.txt")),
+                                help="paths to the problems to solve")
+    hashing_parser.add_argument("--states", "-n", type=int, default=10000, help="the maximum number of states to hash")
+    hashing_parser.add_argument("--repeat", "-r", type=int, default=20, help="the number of times each state is hashed")
+    hashing_parser.set_defaults(run=benchmark_hashing)
+
+    deadlocks_parser = subparsers.add_parser("deadlocks", help="compare the deadlock analyses used by the strong heuristic")
+    deadlocks_parser.add_argument("paths", nargs="*", default=sorted(glob.glob("levels/*.txt")), help="paths to the levels to solve")
+    deadlocks_parser.set_defaults(run=benchmark_deadlocks)
+
+    patterns_parser = subparsers.add_parser("patterns", help="measure the pattern database heuristic")
+    patterns_parser.add_argument("paths", nargs="*", default=sorted(glob.glob("levels/*.txt")), help="paths to the levels to solve")
+    patterns_parser.set_defaults(run=benchmark_patterns)
+
+    matching_parser = subparsers.add_parser("matching", help="measure the heuristic calls per second by crate count")
+    matching_parser.add_argument("--crates", "-c", type=int, nargs="+", default=[2, 3, 4, 6, 8, 10, 12, 16],
+                                 help="the numbers of crates to try")
+    matching_parser.add_argument("--room", type=int, default=6, help="the number of spots for crates along each side of the room")
+    matching_parser.add_argument("--states", "-n", type=int, default=200, help="the number of states to evaluate")
+    matching_parser.add_argument("--max-enumeration", type=int, default=8, help="the largest crate count to enumerate the permutations for")
+    matching_parser.add_argument("--seed", "-s", type=int, default=0, help="the seed of the random states")
+    matching_parser.set_defaults(run=benchmark_matching)
+
+    incremental_parser = subparsers.add_parser("incremental", help="compare the strong heuristic against its incremental version")
+    incremental_parser.add_argument("paths", nargs="*", default=sorted(glob.glob("levels/*.txt")), help="paths to the levels to solve")
+    incremental_parser.add_argument("--repeat", "-r", type=int, default=3, help="the number of runs to take the best time from")
+    incremental_parser.set_defaults(run=benchmark_incremental)
+
+    args = parser.parse_args()
+    args.run(args)
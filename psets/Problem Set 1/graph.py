@@ -1,4 +1,4 @@
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, List, Optional
 from dataclasses import dataclass
 import json
 
@@ -21,11 +21,14 @@ class GraphNode:
 
 # This is the implementation of the graph routing problem
 class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
-    def __init__(self, start: GraphNode, goal: GraphNode, adjacency: Dict[GraphNode, List[GraphNode]]) -> None:
+    def __init__(self, start: GraphNode, goal: GraphNode, adjacency: Dict[GraphNode, List[GraphNode]],
+                 reverse_adjacency: Optional[Dict[GraphNode, List[GraphNode]]] = None) -> None:
         super().__init__()
         self.start = start
         self.goal = goal
         self.adjacency = adjacency
+        # The reverse adjacency maps each node to the nodes that have an edge to it (used by the bidirectional search)
+        self.reverse_adjacency = reverse_adjacency if reverse_adjacency is not None else reverse_graph(adjacency)
     
     def get_initial_state(self) -> GraphNode:
         return self.start
@@ -46,6 +49,11 @@ class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
     # The cost of an action is the distance between the current node and the next node 
     def get_cost(self, state: GraphNode, action: GraphNode) -> float:
         return euclidean_distance(state.position, action.position)
+
+    # Returns the problem of going backwards from the goal to the given start (the initial state by default)
+    # It shares the same graph with the edges reversed, so it is cheap to create
+    def reverse(self, start: Optional[GraphNode] = None) -> 'GraphRoutingProblem':
+        return GraphRoutingProblem(self.goal, start or self.start, self.reverse_adjacency, self.adjacency)
     
     # Read a graph routing problem from file
     @staticmethod
@@ -54,13 +62,24 @@ class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
         graph_def: Dict[str, Dict] = problem_def.get("graph", {})
         node_dict = {name: GraphNode(name, Point(*item.get("position", [0,0]))) for name, item in graph_def.items()}
         adjacency: Dict[GraphNode, List[GraphNode]] = {}
-        for name, item in graph_def.items():
+        reverse_adjacency: Dict[GraphNode, List[GraphNode]] = {node: [] for node in node_dict.values()}
+        for name, item in sorted(graph_def.items()):
             node = node_dict[name]
             adjacent = [node_dict[adjacent] for adjacent in sorted(item.get("adjacent", [])) if adjacent in node_dict]
             adjacency[node] = adjacent
+            for neighbor in adjacent:
+                reverse_adjacency[neighbor].append(node)
         start = node_dict[problem_def.get("start", "")]
         goal = node_dict[problem_def.get("goal", "")]
-        return GraphRoutingProblem(start, goal, adjacency)
+        return GraphRoutingProblem(start, goal, adjacency, reverse_adjacency)
+
+# Build the reverse adjacency of a graph where each node maps to the nodes that have an edge to it
+def reverse_graph(adjacency: Dict[GraphNode, List[GraphNode]]) -> Dict[GraphNode, List[GraphNode]]:
+    reverse_adjacency: Dict[GraphNode, List[GraphNode]] = {node: [] for node in adjacency}
+    for node, adjacent in adjacency.items():
+        for neighbor in adjacent:
+            reverse_adjacency.setdefault(neighbor, []).append(node)
+    return reverse_adjacency
 
 def graphrouting_heuristic(problem: GraphRoutingProblem, state: GraphNode) -> float:
     return euclidean_distance(state.position, problem.goal.position)
\ No newline at end of file
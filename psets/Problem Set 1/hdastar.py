@@ -0,0 +1,162 @@
+from typing import Any, Dict, List, Optional, Tuple
+import multiprocessing as mp
+import heapq
+
+from problem import HeuristicFunction, Problem, S, A, Solution
+from search_stats import SearchStats, with_stats
+
+# This file contains Hash Distributed A* (HDA*), a parallel A* where every state is owned by one worker process
+# chosen by hashing the (packed) state. Each worker keeps the open list and the costs of the states it owns.
+# When a worker generates a state owned by another worker, it sends the node to its owner.
+#
+# The workers run in synchronous rounds orchestrated by the main process:
+#   1. The main process sends each worker the nodes it received in the previous round and the cost of the best solution found so far.
+#   2. Each worker inserts the received nodes, then expands up to "batch_size" of its nodes with f below the best solution cost,
+#      and replies with the nodes generated for the other workers (in one batch per worker), its minimum f and the goals it expanded.
+#   3. The main process routes the batches to their owners.
+# Since every message is delivered in the round after it is sent, there are no messages in flight between rounds.
+# So the search can safely terminate when no batch is pending and the minimum f of every worker is not below the best solution cost,
+# which guarantees (with an admissible heuristic) that the solution is optimal, exactly like the sequential A*.
+#
+# States are sent between processes in their packed form (see Problem.pack_state) to keep the messages small.
+
+# The owner of a packed state
+# The hash must be the same in every process. This holds for tuples of integers, and for strings since the workers are forked
+# so they inherit the hash seed of the main process.
+def owner_of(packed: Any, workers: int) -> int:
+    return hash(packed) % workers
+
+# A node sent between processes: (packed state, cost, packed parent state, action)
+PackedNode = Tuple[Any, float, Any, Any]
+
+# The body of a worker process
+def worker_loop(index: int, workers: int, problem: Problem[S, A], heuristic: HeuristicFunction, batch_size: int, connection):
+    inf = float('inf')
+    frontier = []   # A heap of (f, counter, cost, packed state)
+    costs: Dict[Any, float] = {}    # The best known cost of every owned state
+    parents: Dict[Any, Tuple[Any, Any]] = {}    # The packed parent and action of the best known path to every owned state
+    expanded = set()    # The owned states that were already expanded with their current cost
+    counter = 0
+    while True:
+        message = connection.recv()
+        if message[0] == "stop":
+            break
+        if message[0] == "parent":
+            connection.send(parents[message[1]])
+            continue
+        _, incoming, incumbent = message
+        # Insert the nodes sent by the other workers if they improve the cost of their state
+        for packed, cost, parent, action in incoming:
+            if cost < costs.get(packed, inf):
+                costs[packed] = cost
+                parents[packed] = (parent, action)
+                expanded.discard(packed)
+                counter += 1
+                heapq.heappush(frontier, (cost + heuristic(problem, problem.unpack_state(packed)), counter, cost, packed))
+        outgoing: List[List[PackedNode]] = [[] for _ in range(workers)]
+        goals = []
+        count = 0
+        while frontier and count < batch_size:
+            f, _, cost, packed = frontier[0]
+            # Skip the entries whose cost was improved since they were pushed (lazy deletion)
+            if cost != costs[packed] or packed in expanded:
+                heapq.heappop(frontier)
+                continue
+            # Nodes that cannot lead to a solution cheaper than the best one found so far are kept for the termination check
+            if f >= incumbent:
+                break
+            heapq.heappop(frontier)
+            expanded.add(packed)
+            count += 1
+            state = problem.unpack_state(packed)
+            # Like the sequential A*, the goal test is done on expansion so the goal is reached with its optimal cost
+            if problem.is_goal(state):
+                goals.append((cost, packed))
+                incumbent = min(incumbent, cost)
+                continue
+            for action in problem.get_actions(state):
+                successor = problem.get_successor(state, action)
+                successor_packed = problem.pack_state(successor)
+                successor_cost = cost + problem.get_cost(state, action)
+                owner = owner_of(successor_packed, workers)
+                if owner != index:
+                    outgoing[owner].append((successor_packed, successor_cost, packed, action))
+                elif successor_cost < costs.get(successor_packed, inf):
+                    # The successor is owned by this worker so it is inserted directly
+                    costs[successor_packed] = successor_cost
+                    parents[successor_packed] = (packed, action)
+                    expanded.discard(successor_packed)
+                    counter += 1
+                    heapq.heappush(frontier, (successor_cost + heuristic(problem, successor), counter, successor_cost, successor_packed))
+        # Drop the stale entries on top of the heap so that the reported minimum f is accurate
+        while frontier and (frontier[0][2] != costs[frontier[0][3]] or frontier[0][3] in expanded):
+            heapq.heappop(frontier)
+        min_f = frontier[0][0] if frontier else inf
+        connection.send((outgoing, min_f, goals, count, len(frontier), len(costs)))
+
+# Run HDA* with the given number of worker processes and return the solution (or None if there is no solution)
+# "batch_size" is the maximum number of nodes expanded by each worker in a round
+# If "stats" is given, it records the expanded nodes, the peak total frontier and closed sizes and the time
+@with_stats
+def HashDistributedAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, workers: int = 2,
+                               batch_size: int = 256, stats: Optional[SearchStats] = None) -> Solution:
+    inf = float('inf')
+    # The workers are forked so they inherit the problem, the heuristic and the hash seed without pickling them
+    context = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+    connections, processes = [], []
+    for index in range(workers):
+        parent_connection, child_connection = context.Pipe()
+        process = context.Process(target=worker_loop, args=(index, workers, problem, heuristic, batch_size, child_connection), daemon=True)
+        process.start()
+        connections.append(parent_connection)
+        processes.append(process)
+    try:
+        initial_packed = problem.pack_state(initial_state)
+        incoming: List[List[PackedNode]] = [[] for _ in range(workers)]
+        incoming[owner_of(initial_packed, workers)].append((initial_packed, 0, None, None))
+        incumbent, goal = inf, None
+        while True:
+            for connection, nodes in zip(connections, incoming):
+                connection.send(("step", nodes, incumbent))
+            incoming = [[] for _ in range(workers)]
+            min_f = inf
+            frontier_size, closed_size = 0, 0
+            for connection in connections:
+                outgoing, worker_min_f, goals, count, worker_frontier, worker_closed = connection.recv()
+                for owner, nodes in enumerate(outgoing):
+                    incoming[owner].extend(nodes)
+                min_f = min(min_f, worker_min_f)
+                for cost, packed in goals:
+                    if cost < incumbent:
+                        incumbent, goal = cost, packed
+                if stats is not None:
+                    stats.expanded += count
+                frontier_size += worker_frontier
+                closed_size += worker_closed
+            if stats is not None:
+                stats.record_sizes(frontier_size, closed_size)
+            # Terminate once no node is pending and no worker has a node that may lead to a cheaper solution
+            if not any(incoming) and min_f >= incumbent:
+                break
+        if goal is None:
+            return None
+        # Rebuild the path by asking the owner of each state on the path for its parent
+        path = []
+        packed = goal
+        while packed != initial_packed:
+            connection = connections[owner_of(packed, workers)]
+            connection.send(("parent", packed))
+            packed, action = connection.recv()
+            path.append(action)
+        path.reverse()
+        return path
+    finally:
+        for connection in connections:
+            try:
+                connection.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
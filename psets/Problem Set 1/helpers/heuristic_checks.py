@@ -1,4 +1,4 @@
-from problem import A, S, Problem
+from problem import A, S, IncrementalHeuristic, Problem
 from .utils import add_call_listener
 
 class InconsistentHeuristicException(Exception):
@@ -16,4 +16,25 @@ def test_heuristic_consistency(heuristic):
             message += "Decrease in heuristic exceeds the actions cost\n"
             message += f"h(state) - h(next state) = {h} - {next_h} = {h - next_h} > {c} (action cost)"
             raise InconsistentHeuristicException(message)
-    return add_call_listener(listener)
\ No newline at end of file
+    return add_call_listener(listener)
+
+class IncrementalHeuristicMismatchException(Exception):
+    pass
+
+class CheckedIncrementalHeuristic(IncrementalHeuristic[S, A]):
+    def __init__(self, heuristic: IncrementalHeuristic[S, A]):
+        self.heuristic = heuristic
+
+    def evaluate(self, problem: Problem[S, A], state: S):
+        return self.heuristic.evaluate(problem, state)
+
+    def update(self, problem: Problem[S, A], state: S, memo, action: A, successor: S):
+        h, successor_memo = self.heuristic.update(problem, state, memo, action, successor)
+        expected_h = self.heuristic(problem, successor)
+        if h != expected_h:
+            message = "State:" + "\n" + str(state) + "\n"
+            message += f"Action: {str(action)}" + "\n"
+            message += "Next State:" + "\n" + str(successor) + "\n"
+            message += f"The heuristic updated from the state is {h} but the heuristic evaluated from scratch is {expected_h}"
+            raise IncrementalHeuristicMismatchException(message)
+        return h, successor_memo
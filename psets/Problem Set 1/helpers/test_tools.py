@@ -2,9 +2,10 @@ from typing import List, Optional, Set, Tuple
 from agents import HeuristicFunction
 from graph import GraphRoutingProblem, graphrouting_heuristic
 from sokoban import SokobanProblem, Direction
+from sokoban_pack import parse_pack, read_pack
 from problem import A, S, Problem
 from .utils import Result, fetch_recorded_calls, fetch_tracked_call_count, load_function
-from .heuristic_checks import InconsistentHeuristicException, test_heuristic_consistency
+from .heuristic_checks import CheckedIncrementalHeuristic, IncrementalHeuristicMismatchException, InconsistentHeuristicException, test_heuristic_consistency
 from functools import lru_cache
 import time
 
@@ -164,4 +165,120 @@ def compare_heuristic_for_sokoban(
         for i, (u, l) in enumerate(zip(thresholds[:-1], thresholds[1:])):
             message += '\n' + f'grade = {i+1} if {u} >= nodes > {l}'
         message += '\n' + f'grade = {len(thresholds)} if {thresholds[-1]} >= nodes'
-    return Result(grade != 0, grade, message)
\ No newline at end of file
+    return Result(grade != 0, grade, message)
+
+def compute_path_cost(problem: Problem[S, A], path: Optional[List[A]]) -> Optional[float]:
+    if path is None: return None
+    path_cost = 0
+    state = problem.get_initial_state()
+    for action in path:
+        path_cost += problem.get_cost(state, action)
+        state = problem.get_successor(state, action)
+    if not problem.is_goal(state): return float('nan')
+    return path_cost
+
+def load_heuristic(heuristic_path: str, problem: Problem[S, A]) -> HeuristicFunction:
+    heuristic = load_function(heuristic_path)
+    # The push problems take the heuristics of SokobanProblem through an adapter
+    if hasattr(problem, "adapt_heuristic"):
+        heuristic = problem.adapt_heuristic(heuristic)
+    return heuristic
+
+def run_search_for_path_costs(
+    function_path: str,
+    problems: List[Problem],
+    heuristic_path: Optional[str] = None) -> List[Optional[float]]:
+    search_fn = load_function(function_path)
+    path_costs = []
+    for problem in problems:
+        args = [] if heuristic_path is None else [load_heuristic(heuristic_path, problem)]
+        path = search_fn(problem, problem.get_initial_state(), *args)
+        path_costs.append(compute_path_cost(problem, path))
+    return path_costs
+
+def compare_path_costs(
+    output: List[Optional[float]],
+    expected_path_costs: List[Optional[float]],
+    level_paths: List[str]) -> Result:
+    cost_to_str = lambda c: "No solution" if c is None else str(c)
+    message = ""
+    for level_path, path_cost, expected_path_cost in zip(level_paths, output, expected_path_costs):
+        if path_cost != expected_path_cost:
+            message += f"{level_path}: Expected path cost to be {cost_to_str(expected_path_cost)} (as found by UniformCostSearch), got {cost_to_str(path_cost)}\n"
+    if message:
+        return Result(False, 0, message.rstrip())
+    return Result(True, 1, f"Path costs: {', '.join(cost_to_str(c) for c in output)}")
+
+def run_heuristic_consistency_checks(
+    heuristic_path: str,
+    problems: List[Problem]) -> Tuple[List[Optional[float]], str]:
+    search_fn = load_function("search.AStarSearch")
+    path_costs = []
+    for problem in problems:
+        heuristic = load_heuristic(heuristic_path, problem)
+        problem_type = type(problem)
+        original_get_successor = problem_type.get_successor
+        problem_type.get_successor = test_heuristic_consistency(heuristic)(original_get_successor)
+        try:
+            path = search_fn(problem, problem.get_initial_state(), heuristic)
+        except InconsistentHeuristicException as err:
+            return path_costs, "Heuristic is inconsistent:\n" + str(err)
+        finally:
+            problem_type.get_successor = original_get_successor
+        path_cost = compute_path_cost(problem, path)
+        if path is not None:
+            state = problem.get_initial_state()
+            for action in path:
+                state = problem.get_successor(state, action)
+            goal_h = heuristic(problem, state)
+            if goal_h != 0:
+                return path_costs, f"Expected Heuristic at goal to be 0, got {goal_h}" + "\nGoal State:\n" + str(state)
+        path_costs.append(path_cost)
+    return path_costs, ""
+
+def compare_heuristic_consistency(
+    output: Tuple[List[Optional[float]], str],
+    expected_path_costs: List[Optional[float]],
+    level_paths: List[str]) -> Result:
+    path_costs, message = output
+    if message:
+        return Result(False, 0, message)
+    return compare_path_costs(path_costs, expected_path_costs, level_paths)
+
+def run_incremental_heuristic_checks(
+    heuristic_path: str,
+    problems: List[Problem]) -> Tuple[List[Optional[float]], str]:
+    search_fn = load_function("search.AStarSearch")
+    heuristic = CheckedIncrementalHeuristic(load_function(heuristic_path))
+    path_costs = []
+    for problem in problems:
+        try:
+            path = search_fn(problem, problem.get_initial_state(), heuristic)
+        except IncrementalHeuristicMismatchException as err:
+            return path_costs, "Incremental heuristic is wrong:\n" + str(err)
+        path_costs.append(compute_path_cost(problem, path))
+    return path_costs, ""
+
+def run_pack_round_trip(pack_path: str) -> Tuple[List[Tuple[Optional[str], str, int]], bool]:
+    levels = list(read_pack(pack_path))
+    # Write the levels back as a pack (each board followed by its title) and read it again
+    written = "\n\n".join(level.text + ("" if level.title is None else f"\nTitle: {level.title}") for level in levels)
+    levels_again = list(parse_pack(written.splitlines(), pack_path))
+    round_trip = levels_again == [level._replace(board=tuple(level.text.split("\n"))) for level in levels]
+    return [(level.title, level.text, len(level.to_problem().get_initial_state().crates)) for level in levels], round_trip
+
+def compare_pack_levels(
+    output: Tuple[List[Tuple[Optional[str], str, int]], bool],
+    expected_levels: List[Tuple[Optional[str], str, int]],
+    pack_path: str) -> Result:
+    levels, round_trip = output
+    nl = '\n'
+    level_to_str = lambda l: f"- Title: {l[0]}, Crates: {l[2]}{nl}{l[1]}"
+    if levels != expected_levels:
+        pack = open(pack_path, 'r').read()
+        expected = nl.join(level_to_str(level) for level in expected_levels)
+        got = nl.join(level_to_str(level) for level in levels)
+        return Result(False, 0, f"Pack:{nl}{pack}{nl}Expected:{nl}{expected}{nl}Got:{nl}{got}")
+    if not round_trip:
+        return Result(False, 0, "Reading the levels again after writing them back as a pack gave different levels")
+    return Result(True, 1, f"Read {len(levels)} levels")
@@ -0,0 +1,362 @@
+from typing import List, Sequence, Tuple
+
+# This file contains a maximum weight matching for general graphs (Edmonds' blossom algorithm with dual variables)
+# Unlike the Hungarian algorithm (see sokoban_heuristic.py), the graph does not have to be bipartite:
+# every vertex can be matched with any other vertex, which is needed to pair crates with each other.
+# It runs in O(n^3) for n vertices. This is the primal-dual method of Galil ("Efficient algorithms for finding maximum
+# matching in graphs", 1986): the matching is grown by augmenting paths found through alternating trees, where odd cycles
+# (blossoms) are shrunk into a single vertex, and the dual variables are adjusted when no tight edge can extend the trees.
+# The weights must be integers so that the dual variables stay exact (they are doubled internally).
+#
+# Example:
+#   mate = max_weight_matching([(0, 1, 5), (1, 2, 6), (2, 3, 5)])    # [1, 0, 3, 2]: the edges (0, 1) and (2, 3) weigh 10
+
+# An edge (i, j, weight) between the vertices i and j
+Edge = Tuple[int, int, int]
+
+# Return the vertex matched with every vertex (or -1 if it is not matched) in a matching of maximum total weight
+def max_weight_matching(edges: Sequence[Edge]) -> List[int]:
+    if not edges:
+        return []
+    edge_count = len(edges)
+    vertex_count = 1 + max(max(i, j) for i, j, _ in edges)
+    max_weight = max(0, max(weight for _, _, weight in edges))
+    # The endpoints of the edges: endpoint[2k] and endpoint[2k + 1] are the vertices of edge k
+    endpoint = [edges[p // 2][p % 2] for p in range(2 * edge_count)]
+    # The remote endpoints (p such that endpoint[p] is the other vertex) of the edges of every vertex
+    neighbend: List[List[int]] = [[] for _ in range(vertex_count)]
+    for k, (i, j, _) in enumerate(edges):
+        neighbend[i].append(2 * k + 1)
+        neighbend[j].append(2 * k)
+    # The remote endpoint of the matched edge of every vertex (or -1)
+    mate = [-1] * vertex_count
+    # The labels of the top-level blossoms: 0 (no label), 1 (S: outer) or 2 (T: inner), and the endpoint they were reached through
+    label = [0] * (2 * vertex_count)
+    labelend = [-1] * (2 * vertex_count)
+    # The top-level blossom that contains every vertex
+    inblossom = list(range(vertex_count))
+    # The blossoms (vertices 0..n-1 are trivial blossoms, the others are n..2n-1)
+    blossomparent = [-1] * (2 * vertex_count)
+    blossomchilds: List[List[int]] = [None] * (2 * vertex_count)
+    blossombase = list(range(vertex_count)) + [-1] * vertex_count
+    blossomendps: List[List[int]] = [None] * (2 * vertex_count)
+    # The least-slack edge from every blossom to a different S-blossom (or -1), and the candidate edges of the S-blossoms
+    bestedge = [-1] * (2 * vertex_count)
+    blossombestedges: List[List[int]] = [None] * (2 * vertex_count)
+    unusedblossoms = list(range(vertex_count, 2 * vertex_count))
+    # The dual variables: the vertices start at the maximum weight (the weights are doubled, so the slacks stay integers)
+    dualvar = [max_weight] * vertex_count + [0] * vertex_count
+    allowedge = [False] * edge_count
+    queue: List[int] = []
+
+    def slack(k: int) -> int:
+        i, j, weight = edges[k]
+        return dualvar[i] + dualvar[j] - 2 * weight
+
+    # Return the vertices contained in a blossom
+    def blossom_leaves(b: int) -> List[int]:
+        if b < vertex_count:
+            return [b]
+        leaves = []
+        for child in blossomchilds[b]:
+            leaves.extend(blossom_leaves(child))
+        return leaves
+
+    # Label the top-level blossom of a vertex, reached through an endpoint, and add its vertices to the queue if it is an S-blossom
+    def assign_label(w: int, t: int, p: int):
+        b = inblossom[w]
+        label[w] = label[b] = t
+        labelend[w] = labelend[b] = p
+        bestedge[w] = bestedge[b] = -1
+        if t == 1:
+            queue.extend(blossom_leaves(b))
+        else:
+            base = blossombase[b]
+            assign_label(endpoint[mate[base]], 1, mate[base] ^ 1)
+
+    # Trace back from two vertices to find a new blossom (return its base) or an augmenting path (return -1)
+    def scan_blossom(v: int, w: int) -> int:
+        path = []
+        base = -1
+        while v != -1 or w != -1:
+            b = inblossom[v]
+            if label[b] & 4:
+                base = blossombase[b]
+                break
+            path.append(b)
+            label[b] = 5
+            if labelend[b] == -1:
+                v = -1
+            else:
+                v = endpoint[labelend[b]]
+                b = inblossom[v]
+                v = endpoint[labelend[b]]
+            if w != -1:
+                v, w = w, v
+        for b in path:
+            label[b] = 1
+        return base
+
+    # Shrink the blossom found by the edge k with the given base into a new top-level blossom
+    def add_blossom(base: int, k: int):
+        v, w, _ = edges[k]
+        bb = inblossom[base]
+        bv = inblossom[v]
+        bw = inblossom[w]
+        b = unusedblossoms.pop()
+        blossombase[b] = base
+        blossomparent[b] = -1
+        blossomparent[bb] = b
+        blossomchilds[b] = path = []
+        blossomendps[b] = endps = []
+        while bv != bb:
+            blossomparent[bv] = b
+            path.append(bv)
+            endps.append(labelend[bv])
+            v = endpoint[labelend[bv]]
+            bv = inblossom[v]
+        path.append(bb)
+        path.reverse()
+        endps.reverse()
+        endps.append(2 * k)
+        while bw != bb:
+            blossomparent[bw] = b
+            path.append(bw)
+            endps.append(labelend[bw] ^ 1)
+            w = endpoint[labelend[bw]]
+            bw = inblossom[w]
+        label[b] = 1
+        labelend[b] = labelend[bb]
+        dualvar[b] = 0
+        for v in blossom_leaves(b):
+            if label[inblossom[v]] == 2:
+                queue.append(v)
+            inblossom[v] = b
+        # Compute the least-slack edges to the other S-blossoms
+        bestedgeto = [-1] * (2 * vertex_count)
+        for bv in path:
+            if blossombestedges[bv] is None:
+                nblists = [[p // 2 for p in neighbend[v]] for v in blossom_leaves(bv)]
+            else:
+                nblists = [blossombestedges[bv]]
+            for nblist in nblists:
+                for k in nblist:
+                    i, j, _ = edges[k]
+                    if inblossom[j] == b:
+                        i, j = j, i
+                    bj = inblossom[j]
+                    if bj != b and label[bj] == 1 and (bestedgeto[bj] == -1 or slack(k) < slack(bestedgeto[bj])):
+                        bestedgeto[bj] = k
+            blossombestedges[bv] = None
+            bestedge[bv] = -1
+        blossombestedges[b] = [k for k in bestedgeto if k != -1]
+        bestedge[b] = -1
+        for k in blossombestedges[b]:
+            if bestedge[b] == -1 or slack(k) < slack(bestedge[b]):
+                bestedge[b] = k
+
+    # Expand a top-level blossom back into its sub-blossoms
+    def expand_blossom(b: int, endstage: bool):
+        for s in blossomchilds[b]:
+            blossomparent[s] = -1
+            if s < vertex_count:
+                inblossom[s] = s
+            elif endstage and dualvar[s] == 0:
+                expand_blossom(s, endstage)
+            else:
+                for v in blossom_leaves(s):
+                    inblossom[v] = s
+        # A T-blossom expanded in the middle of a stage has to keep its sub-blossoms in the alternating tree
+        if not endstage and label[b] == 2:
+            entrychild = inblossom[endpoint[labelend[b] ^ 1]]
+            j = blossomchilds[b].index(entrychild)
+            if j & 1:
+                j -= len(blossomchilds[b])
+                jstep = 1
+                endptrick = 0
+            else:
+                jstep = -1
+                endptrick = 1
+            p = labelend[b]
+            # Relabel the sub-blossoms on the even length path from the entry child to the base
+            while j != 0:
+                label[endpoint[p ^ 1]] = 0
+                label[endpoint[blossomendps[b][j - endptrick] ^ endptrick ^ 1]] = 0
+                assign_label(endpoint[p ^ 1], 2, p)
+                allowedge[blossomendps[b][j - endptrick] // 2] = True
+                j += jstep
+                p = blossomendps[b][j - endptrick] ^ endptrick
+                allowedge[p // 2] = True
+                j += jstep
+            bv = blossomchilds[b][j]
+            label[endpoint[p ^ 1]] = label[bv] = 2
+            labelend[endpoint[p ^ 1]] = labelend[bv] = p
+            bestedge[bv] = -1
+            j += jstep
+            while blossomchilds[b][j] != entrychild:
+                bv = blossomchilds[b][j]
+                if label[bv] == 1:
+                    j += jstep
+                    continue
+                for v in blossom_leaves(bv):
+                    if label[v] != 0:
+                        break
+                if label[v] != 0:
+                    label[v] = 0
+                    label[endpoint[mate[blossombase[bv]]]] = 0
+                    assign_label(v, 2, labelend[v])
+                j += jstep
+        label[b] = labelend[b] = -1
+        blossomchilds[b] = blossomendps[b] = None
+        blossombase[b] = -1
+        blossombestedges[b] = None
+        bestedge[b] = -1
+        unusedblossoms.append(b)
+
+    # Swap the matched and unmatched edges of a blossom so that the vertex v becomes its base
+    def augment_blossom(b: int, v: int):
+        t = v
+        while blossomparent[t] != b:
+            t = blossomparent[t]
+        if t >= vertex_count:
+            augment_blossom(t, v)
+        i = j = blossomchilds[b].index(t)
+        if i & 1:
+            j -= len(blossomchilds[b])
+            jstep = 1
+            endptrick = 0
+        else:
+            jstep = -1
+            endptrick = 1
+        while j != 0:
+            j += jstep
+            t = blossomchilds[b][j]
+            p = blossomendps[b][j - endptrick] ^ endptrick
+            if t >= vertex_count:
+                augment_blossom(t, endpoint[p])
+            j += jstep
+            t = blossomchilds[b][j]
+            if t >= vertex_count:
+                augment_blossom(t, endpoint[p ^ 1])
+            mate[endpoint[p]] = p ^ 1
+            mate[endpoint[p ^ 1]] = p
+        blossomchilds[b] = blossomchilds[b][i:] + blossomchilds[b][:i]
+        blossomendps[b] = blossomendps[b][i:] + blossomendps[b][:i]
+        blossombase[b] = blossombase[blossomchilds[b][0]]
+
+    # Swap the matched and unmatched edges along the augmenting path through the edge k
+    def augment_matching(k: int):
+        v, w, _ = edges[k]
+        for s, p in ((v, 2 * k + 1), (w, 2 * k)):
+            while True:
+                bs = inblossom[s]
+                if bs >= vertex_count:
+                    augment_blossom(bs, s)
+                mate[s] = p
+                if labelend[bs] == -1:
+                    break
+                t = endpoint[labelend[bs]]
+                bt = inblossom[t]
+                s = endpoint[labelend[bt]]
+                j = endpoint[labelend[bt] ^ 1]
+                if bt >= vertex_count:
+                    augment_blossom(bt, j)
+                mate[j] = labelend[bt]
+                p = labelend[bt] ^ 1
+
+    # Every stage augments the matching once (or ends the algorithm when the dual variables prove it is optimal)
+    for _ in range(vertex_count):
+        label[:] = [0] * (2 * vertex_count)
+        bestedge[:] = [-1] * (2 * vertex_count)
+        blossombestedges[vertex_count:] = [None] * vertex_count
+        allowedge[:] = [False] * edge_count
+        queue[:] = []
+        for v in range(vertex_count):
+            if mate[v] == -1 and label[inblossom[v]] == 0:
+                assign_label(v, 1, -1)
+        augmented = False
+        while True:
+            while queue and not augmented:
+                v = queue.pop()
+                for p in neighbend[v]:
+                    k = p // 2
+                    w = endpoint[p]
+                    if inblossom[v] == inblossom[w]:
+                        continue
+                    if not allowedge[k]:
+                        kslack = slack(k)
+                        if kslack <= 0:
+                            allowedge[k] = True
+                    if allowedge[k]:
+                        if label[inblossom[w]] == 0:
+                            assign_label(w, 2, p ^ 1)
+                        elif label[inblossom[w]] == 1:
+                            base = scan_blossom(v, w)
+                            if base >= 0:
+                                add_blossom(base, k)
+                            else:
+                                augment_matching(k)
+                                augmented = True
+                                break
+                        elif label[w] == 0:
+                            label[w] = 2
+                            labelend[w] = p ^ 1
+                    elif label[inblossom[w]] == 1:
+                        b = inblossom[v]
+                        if bestedge[b] == -1 or kslack < slack(bestedge[b]):
+                            bestedge[b] = k
+                    elif label[w] == 0:
+                        if bestedge[w] == -1 or kslack < slack(bestedge[w]):
+                            bestedge[w] = k
+            if augmented:
+                break
+            # No augmenting path with tight edges: find the largest change of the dual variables that keeps them feasible
+            deltatype = 1
+            delta = min(dualvar[:vertex_count])
+            deltaedge = deltablossom = -1
+            for v in range(vertex_count):
+                if label[inblossom[v]] == 0 and bestedge[v] != -1:
+                    d = slack(bestedge[v])
+                    if d < delta:
+                        delta, deltatype, deltaedge = d, 2, bestedge[v]
+            for b in range(2 * vertex_count):
+                if blossomparent[b] == -1 and label[b] == 1 and bestedge[b] != -1:
+                    d = slack(bestedge[b]) // 2
+                    if d < delta:
+                        delta, deltatype, deltaedge = d, 3, bestedge[b]
+            for b in range(vertex_count, 2 * vertex_count):
+                if blossombase[b] >= 0 and blossomparent[b] == -1 and label[b] == 2 and dualvar[b] < delta:
+                    delta, deltatype, deltablossom = dualvar[b], 4, b
+            for v in range(vertex_count):
+                if label[inblossom[v]] == 1:
+                    dualvar[v] -= delta
+                elif label[inblossom[v]] == 2:
+                    dualvar[v] += delta
+            for b in range(vertex_count, 2 * vertex_count):
+                if blossombase[b] >= 0 and blossomparent[b] == -1:
+                    if label[b] == 1:
+                        dualvar[b] += delta
+                    elif label[b] == 2:
+                        dualvar[b] -= delta
+            if deltatype == 1:
+                # A vertex dual reached zero: the matching is optimal
+                break
+            elif deltatype == 2:
+                allowedge[deltaedge] = True
+                i, j, _ = edges[deltaedge]
+                if label[inblossom[i]] == 0:
+                    i, j = j, i
+                queue.append(i)
+            elif deltatype == 3:
+                allowedge[deltaedge] = True
+                i, _, _ = edges[deltaedge]
+                queue.append(i)
+            else:
+                expand_blossom(deltablossom, False)
+        if not augmented:
+            break
+        # The S-blossoms whose dual variable reached zero are expanded at the end of the stage
+        for b in range(vertex_count, 2 * vertex_count):
+            if blossomparent[b] == -1 and blossombase[b] >= 0 and label[b] == 1 and dualvar[b] == 0:
+                expand_blossom(b, True)
+    return [endpoint[p] if p >= 0 else -1 for p in mate]
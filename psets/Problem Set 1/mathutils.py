@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from enum import IntEnum
 from typing import Iterator
+from functools import lru_cache
 import math
 
 # the class Point will hold a 2D coordinate on a discrete grid
@@ -32,6 +33,24 @@ class Point:
     def __iter__(self) -> Iterator[int]:
         return iter((self.x, self.y))
 
+    # Frozen dataclasses with slots cannot be unpickled by assigning their fields,
+    # so we pickle a point as a call to the constructor (needed to send points between processes)
+    def __reduce__(self):
+        return (Point, (self.x, self.y))
+
+# This is a helper function which returns a pseudo random 64-bit key for a tuple of integers (used for Zobrist hashing)
+# The key only depends on the values (not on the process or the hash seed) and is cached after the first call
+@lru_cache(maxsize=None)
+def zobrist_key(*values: int) -> int:
+    key = 0x9E3779B97F4A7C15
+    for value in values:
+        # One round of the splitmix64 mixing function per value
+        key = (key ^ (value & 0xFFFFFFFFFFFFFFFF)) + 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFFFFF
+        key = (key ^ (key >> 30)) * 0xBF58476D1CE4E5B9 & 0xFFFFFFFFFFFFFFFF
+        key = (key ^ (key >> 27)) * 0x94D049BB133111EB & 0xFFFFFFFFFFFFFFFF
+        key ^= key >> 31
+    return key
+
 # This is a helper function to compute the manhattan distance between 2 points
 def manhattan_distance(p1: Point, p2: Point) -> int:
     return abs(p1.x - p2.x) + abs(p1.y - p2.y)
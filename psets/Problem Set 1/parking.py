@@ -1,18 +1,73 @@
-from typing import Any, Dict, Set, Tuple, List
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, Iterable, NamedTuple, Optional, Sequence, Set, Tuple, List
 from problem import Problem
-from mathutils import Direction, Point
+from mathutils import Direction, Point, zobrist_key
 from helpers.utils import NotImplemented
 
-# A state is just a tuple of Points representing car positions
-ParkingState = Tuple[Point]  # A state of the parking problem is a tuple containing a tuple of points where where state[i] contains position of car 'i' and its cost.
+# The Zobrist key of a car at a given position
+def car_key(car_index: int, position: Point) -> int:
+    return zobrist_key(2, car_index, position.x, position.y)
+
+# A state is just a tuple of Points representing car positions where state[i] contains the position of car 'i'
+# It is a subclass of tuple which caches its Zobrist hash (the xor of the keys of every car at its position)
+# so that it is not rehashed every time it is looked up in a set or a dictionary
+# When a car moves, the hash is updated incrementally by xoring out its old key and xoring in its new key
+# The == operator compares the cars like a tuple, so two different states with the same hash are never confused
+# Since its hash differs from the hash of a plain tuple, a state is only equal to another ParkingState (never to a plain tuple)
+# and get_successor converts a plain tuple to a ParkingState
+class ParkingState(tuple):
+    def __new__(cls, cars: Iterable[Point], hash_value: Optional[int] = None) -> 'ParkingState':
+        state = super().__new__(cls, cars)
+        if hash_value is None:
+            hash_value = 0
+            for car_index, position in enumerate(state):
+                hash_value ^= car_key(car_index, position)
+        state.hash_value = hash_value
+        return state
+
+    def __hash__(self) -> int:
+        return self.hash_value
+
+    def __eq__(self, other: object) -> bool:
+        return type(other) is ParkingState and tuple.__eq__(self, other)
+
+    def __ne__(self, other: object) -> bool:
+        return not self.__eq__(other)
+
+    # Return the state where the given car moved to the given position
+    def moved(self, car_index: int, position: Point) -> 'ParkingState':
+        cars = list(self)
+        hash_value = self.hash_value ^ car_key(car_index, cars[car_index]) ^ car_key(car_index, position)
+        cars[car_index] = position
+        return ParkingState(cars, hash_value)
+
+    # The state is pickled as a call to the constructor with a plain tuple
+    def __reduce__(self):
+        return (ParkingState, (tuple(self),))
 
 # An action of the parking problem is a tuple containing an index 'i' and a direction 'd' where car 'i' should move in the direction 'd'.
 ParkingAction = Tuple[int, Direction]
 
+# The default characters of the cars and of their slots in a parking lot file: car 'i' is the i-th character of "cars"
+# and its slot is the i-th character of "slots" (so 'A' to 'J' and '0' to '9' keep their original meaning)
+# A move of car 'i' costs 26 - i, so a lot has at most 26 cars (the last one costs 1 per move)
+PARKING_LEGEND = {"cars": "ABCDEFGHIJKLMNOPQRSTUVWXYZ", "slots": "0123456789abcdefghijklmnop"}
+MAX_CARS = 26
+
+# Check that a legend has at most MAX_CARS cars, one slot per car and that every character has a single meaning
+def check_legend(car_chars: str, slot_chars: str):
+    if len(car_chars) > MAX_CARS or len(slot_chars) > MAX_CARS:
+        raise ValueError(f"A parking lot has at most {MAX_CARS} cars (since a move of car 'i' costs 26 - i)")
+    if len(car_chars) != len(slot_chars):
+        raise ValueError(f"The legend has {len(car_chars)} cars but {len(slot_chars)} slots")
+    chars = car_chars + slot_chars
+    if len(set(chars)) != len(chars) or any(char in "#.:" or char.isspace() for char in chars):
+        raise ValueError("The legend characters must be unique and cannot be '#', '.', ':' or spaces")
+
 # This is the implementation of the parking problem
 class ParkingProblem(Problem[ParkingState, ParkingAction]):
     passages: Set[Point]    # A set of points which indicate where a car can be (in other words, every position except walls).
-    cars: Tuple[Point]      # A tuple of points where state[i] is the position of car 'i'. 
+    cars: ParkingState      # A tuple of points where state[i] is the position of car 'i'. 
     slots: Dict[Point, int] # A dictionary which indicate the index of the parking slot (if it is 'i' then it is the lot of car 'i') for every position.
                             # if a position does not contain a parking slot, it will not be in this dictionary.
     width: int              # The width of the parking lot.
@@ -47,21 +102,44 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
         car_index, direction = action
         car_position = state[car_index]
         new_position = car_position + direction.to_vector()
-
-        new_state = list(state)
-        new_state[car_index] = new_position
-        return tuple(new_state)
+        if type(state) is not ParkingState:
+            state = ParkingState(state)
+        return state.moved(car_index, new_position)
     
     # This function returns the cost of applying the given action to the given state
     def get_cost(self, state: ParkingState, action: ParkingAction) -> float:
         return (26 - action[0])
     
+    # A state is packed as a flat tuple of integers containing the coordinates of every car
+    def pack_state(self, state: ParkingState) -> tuple:
+        return tuple(coordinate for position in state for coordinate in position)
+
+    def unpack_state(self, packed: tuple) -> ParkingState:
+        return ParkingState(Point(packed[i], packed[i+1]) for i in range(0, len(packed), 2))
+
     # Read a parking problem from text containing a grid of tiles
+    # The text may start with a legend: "cars: <characters>" and "slots: <characters>" lines where the i-th character
+    # is car 'i' (or its slot). Without them, the cars are 'A' to 'Z' and the slots are '0' to '9' then 'a' to 'p' (see PARKING_LEGEND).
+    # If only one of the two lines is given, the other one is the default truncated to the same number of cars.
     @staticmethod
     def from_text(text: str) -> 'ParkingProblem':
         passages =  set()
         cars, slots = {}, {}
         lines = [line for line in (line.strip() for line in text.splitlines()) if line]
+        legend, given = dict(PARKING_LEGEND), {}
+        while lines and ':' in lines[0]:
+            key, _, value = lines.pop(0).partition(':')
+            key, value = key.strip().lower(), value.strip()
+            if key not in legend:
+                raise ValueError(f"Unknown legend line '{key}' (expected 'cars' or 'slots')")
+            legend[key] = value
+            given[key] = value
+        if len(given) == 1:
+            (key, value), = given.items()
+            other = "slots" if key == "cars" else "cars"
+            legend[other] = PARKING_LEGEND[other][:len(value)]
+        car_chars, slot_chars = legend["cars"], legend["slots"]
+        check_legend(car_chars, slot_chars)
         width, height = max(len(line) for line in lines), len(lines)
         for y, line in enumerate(lines):
             for x, char in enumerate(line):
@@ -69,13 +147,13 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
                     passages.add(Point(x, y))
                     if char == '.':
                         pass
-                    elif char in "ABCDEFGHIJ":
-                        cars[ord(char) - ord('A')] = Point(x, y)
-                    elif char in "0123456789":
-                        slots[int(char)] = Point(x, y)
+                    elif char in car_chars:
+                        cars[car_chars.index(char)] = Point(x, y)
+                    elif char in slot_chars:
+                        slots[slot_chars.index(char)] = Point(x, y)
         problem = ParkingProblem()
         problem.passages = passages
-        problem.cars = tuple(cars[i] for i in range(len(cars)))
+        problem.cars = ParkingState(cars[i] for i in range(len(cars)))
         problem.slots = {position:index for index, position in slots.items()}
         problem.width = width
         problem.height = height
@@ -87,3 +165,131 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
         with open(path, 'r') as f:
             return ParkingProblem.from_text(f.read())
 
+
+# The layout contains the parts of a parking lot that are the same in every state: the passages and their size
+# Like SokobanLayout, the passages are numbered once (row by row) so that a position can be stored as an integer index:
+#   cells[index] is the position of a cell and cell_indices[position] is its index
+# The moves are precomputed once for every cell (in the order of Direction):
+#   neighbors[index][direction] is the index of the adjacent cell in that direction (or -1 if it is a wall)
+#   moves[index] only contains the (direction, neighbor) pairs of the adjacent cells that are not walls
+# The positions of the cars are stored in a bytes object (one byte per car) if there are at most 256 cells,
+# otherwise in a tuple of integers. Both are hashable sequences of integers, so the code does not depend on it:
+#   cell_codes[index] is the sequence of length 1 containing the index, which is spliced in when a car moves
+@dataclass(eq=False, frozen=True)
+class ParkingLayout:
+    __slots__ = ("width", "height", "passages", "cells", "cell_indices", "neighbors", "moves", "encode", "cell_codes")
+    width: int
+    height: int
+    passages: FrozenSet[Point]
+
+    def __post_init__(self):
+        cells = tuple(sorted(self.passages, key=lambda position: (position.y, position.x)))
+        cell_indices = {position: index for index, position in enumerate(cells)}
+        vectors = [direction.to_vector() for direction in Direction]
+        neighbors = tuple(tuple(cell_indices.get(cell + vector, -1) for vector in vectors) for cell in cells)
+        moves = tuple(tuple((direction, neighbor) for direction, neighbor in zip(Direction, row) if neighbor >= 0) for row in neighbors)
+        encode = bytes if len(cells) <= 256 else tuple
+        object.__setattr__(self, "cells", cells)
+        object.__setattr__(self, "cell_indices", cell_indices)
+        object.__setattr__(self, "neighbors", neighbors)
+        object.__setattr__(self, "moves", moves)
+        object.__setattr__(self, "encode", encode)
+        object.__setattr__(self, "cell_codes", tuple(encode((index,)) for index in range(len(cells))))
+
+    # Like SokobanLayout, the layout is pickled as a call to the constructor
+    def __reduce__(self):
+        return (ParkingLayout, (self.width, self.height, self.passages))
+
+# This is a compact parking state where positions are the cell indices of the layout:
+#   cars[i] is the index of the cell of car 'i' (see ParkingLayout for the type of the sequence)
+#   occupied is a bitmask where bit j is set if cell j contains a car, it is updated incrementally when a car moves
+# We use a NamedTuple since it is a plain tuple, so it is fast to create, hash and compare
+# The occupied bitmask is derived from the cars so it never changes the result of a comparison
+class CompactParkingState(NamedTuple):
+    cars: Sequence[int]
+    occupied: int
+
+    # Convert a ParkingState to the compact representation
+    @staticmethod
+    def from_state(layout: ParkingLayout, state: ParkingState) -> 'CompactParkingState':
+        cars = layout.encode(layout.cell_indices[position] for position in state)
+        occupied = 0
+        for cell in cars:
+            occupied |= 1 << cell
+        return CompactParkingState(cars, occupied)
+
+    # Convert the state back to a ParkingState
+    def to_state(self, layout: ParkingLayout) -> ParkingState:
+        return ParkingState(layout.cells[cell] for cell in self.cars)
+
+# This is the parking problem working on compact states
+# It has the same actions (in the same order) and costs as ParkingProblem so every search returns the same solution,
+# but the moves are looked up in the tables of the layout and the occupied cells are tested with bit operations
+# instead of building a set of Points for every state
+class CompactParkingProblem(Problem[CompactParkingState, ParkingAction]):
+    def __init__(self, problem: ParkingProblem) -> None:
+        super().__init__()
+        self.problem = problem
+        self.layout = ParkingLayout(problem.width, problem.height, frozenset(problem.passages))
+        self.initial_state = CompactParkingState.from_state(self.layout, problem.cars)
+        car_count = len(problem.cars)
+        # The goal is a single comparison of the cars against the goal vector (the cell of the slot of every car)
+        # If some cars have no slot, only the cars with slots (listed in goal_cars) are compared
+        slots = {car_index: self.layout.cell_indices[position] for position, car_index in problem.slots.items()}
+        self.goal_cars = None if len(slots) == car_count else tuple(sorted(slots))
+        self.goal = self.layout.encode(slots[car_index] for car_index in (self.goal_cars or range(car_count)))
+        # The actions are created once so that get_actions does not allocate a tuple for every action
+        self.car_actions = tuple(tuple((car_index, direction) for direction in Direction) for car_index in range(car_count))
+
+    def get_initial_state(self) -> CompactParkingState:
+        return self.initial_state
+
+    def is_goal(self, state: CompactParkingState) -> bool:
+        if self.goal_cars is None:
+            return state.cars == self.goal
+        return self.layout.encode(state.cars[car_index] for car_index in self.goal_cars) == self.goal
+
+    def get_actions(self, state: CompactParkingState) -> List[ParkingAction]:
+        actions = []
+        moves, car_actions, occupied = self.layout.moves, self.car_actions, state.occupied
+        for car_index, cell in enumerate(state.cars):
+            for direction, neighbor in moves[cell]:
+                if not occupied >> neighbor & 1:
+                    actions.append(car_actions[car_index][direction])
+        return actions
+
+    def get_successor(self, state: CompactParkingState, action: ParkingAction) -> CompactParkingState:
+        car_index, direction = action
+        cars = state.cars
+        cell = cars[car_index]
+        neighbor = self.layout.neighbors[cell][direction]
+        if neighbor < 0 or state.occupied >> neighbor & 1:
+            raise Exception(f"Invalid action {action} in state: {state.to_state(self.layout)}")
+        cars = cars[:car_index] + self.layout.cell_codes[neighbor] + cars[car_index + 1:]
+        return CompactParkingState(cars, state.occupied ^ (1 << cell) ^ (1 << neighbor))
+
+    def get_cost(self, state: CompactParkingState, action: ParkingAction) -> float:
+        return (26 - action[0])
+
+    # The occupied bitmask is derived from the cars, so a state is packed as its cars only
+    def pack_state(self, state: CompactParkingState) -> Sequence[int]:
+        return state.cars
+
+    def unpack_state(self, packed: Sequence[int]) -> CompactParkingState:
+        occupied = 0
+        for cell in packed:
+            occupied |= 1 << cell
+        return CompactParkingState(packed, occupied)
+
+    # Adapt a heuristic written for ParkingProblem to this problem
+    # It converts every state back to a ParkingState so it is only meant for heuristics that have no compact version
+    def adapt_heuristic(self, heuristic: Callable[[ParkingProblem, ParkingState], float]) -> Callable[['CompactParkingProblem', CompactParkingState], float]:
+        return lambda _, state: heuristic(self.problem, state.to_state(self.layout))
+
+    @staticmethod
+    def from_text(text: str) -> 'CompactParkingProblem':
+        return CompactParkingProblem(ParkingProblem.from_text(text))
+
+    @staticmethod
+    def from_file(path: str) -> 'CompactParkingProblem':
+        return CompactParkingProblem(ParkingProblem.from_file(path))
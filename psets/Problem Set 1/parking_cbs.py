@@ -0,0 +1,250 @@
+from typing import Dict, FrozenSet, Iterator, List, Optional, Sequence, Tuple, Union
+import heapq
+
+from mathutils import Direction
+from parking import CompactParkingProblem, CompactParkingState, ParkingAction, ParkingProblem, ParkingState
+from parking_heuristic import ParkingTables, car_cells, heuristic_tables
+from problem import Solution
+from search import breadth_first_steps, run_steps
+from search_stats import SearchStats, with_stats
+
+# This file contains a Conflict-Based Search (CBS) solver for the parking problem
+# Instead of searching the joint state of all the cars, every car is planned on its own over (cell, time) pairs,
+# where at every time step a car either waits (for free) or moves to an adjacent passage (for 26 - i).
+# The plans of the cars may conflict, which is resolved by a best first search over a constraint tree:
+# every node holds a set of constraints "car i cannot be in cell c at time t" and the cheapest plan of every car under them.
+# When the plans of a node conflict, the node is split into two children, each forbidding the conflict for one of the two cars.
+#
+# The conflicts are:
+#   - Vertex conflicts: two cars in the same cell at the same time
+#   - Following conflicts: a car enters a cell at time t that another car occupied at time t - 1
+# The following conflicts include the edge conflicts (two cars swapping their cells) and they are needed since the parking
+# moves are sequential: without them, cars could move in a chain or a cycle at the same time step. With them, every car that
+# moves at a time step enters a cell that is empty before and after the step, so the moves of a time step can be done
+# one after the other in any order. The plan is converted to a list of ParkingActions this way (by increasing car index).
+#
+# The cost of a node is the sum of the costs of the plans, which is the cost of the sequential solution.
+# Every sequential solution with m moves is a conflict-free plan that ends by time m (with one move per time step),
+# and every conflict-free plan is a sequential solution with the same cost.
+#
+# Since waiting is free, delaying a car never changes the cost of a node, so the constraint tree could grow forever
+# without its cost increasing (e.g. when two cars have to pass each other in a corridor, shifting their meeting in time
+# does not help). So every constraint tree is bounded by a makespan T (all the cars are parked by time T) which makes it finite,
+# and its first conflict-free node is an optimal solution among the plans that end by time T.
+# The makespan starts at the longest plan of a single car and grows by one until a solution of cost C is found.
+# Every move costs at least w = 26 - (number of cars - 1), so an optimal solution has at most C / w moves
+# and it ends by time C / w: one last search with that makespan (if it is larger) looks for a cheaper solution.
+# It only expands the nodes that cost less than C, and it is skipped if C is the sum of the costs of the cars planned on their own.
+# The constraint trees still grow exponentially with the makespan when many nodes have the same cost, so CBS is fast
+# on lots where the cars rarely meet, and slow on lots where they have to make way for each other in narrow passages
+# (e.g. parks/park5.txt, which it does not solve within 6 minutes while UCS takes 0.02s). A search that must give up in time
+# can run conflict_based_steps through a SearchStepper with a budget of nodes or a timeout.
+# However, CBS cannot prove that a lot is unsolvable when the cars can always reach their slots on their own
+# (e.g. two cars that have to swap in a dead end): the makespan would grow forever. So a breadth first search over the
+# joint states runs alongside it and returns None once it has visited all the reachable states without finding a goal.
+# On a solvable lot, it stops as soon as it reaches a goal (and CBS is then guaranteed to find a solution).
+#
+# Example:
+#   solution = ConflictBasedSearch(problem, problem.get_initial_state())
+
+# The constraints of a car: the (cell, time) pairs where it cannot be
+Constraints = FrozenSet[Tuple[int, int]]
+
+# A plan is the cell of a car at every time step (it stays in its last cell afterwards)
+Plan = List[int]
+
+# Return the cost of the cheapest plan of a car from its start cell to its slot under the constraints and the plan itself,
+# or None if there is none. The plan must end by the makespan (if it is given).
+# The search is A* on (cell, time) with the weighted distance to the slot as the heuristic.
+# Many plans have the same cost (since waiting is free), so ties are broken by the fewest conflicts with the plans of the other cars
+# (given as a conflict avoidance table, see occupancy_table) then by the earliest time.
+# A car without a slot can end anywhere, and a car can only end in a cell where it is never constrained afterwards.
+def plan_car(tables: ParkingTables, car_index: int, start: int, constraints: Constraints,
+             makespan: Optional[int] = None, occupancy: Sequence[FrozenSet[int]] = ()) -> Optional[Tuple[float, Plan]]:
+    moves = tables.layout.moves
+    slot = tables.slots[car_index]
+    weighted = tables.weighted[car_index]
+    weight = 26 - car_index
+    # With a makespan, the closed set keys on the exact time (which is bounded by the makespan), since a later arrival
+    # in a cell has less time left. Without a makespan, the times after the last constraint and the end of the other plans
+    # are all equivalent (since waiting is free), so the time in the closed set is capped there to keep the search finite
+    if makespan is not None:
+        horizon = makespan
+    else:
+        horizon = max(max((time for _, time in constraints), default=0) + 1, len(occupancy))
+    # The last time each cell is forbidden, so a car that stops in a cell must arrive after it
+    last_constrained: Dict[int, int] = {}
+    for cell, time in constraints:
+        if time > last_constrained.get(cell, -1):
+            last_constrained[cell] = time
+    if weighted[start] == float('inf') or (start, 0) in constraints:
+        return None
+    last_occupied = len(occupancy) - 1
+    counter = 0
+    # The frontier entries are (f, conflicts, time, counter, cost, cell, node) where a node is (parent node, cell)
+    frontier = [(weighted[start], 0, 0, counter, 0, start, (None, start))]
+    closed = set()
+    while frontier:
+        _, conflicts, time, _, cost, cell, node = heapq.heappop(frontier)
+        key = (cell, min(time, horizon))
+        if key in closed: continue
+        closed.add(key)
+        if (slot < 0 or cell == slot) and time > last_constrained.get(cell, -1):
+            plan = []
+            while node is not None:
+                node, plan_cell = node
+                plan.append(plan_cell)
+            plan.reverse()
+            return cost, plan
+        next_time = time + 1
+        if makespan is not None and next_time > makespan: continue
+        if occupancy:
+            occupied_before, occupied_after = occupancy[min(time, last_occupied)], occupancy[min(next_time, last_occupied)]
+        # Waiting is a move to the same cell for free
+        for next_cell, next_cost in ((cell, cost), *((neighbor, cost + weight) for _, neighbor in moves[cell])):
+            if (next_cell, next_time) in constraints or (next_cell, min(next_time, horizon)) in closed: continue
+            next_conflicts = conflicts
+            if occupancy and (next_cell in occupied_after or (next_cell != cell and next_cell in occupied_before)):
+                next_conflicts += 1
+            counter += 1
+            heapq.heappush(frontier, (next_cost + weighted[next_cell], next_conflicts, next_time, counter, next_cost, next_cell,
+                                      (node, next_cell)))
+    return None
+
+# Return the cells occupied by the plans of all the cars except one at every time step (the last set holds for all the later times)
+def occupancy_table(plans: Sequence[Plan], excluded: int) -> List[FrozenSet[int]]:
+    others = [plan for car_index, plan in enumerate(plans) if car_index != excluded]
+    if not others:
+        return []
+    duration = max(len(plan) for plan in others)
+    return [frozenset(plan[min(time, len(plan) - 1)] for plan in others) for time in range(duration)]
+
+# Return the first conflict between the plans (by time) as ((car, cell, time), (car, cell, time)) where each side is the constraint
+# that would resolve it (or None if there is no conflict), and the number of conflicts
+def find_conflicts(plans: Sequence[Plan]) -> Tuple[Optional[Tuple[Tuple[int, int, int], Tuple[int, int, int]]], int]:
+    first, count = None, 0
+    duration = max(len(plan) for plan in plans)
+    previous: Dict[int, int] = {plan[0]: car_index for car_index, plan in enumerate(plans)}
+    for time in range(1, duration):
+        current: Dict[int, int] = {}
+        for car_index, plan in enumerate(plans):
+            cell = plan[min(time, len(plan) - 1)]
+            # Vertex conflict: another car is in the same cell at the same time
+            other = current.get(cell)
+            if other is not None:
+                count += 1
+                if first is None: first = (other, cell, time), (car_index, cell, time)
+                continue
+            current[cell] = car_index
+        for cell, car_index in current.items():
+            # Following conflict: the car entered a cell that another car occupied at the previous time step
+            other = previous.get(cell, car_index)
+            if other != car_index:
+                count += 1
+                if first is None: first = (car_index, cell, time), (other, cell, time - 1)
+        previous = current
+    return first, count
+
+# Convert conflict-free plans into a sequence of actions, moving the cars of every time step by increasing index
+def plans_to_actions(tables: ParkingTables, plans: Sequence[Plan]) -> List[ParkingAction]:
+    neighbors = tables.layout.neighbors
+    actions = []
+    for time in range(1, max(len(plan) for plan in plans)):
+        for car_index, plan in enumerate(plans):
+            if time < len(plan) and plan[time] != plan[time - 1]:
+                actions.append((car_index, Direction(neighbors[plan[time - 1]].index(plan[time]))))
+    return actions
+
+# Search the constraint tree whose plans end by the makespan. It yields the frontier after each expansion of a node
+# and returns the cost and the plans of the cheapest conflict-free node that costs less than the bound (or None if there is none)
+def constraint_tree_steps(tables: ParkingTables, starts: Sequence[int], makespan: int, bound: float = float('inf'),
+                          stats: Optional[SearchStats] = None) -> Iterator:
+    plans, costs = [], []
+    for car_index, start in enumerate(starts):
+        planned = plan_car(tables, car_index, start, frozenset(), makespan)
+        if planned is None:
+            return None
+        costs.append(planned[0])
+        plans.append(planned[1])
+    counter = 0
+    # The frontier entries are (cost, conflicts, counter, first conflict, constraints of every car, plan costs, plans)
+    # The nodes with the same cost are ordered by their number of conflicts, since they are more likely to be close to a solution
+    conflict, conflicts = find_conflicts(plans)
+    if sum(costs) >= bound:
+        return None
+    frontier = [(sum(costs), conflicts, counter, conflict, (frozenset(),) * len(starts), costs, plans)]
+    while frontier:
+        cost, _, _, conflict, constraints, costs, plans = heapq.heappop(frontier)
+        if conflict is None:
+            return cost, plans
+        if stats is not None: stats.expanded += 1
+        for car_index, cell, time in conflict:
+            car_constraints = constraints[car_index] | {(cell, time)}
+            planned = plan_car(tables, car_index, starts[car_index], car_constraints, makespan, occupancy_table(plans, car_index))
+            if planned is None or cost - costs[car_index] + planned[0] >= bound: continue
+            if stats is not None: stats.generated += 1
+            child_constraints = constraints[:car_index] + (car_constraints,) + constraints[car_index + 1:]
+            child_costs, child_plans = costs[:], plans[:]
+            child_costs[car_index], child_plans[car_index] = planned
+            child_conflict, child_conflicts = find_conflicts(child_plans)
+            counter += 1
+            heapq.heappush(frontier, (sum(child_costs), child_conflicts, counter, child_conflict, child_constraints, child_costs, child_plans))
+        if stats is not None: stats.record_sizes(len(frontier), 0)
+        yield frontier
+    return None
+
+# The step generator of CBS (see search.py): it yields the frontier of the current constraint tree after each expansion of a node
+# The statistics count the nodes of the constraint trees (not the states expanded by the planning of every car)
+def conflict_based_steps(problem: Union[ParkingProblem, CompactParkingProblem], initial_state: Union[ParkingState, CompactParkingState],
+                         stats: Optional[SearchStats] = None) -> Iterator:
+    tables = heuristic_tables(problem)
+    starts = car_cells(tables, initial_state)
+    if not starts:
+        return []
+    plans = [plan_car(tables, car_index, start, frozenset()) for car_index, start in enumerate(starts)]
+    if any(planned is None for planned in plans):
+        return None
+    lower_bound = sum(cost for cost, _ in plans)
+    makespan = max(1, max(len(plan) - 1 for _, plan in plans))
+    # Every car may reach its slot on its own while the lot is unsolvable (e.g. two cars that have to swap in a dead end),
+    # and then the makespan would grow forever. So a breadth first search over the joint states runs alongside
+    # (one expansion per node of the constraint trees, and per makespan): if it runs out of states, the lot is unsolvable
+    check = breadth_first_steps(problem, initial_state)
+    def proved_unsolvable() -> bool:
+        nonlocal check
+        if check is None:
+            return False
+        try:
+            next(check)
+        except StopIteration as stop:
+            check = None
+            return stop.value is None
+        return False
+    found = None
+    while found is None:
+        tree = constraint_tree_steps(tables, starts, makespan, stats=stats)
+        while True:
+            try:
+                frontier = next(tree)
+            except StopIteration as stop:
+                found = stop.value
+                break
+            if proved_unsolvable():
+                return None
+            yield frontier
+        if found is None:
+            if proved_unsolvable():
+                return None
+            makespan += 1
+    cost, plans = found
+    longest = int(cost // (26 - (len(starts) - 1)))
+    if cost > lower_bound and longest > makespan:
+        cheaper = yield from constraint_tree_steps(tables, starts, longest, cost, stats)
+        if cheaper is not None:
+            _, plans = cheaper
+    return plans_to_actions(tables, plans)
+
+@with_stats
+def ConflictBasedSearch(problem: Union[ParkingProblem, CompactParkingProblem], initial_state: Union[ParkingState, CompactParkingState],
+                        stats: Optional[SearchStats] = None) -> Solution:
+    return run_steps(conflict_based_steps(problem, initial_state, stats))
@@ -0,0 +1,79 @@
+from typing import List, Optional, Tuple
+import argparse, os, random
+
+from parking import MAX_CARS, PARKING_LEGEND
+
+# This file generates random parking lots (in the format read by ParkingProblem.from_text) for the scaling benchmarks
+# A lot is a grid of width x height cells surrounded by walls, where:
+# - The passages are grown from a random cell by adding random wall cells next to them, until "density" of the cells are passages,
+#   so the passages are always connected (a low density gives narrow winding passages, a high density gives open lots)
+# - The cars and their slots are placed on distinct random passages
+# The lots are not guaranteed to be solvable (e.g. two cars may have to swap in a dead end)
+# The same parameters and seed always give the same lot.
+#
+# Example:
+#   text = generate_lot(12, 8, 0.6, 5, seed=1)
+#   python parking_generator.py -W 12 -H 8 -d 0.6 -c 5 -n 10 -o lots
+
+# Return the text of a random parking lot of width x height cells (not counting the surrounding walls) with "car_count" cars
+def generate_lot(width: int, height: int, density: float, car_count: int, seed: Optional[int] = None) -> str:
+    if width < 1 or height < 1:
+        raise ValueError("The lot must have at least one cell")
+    if not 0 < density <= 1:
+        raise ValueError("The density must be in (0, 1]")
+    if not 1 <= car_count <= MAX_CARS:
+        raise ValueError(f"The number of cars must be between 1 and {MAX_CARS}")
+    cell_count = width * height
+    passage_count = max(round(density * cell_count), 2 * car_count)
+    if passage_count > cell_count:
+        raise ValueError(f"A {width}x{height} lot cannot hold {car_count} cars and their slots")
+    rng = random.Random(seed)
+    grid = [['#'] * (width + 2) for _ in range(height + 2)]
+    start = (rng.randint(1, width), rng.randint(1, height))
+    passages: List[Tuple[int, int]] = []
+    # The walls next to the passages (which may contain duplicates and cells that became passages since)
+    candidates = [start]
+    while len(passages) < passage_count:
+        index = rng.randrange(len(candidates))
+        candidates[index], candidates[-1] = candidates[-1], candidates[index]
+        x, y = candidates.pop()
+        if grid[y][x] != '#': continue
+        grid[y][x] = '.'
+        passages.append((x, y))
+        for nx, ny in ((x + 1, y), (x, y - 1), (x - 1, y), (x, y + 1)):
+            if 1 <= nx <= width and 1 <= ny <= height and grid[ny][nx] == '#':
+                candidates.append((nx, ny))
+    picks = rng.sample(passages, 2 * car_count)
+    for car_index in range(car_count):
+        x, y = picks[car_index]
+        grid[y][x] = PARKING_LEGEND["cars"][car_index]
+        x, y = picks[car_count + car_index]
+        grid[y][x] = PARKING_LEGEND["slots"][car_index]
+    return '\n'.join(''.join(row) for row in grid) + '\n'
+
+# Return the file name of a generated lot, which contains its parameters
+def lot_name(width: int, height: int, density: float, car_count: int, seed: int) -> str:
+    return f"lot_{width}x{height}_d{density:g}_c{car_count}_s{seed}.txt"
+
+def main(args: argparse.Namespace):
+    for seed in range(args.seed, args.seed + args.count):
+        text = generate_lot(args.width, args.height, args.density, args.cars, seed)
+        if args.output is None:
+            print(text)
+            continue
+        os.makedirs(args.output, exist_ok=True)
+        path = os.path.join(args.output, lot_name(args.width, args.height, args.density, args.cars, seed))
+        with open(path, 'w') as f:
+            f.write(text)
+        print(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate random parking lots")
+    parser.add_argument("--width", "-W", type=int, default=8, help="the number of columns of the lot (without the walls)")
+    parser.add_argument("--height", "-H", type=int, default=4, help="the number of rows of the lot (without the walls)")
+    parser.add_argument("--density", "-d", type=float, default=0.6, help="the fraction of the cells that are passages")
+    parser.add_argument("--cars", "-c", type=int, default=3, help=f"the number of cars (at most {MAX_CARS})")
+    parser.add_argument("--seed", "-s", type=int, default=0, help="the seed of the first lot (the next lots use the next seeds)")
+    parser.add_argument("--count", "-n", type=int, default=1, help="the number of lots to generate")
+    parser.add_argument("--output", "-o", help="the folder to write the lots to (they are printed if it is not given)")
+    main(parser.parse_args())
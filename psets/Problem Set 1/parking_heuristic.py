@@ -0,0 +1,121 @@
+from collections import deque
+from typing import List, Sequence, Union
+
+from parking import CompactParkingProblem, CompactParkingState, ParkingLayout, ParkingProblem, ParkingState
+
+# This file contains heuristics for the parking problem (and for CompactParkingProblem which has the same states in a compact form)
+# Every move of car 'i' costs 26 - i, so a car that is d cells away from its slot (on the passages, ignoring the other cars)
+# costs at least (26 - i) * d to park. The moves of different cars are different actions, so the sum over the cars is admissible.
+# A move of car 'i' changes its distance by at most 1, so the sum changes by at most 26 - i, which is the cost of the move:
+# the heuristic is consistent.
+#
+# Example:
+#   AStarSearch(problem, problem.get_initial_state(), parking_heuristic)
+
+# Return the distance from every cell to a cell, on the passages of the layout (infinite if it cannot be reached)
+def bfs_distances(layout: ParkingLayout, start: int) -> List[float]:
+    dist = [float('inf')] * len(layout.cells)
+    dist[start] = 0
+    queue = deque([start])
+    while queue:
+        current = queue.popleft()
+        cost = dist[current] + 1
+        for _, neighbor in layout.moves[current]:
+            if dist[neighbor] == float('inf'):
+                dist[neighbor] = cost
+                queue.append(neighbor)
+    return dist
+
+# Return the bitmask of the cells connected to a cell on the passages of the layout, without going through the "removed" cell
+def connected_cells(layout: ParkingLayout, start: int, removed: int = -1) -> int:
+    region = 1 << start
+    stack = [start]
+    while stack:
+        for _, neighbor in layout.moves[stack.pop()]:
+            if neighbor != removed and not region >> neighbor & 1:
+                region |= 1 << neighbor
+                stack.append(neighbor)
+    return region
+
+# The tables of a parking lot, computed once per problem (see heuristic_tables)
+#   slots[i] is the cell of the slot of car 'i' (or -1 if it has no slot)
+#   weighted[i][cell] is (26 - i) times the distance from the cell to the slot of car 'i' (0 for every cell if it has no slot)
+#   blockers[j] lists the pairs (i, cut) such that every path from a cell in the "cut" bitmask to the slot of car 'i'
+#   goes through the slot of car 'j' (it is empty if car 'j' has no slot)
+class ParkingTables:
+    __slots__ = ("layout", "slots", "weighted", "blockers")
+
+    def __init__(self, layout: ParkingLayout, slots: Sequence[int]) -> None:
+        self.layout = layout
+        self.slots = tuple(slots)
+        cell_count = len(layout.cells)
+        weighted = []
+        for car_index, slot in enumerate(slots):
+            if slot < 0:
+                weighted.append((0,) * cell_count)
+            else:
+                weighted.append(tuple((26 - car_index) * distance for distance in bfs_distances(layout, slot)))
+        self.weighted = tuple(weighted)
+        regions = [0 if slot < 0 else connected_cells(layout, slot) for slot in slots]
+        blockers = []
+        for blocker, blocker_slot in enumerate(slots):
+            pairs = []
+            if blocker_slot >= 0:
+                for car_index, slot in enumerate(slots):
+                    if car_index == blocker or slot < 0: continue
+                    cut = regions[car_index] & ~connected_cells(layout, slot, blocker_slot) & ~(1 << blocker_slot)
+                    if cut:
+                        pairs.append((car_index, cut))
+            blockers.append(tuple(pairs))
+        self.blockers = tuple(blockers)
+
+# Compute the tables of a problem once and return them (they are stored in the problem cache)
+def heuristic_tables(problem: Union[ParkingProblem, CompactParkingProblem]) -> ParkingTables:
+    cache = problem.cache()
+    if "parking_tables" not in cache:
+        if isinstance(problem, CompactParkingProblem):
+            layout, problem = problem.layout, problem.problem
+        else:
+            layout = ParkingLayout(problem.width, problem.height, frozenset(problem.passages))
+        slots = [-1] * len(problem.cars)
+        for position, car_index in problem.slots.items():
+            slots[car_index] = layout.cell_indices[position]
+        cache["parking_tables"] = ParkingTables(layout, slots)
+    return cache["parking_tables"]
+
+# Return the cell index of every car
+def car_cells(tables: ParkingTables, state: Union[ParkingState, CompactParkingState]) -> Sequence[int]:
+    if isinstance(state, CompactParkingState):
+        return state.cars
+    cell_indices = tables.layout.cell_indices
+    return [cell_indices[position] for position in state]
+
+# This heuristic returns the sum over the cars of (26 - i) times the distance of car 'i' to its slot
+def distance_heuristic(problem: Union[ParkingProblem, CompactParkingProblem], state: Union[ParkingState, CompactParkingState]) -> float:
+    tables = heuristic_tables(problem)
+    return sum(weighted[cell] for weighted, cell in zip(tables.weighted, car_cells(tables, state)))
+
+def parking_heuristic(problem: Union[ParkingProblem, CompactParkingProblem], state: Union[ParkingState, CompactParkingState]) -> float:
+    '''
+    This heuristic adds a blocking term to distance_heuristic:
+    if car 'j' is parked in its slot and another car cannot reach its own slot without going through it,
+    car 'j' has to leave its slot and come back, which costs at least 2 * (26 - j) on top of the distances (where car 'j' counts 0).
+    It is counted once per blocking car, however many cars it blocks, since leaving once lets all of them pass.
+    It stays consistent:
+    - A blocked car cannot leave the cells that are cut from its slot without going through the blocking car, so its moves never remove the term
+    - When car 'j' leaves its slot, the term (2 * (26 - j)) is removed but its distance grows to 1, so the value drops by 26 - j, its cost
+    '''
+    tables = heuristic_tables(problem)
+    cells = car_cells(tables, state)
+    value = 0
+    for weighted, cell in zip(tables.weighted, cells):
+        value += weighted[cell]
+    if value == float('inf'):
+        return value
+    for blocker, pairs in enumerate(tables.blockers):
+        if pairs and cells[blocker] == tables.slots[blocker]:
+            for car_index, cut in pairs:
+                if cut >> cells[car_index] & 1:
+                    value += 2 * (26 - blocker)
+                    break
+    return value
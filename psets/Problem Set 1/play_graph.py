@@ -1,12 +1,15 @@
 import time
 from graph import GraphRoutingProblem, GraphNode, graphrouting_heuristic
 from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
+from search_stats import SearchStats
 from helpers.utils import fetch_recorded_calls
 import argparse, os, json
 
 # Create an agent based on the user selections
 def create_agent(args: argparse.Namespace):
     agent_type: str = args.agent
+    # If desired by the user, the search agents record their statistics
+    stats = SearchStats() if args.stats else None
     if agent_type == "human":
         # This function reads the action from the user (human)
         def graph_user_action(problem: GraphRoutingProblem, state: GraphNode) -> GraphNode:
@@ -28,19 +31,28 @@ def create_agent(args: argparse.Namespace):
         return HumanAgent(graph_user_action)
     if agent_type == "bfs":
         from search import BreadthFirstSearch
-        return UninformedSearchAgent(BreadthFirstSearch)
+        return UninformedSearchAgent(BreadthFirstSearch, stats=stats)
     if agent_type == "dfs":
         from search import DepthFirstSearch
-        return UninformedSearchAgent(DepthFirstSearch)
+        return UninformedSearchAgent(DepthFirstSearch, stats=stats)
     if agent_type == "ucs":
         from search import UniformCostSearch
-        return UninformedSearchAgent(UniformCostSearch)
+        return UninformedSearchAgent(UniformCostSearch, stats=stats)
     if agent_type == "astar":
         from search import AStarSearch
-        return InformedSearchAgent(AStarSearch, graphrouting_heuristic)
+        return InformedSearchAgent(AStarSearch, graphrouting_heuristic, stats=stats)
     if agent_type == "gbfs":
         from search import BestFirstSearch
-        return InformedSearchAgent(BestFirstSearch, graphrouting_heuristic)
+        return InformedSearchAgent(BestFirstSearch, graphrouting_heuristic, stats=stats)
+    if agent_type == "bibfs":
+        from search import BidirectionalBreadthFirstSearch
+        return UninformedSearchAgent(BidirectionalBreadthFirstSearch, stats=stats)
+    if agent_type == "biucs":
+        from search import BidirectionalUniformCostSearch
+        return UninformedSearchAgent(BidirectionalUniformCostSearch, stats=stats)
+    if agent_type == "biastar":
+        from search import BidirectionalAStarSearch
+        return InformedSearchAgent(BidirectionalAStarSearch, graphrouting_heuristic, stats=stats)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
@@ -92,6 +104,9 @@ def main(args: argparse.Namespace):
     # This was a search agent, display the traversed nodes
     if not isinstance(agent, HumanAgent):
         print(f"Traversal Order: {'->'.join(traversed_nodes)}")
+    # If desired by the user, print the statistics recorded by the search agent
+    if getattr(agent, "stats", None) is not None:
+        print(agent.stats)
     # Finally print the elapsed time for the whole process
     print(f"Elapsed time: {time.time() - start} seconds")
 
@@ -100,8 +115,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Play Graph as Human or AI")
     parser.add_argument("graph", help="path to the graph to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
+                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs', 'bibfs', 'biucs', 'biastar'],
                         help="the agent that will play the game")
+    parser.add_argument("--stats", "-st", action="store_true", default=False,
+                        help="Print the statistics of the search (expanded nodes, peak frontier size, time, etc.)")
 
     args = parser.parse_args()
     try:
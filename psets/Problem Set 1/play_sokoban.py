@@ -1,6 +1,7 @@
 from typing import List
 from sokoban import SokobanProblem, Direction, SokobanState, SokobanTile
 from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
+from search_stats import SearchStats
 from helpers.utils import fetch_tracked_call_count
 from helpers.heuristic_checks import test_heuristic_consistency
 from functools import lru_cache
@@ -27,12 +28,17 @@ def get_heuristic(name: str):
     if name == "strong":
         from sokoban_heuristic import strong_heuristic
         return strong_heuristic
+    if name == "pattern":
+        from sokoban_pdb import pattern_heuristic
+        return pattern_heuristic
     print(f"Requested Heuristic '{name}' is invalid")
     exit(-1)
 
 # Create an agent based on the user selections
 def create_agent(args: argparse.Namespace):
     agent_type: str = args.agent
+    # If desired by the user, the search agents record their statistics
+    stats = SearchStats() if args.stats else None
     if agent_type == "human":
         # This function reads the action from the user (human)
         def sokoban_user_action(problem: SokobanProblem, state: SokobanState) -> Direction:
@@ -52,13 +58,13 @@ def create_agent(args: argparse.Namespace):
         return HumanAgent(sokoban_user_action)
     if agent_type == "bfs":
         from search import BreadthFirstSearch
-        return UninformedSearchAgent(BreadthFirstSearch)
+        return UninformedSearchAgent(BreadthFirstSearch, stats=stats)
     if agent_type == "dfs":
         from search import DepthFirstSearch
-        return UninformedSearchAgent(DepthFirstSearch)
+        return UninformedSearchAgent(DepthFirstSearch, stats=stats)
     if agent_type == "ucs":
         from search import UniformCostSearch
-        return UninformedSearchAgent(UniformCostSearch)
+        return UninformedSearchAgent(UniformCostSearch, stats=stats)
     if agent_type == "astar":
         from search import AStarSearch
         # We cache the heuristic calls to speed up the search process if the heuristic is not fast
@@ -66,7 +72,7 @@ def create_agent(args: argparse.Namespace):
         # If desired by the user, we track every transition and check for the heuristic consistency for each transition
         if args.checks:
             SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
-        return InformedSearchAgent(AStarSearch, heuristic)
+        return InformedSearchAgent(AStarSearch, heuristic, stats=stats)
     if agent_type == "gbfs":
         from search import BestFirstSearch
         # We cache the heuristic calls to speed up the search process if the heuristic is not fast
@@ -74,7 +80,37 @@ def create_agent(args: argparse.Namespace):
         # If desired by the user, we track every transition and check for the heuristic consistency for each transition
         if args.checks:
             SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
-        return InformedSearchAgent(BestFirstSearch, heuristic)
+        return InformedSearchAgent(BestFirstSearch, heuristic, stats=stats)
+    if agent_type == "idastar":
+        from search import IterativeDeepeningAStarSearch
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        # If desired by the user, we track every transition and check for the heuristic consistency for each transition
+        if args.checks:
+            SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
+        search_fn = lambda problem, state, heuristic, **kwargs: IterativeDeepeningAStarSearch(problem, state, heuristic, args.table_size, **kwargs)
+        return InformedSearchAgent(search_fn, heuristic, stats=stats)
+    if agent_type == "wastar":
+        from search import WeightedAStarSearch
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        # If desired by the user, we track every transition and check for the heuristic consistency for each transition
+        if args.checks:
+            SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
+        search_fn = lambda problem, state, heuristic, **kwargs: WeightedAStarSearch(problem, state, heuristic, args.weight, **kwargs)
+        return InformedSearchAgent(search_fn, heuristic, stats=stats)
+    if agent_type == "anytime":
+        from search import AnytimeAStarSearch
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        # If desired by the user, we track every transition and check for the heuristic consistency for each transition
+        if args.checks:
+            SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
+        # Every time a better solution (or a tighter bound) is found, we print its cost and suboptimality bound
+        report = lambda solution, cost, bound: print(f"Found a solution with cost {cost} (at most {bound:.3f} times the optimal cost)")
+        search_fn = lambda problem, state, heuristic, **kwargs: AnytimeAStarSearch(
+            problem, state, heuristic, args.time_budget, args.weight, report=report, **kwargs)
+        return InformedSearchAgent(search_fn, heuristic, stats=stats)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
@@ -87,6 +123,10 @@ def main(args: argparse.Namespace):
     print("Initial State:")
     state_printer(state)
     agent = create_agent(args)
+    # If desired by the user, the search agent searches over crate pushes instead of single player steps
+    if args.pushes and not isinstance(agent, HumanAgent):
+        from sokoban_push import push_search
+        agent.search_fn = push_search(agent.search_fn)
     step = 0 # This will store the current step
     total_explored_nodes = 0 # This will store the number of traversed nodes during search
     unsolvable = False # This will store whether the problem is unsolvable or not
@@ -117,6 +157,9 @@ def main(args: argparse.Namespace):
     # This was a search agent, display the number of traversed nodes
     if not isinstance(agent, HumanAgent):
         print(f"Search explored {total_explored_nodes} nodes")
+    # If desired by the user, print the statistics recorded by the search agent
+    if getattr(agent, "stats", None) is not None:
+        print(agent.stats)
     # Finally print the elapsed time for the whole process
     print(f"Elapsed time: {time.time() - start} seconds")
 
@@ -126,16 +169,27 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Play Sokoban as Human or AI")
     parser.add_argument("level", help="path to the sokoban level to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
+                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs', 'idastar', 'wastar', 'anytime'],
                         help="the agent that will play the game")
     parser.add_argument("--heuristic", '-hf', default="zero",
-                        choices=["zero", "weak", "strong"],
+                        choices=["zero", "weak", "strong", "pattern"],
                         help="choose the heuristic to use with A* or Greedy Best First Search")
+    parser.add_argument("--table-size", "-ts", type=int, default=2**16,
+                        help="the maximum number of states in the transposition table of IDA* (0 to disable it)")
+    parser.add_argument("--weight", "-w", type=float, default=2.0,
+                        help="the heuristic weight of Weighted A* (and the initial weight of Anytime A*)")
+    parser.add_argument("--time-budget", "-tb", type=float, default=5.0,
+                        help="the time (in seconds) that Anytime A* can spend improving its solution")
+    parser.add_argument("--pushes", "-p", action="store_true", default=False,
+                        help="Search over crate pushes instead of single player steps (minimizes the number of pushes)")
     parser.add_argument("--checks", "-c", action='store_true', default=False,
                         help="Enable consistency checks for the heuristic")
     parser.add_argument("--ansicolors", "-ac", action="store_true",
                         help="Print the level on the console with ANSI colors (only works on some terminals)")
 
+    parser.add_argument("--stats", "-st", action="store_true", default=False,
+                        help="Print the statistics of the search (expanded nodes, peak frontier size, time, etc.)")
+
     args = parser.parse_args()
     try:
         main(args)
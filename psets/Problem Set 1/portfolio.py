@@ -0,0 +1,182 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import multiprocessing as mp
+import queue as queue_module
+import argparse, time, traceback
+
+from problem import Problem, Solution
+from search_stats import SearchStats
+
+# This file contains a portfolio solver which runs several search configurations in parallel (one process each)
+# on the same problem. The first result that satisfies the requested optimality guarantee wins and the other
+# processes are cancelled.
+
+# A search configuration is a search function from "search.py" with an optional heuristic and keyword arguments
+# "bound" is the suboptimality guarantee of the configuration on the problem:
+#   1 means that the solution is optimal, w means that it costs at most w times the optimal cost,
+#   and inf means that there is no guarantee
+# "complete" tells whether "no solution" from this configuration means that the problem is unsolvable
+@dataclass(frozen=True)
+class SearchConfig:
+    name: str
+    algorithm: str
+    heuristic: Optional[str] = None     # The heuristic as "module.function", e.g. "sokoban_heuristic.strong_heuristic"
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    bound: float = float('inf')
+    complete: bool = True
+
+# The outcome of one configuration
+# The status is "solved", "unsolvable", "failed", "timeout" or "cancelled"
+@dataclass
+class ConfigReport:
+    config: SearchConfig
+    status: str
+    elapsed: float = 0.0
+    solution: Solution = None
+    cost: Optional[float] = None
+    stats: Optional[SearchStats] = None
+    error: str = ""
+
+# The result of the portfolio: the winning report (None if no configuration satisfied the guarantee in time)
+# and the reports of every configuration
+@dataclass
+class PortfolioResult:
+    winner: Optional[ConfigReport]
+    reports: List[ConfigReport]
+
+    @property
+    def solution(self) -> Solution:
+        return None if self.winner is None else self.winner.solution
+
+# Returns a default portfolio for the given problem
+# BFS is only optimal if all the actions have the same cost, which is the case in Sokoban but not in parking
+def default_configs(problem: Problem) -> List[SearchConfig]:
+    from sokoban import SokobanProblem
+    if isinstance(problem, SokobanProblem):
+        return [
+            SearchConfig("bfs", "BreadthFirstSearch", bound=1),
+            SearchConfig("ucs", "UniformCostSearch", bound=1),
+            SearchConfig("astar-weak", "AStarSearch", "sokoban_heuristic.weak_heuristic", bound=1),
+            SearchConfig("astar-strong", "AStarSearch", "sokoban_heuristic.strong_heuristic", bound=1),
+            SearchConfig("gbfs-strong", "BestFirstSearch", "sokoban_heuristic.strong_heuristic"),
+        ]
+    configs = [
+        SearchConfig("ucs", "UniformCostSearch", bound=1),
+        SearchConfig("bfs", "BreadthFirstSearch"),
+        SearchConfig("dfs", "DepthFirstSearch"),
+    ]
+    from parking import ParkingProblem
+    if isinstance(problem, ParkingProblem):
+        configs.insert(1, SearchConfig("astar-parking", "AStarSearch", "parking_heuristic.parking_heuristic", bound=1))
+    return configs
+
+# Load a function given its path as "module.function"
+def load_function(path: str):
+    import importlib
+    module, name = path.rsplit(".", 1)
+    return getattr(importlib.import_module(module), name)
+
+# The body of a worker process: it runs one configuration and puts its report in the results queue
+def run_config(index: int, problem: Problem, config: SearchConfig, results: mp.Queue):
+    from functools import lru_cache
+    start = time.perf_counter()
+    try:
+        search_fn = load_function(f"search.{config.algorithm}")
+        stats = SearchStats()
+        initial_state = problem.get_initial_state()
+        if config.heuristic is None:
+            solution = search_fn(problem, initial_state, stats=stats, **config.kwargs)
+        else:
+            # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+            heuristic = lru_cache(2**16)(load_function(config.heuristic))
+            solution = search_fn(problem, initial_state, heuristic, stats=stats, **config.kwargs)
+        cost = None
+        if solution is not None:
+            cost, state = 0, initial_state
+            for action in solution:
+                cost += problem.get_cost(state, action)
+                state = problem.get_successor(state, action)
+        status = "unsolvable" if solution is None else "solved"
+        results.put((index, ConfigReport(config, status, time.perf_counter() - start, solution, cost, stats)))
+    except Exception:
+        results.put((index, ConfigReport(config, "failed", time.perf_counter() - start, error=traceback.format_exc())))
+
+# Run the configurations in parallel and return as soon as one of them satisfies the requested bound
+# (a solution from a configuration whose bound is at most "bound", or "no solution" from a complete configuration)
+# The remaining processes are then terminated. If "timeout" (in seconds) is reached, every process is terminated.
+def solve_portfolio(problem: Problem, configs: Optional[List[SearchConfig]] = None, bound: float = 1.0,
+                    timeout: Optional[float] = None) -> PortfolioResult:
+    if configs is None:
+        configs = default_configs(problem)
+    # We prefer fork (on Linux) since the children inherit the problem without pickling it
+    context = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+    results = context.Queue()
+    processes = [context.Process(target=run_config, args=(index, problem, config, results), daemon=True)
+                 for index, config in enumerate(configs)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    reports: List[Optional[ConfigReport]] = [None] * len(configs)
+    winner = None
+    try:
+        while winner is None and any(report is None for report in reports):
+            remaining = None if timeout is None else timeout - (time.perf_counter() - start)
+            if remaining is not None and remaining <= 0:
+                break
+            try:
+                index, report = results.get(timeout=remaining)
+            except queue_module.Empty:
+                break
+            reports[index] = report
+            if report.status == "solved" and report.config.bound <= bound:
+                winner = report
+            elif report.status == "unsolvable" and report.config.complete:
+                winner = report
+    finally:
+        # Cancel the processes that are still running
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+    elapsed = time.perf_counter() - start
+    for index, config in enumerate(configs):
+        if reports[index] is None:
+            reports[index] = ConfigReport(config, "cancelled" if winner is not None else "timeout", elapsed)
+    return PortfolioResult(winner, reports)
+
+def main(args: argparse.Namespace):
+    from problems import print_table
+    from problems import load_problem
+    problem = load_problem(args.problem)
+    result = solve_portfolio(problem, bound=args.bound, timeout=args.timeout)
+    rows = []
+    for report in result.reports:
+        stats = report.stats
+        rows.append([
+            report.config.name,
+            report.status + (" (winner)" if report is result.winner else ""),
+            "-" if report.cost is None else report.cost,
+            "-" if stats is None else stats.expanded,
+            "-" if stats is None else stats.peak_frontier,
+            f"{report.elapsed:.3f}",
+        ])
+    print_table(["Configuration", "Status", "Cost", "Expanded", "Peak frontier", "Time (s)"], rows)
+    for report in result.reports:
+        if report.error:
+            print(f"Configuration '{report.config.name}' failed:\n{report.error}")
+    if result.winner is None:
+        print("No configuration satisfied the requested bound in time")
+    elif result.solution is not None:
+        # Parking actions are tuples (car index, direction) which we print as the car index followed by the direction
+        format_action = lambda action: ''.join(str(part) for part in action) if isinstance(action, tuple) else str(action)
+        print("Solution:", ' '.join(format_action(action) for action in result.solution))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve a problem with a portfolio of search algorithms running in parallel")
+    parser.add_argument("problem", help="path to the problem (a level in 'levels/' or a parking lot in 'parks/')")
+    parser.add_argument("--bound", "-b", type=float, default=1.0,
+                        help="the required suboptimality bound (1 for optimal solutions, inf for any solution)")
+    parser.add_argument("--timeout", "-t", type=float, default=None, help="the time limit in seconds")
+    args = parser.parse_args()
+    main(args)
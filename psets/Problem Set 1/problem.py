@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Generic, Iterable, List, TypeVar, Union
+from typing import Any, Callable, Generic, Iterable, List, Tuple, TypeVar, Union
 from helpers.utils import CacheContainer, with_cache
 
 # S and A are used for generic typing where S represents the state type and A represents the action type
@@ -34,8 +34,34 @@ class Problem(ABC, Generic[S, A], CacheContainer):
     def get_cost(self, state: S, action: A) -> float:
         return 1.0
 
+    # These functions convert a state into a compact picklable value and back (used to send states between processes)
+    # The packed value must be hashable and equal packed values must mean equal states
+    # By default, the state itself is used
+    def pack_state(self, state: S) -> Any:
+        return state
+
+    def unpack_state(self, packed: Any) -> S:
+        return packed
+
 # These are type aliases for:
 # A solution which is a list of actions (or None if no solution is found)
 Solution = Union[List[A], None]
 # A heuristic function which estimates the path cost to the goal for a given state with a certain problem
-HeuristicFunction = Callable[[Problem[S, A], S],float]
\ No newline at end of file
+HeuristicFunction = Callable[[Problem[S, A], S],float]
+# An incremental heuristic computes the value of a successor from the value of its parent instead of from scratch
+# Along with its value, every state gets a memo (any data, such as a cost matrix and a matching) which is passed back
+# when evaluating its successors. The search functions that support it (such as A*) detect it with isinstance,
+# and it can still be called as a plain HeuristicFunction by the others
+class IncrementalHeuristic(ABC, Generic[S, A]):
+    # Return the value of a state and its memo (from scratch)
+    @abstractmethod
+    def evaluate(self, problem: Problem[S, A], state: S) -> Tuple[float, Any]:
+        pass
+
+    # Return the value and memo of the successor reached from a state (whose memo is given) by an action
+    @abstractmethod
+    def update(self, problem: Problem[S, A], state: S, memo: Any, action: A, successor: S) -> Tuple[float, Any]:
+        pass
+
+    def __call__(self, problem: Problem[S, A], state: S) -> float:
+        return self.evaluate(problem, state)[0]
@@ -0,0 +1,58 @@
+from typing import Callable, List
+from problem import Problem, S, A, Solution
+import os
+
+# This file contains helpers shared by the command line tools, the benchmarks and the search service:
+# loading a problem from a file, getting a heuristic by name, computing the cost of a solution and printing result tables
+#
+# Example:
+#   problem = load_problem("levels/level1.txt")
+#   heuristic = get_heuristic("strong")
+
+# Load a problem from a path based on the folder it is in
+def load_problem(path: str) -> Problem:
+    folder = os.path.basename(os.path.dirname(os.path.abspath(path)))
+    if folder == "parks":
+        from parking import ParkingProblem
+        return ParkingProblem.from_file(path)
+    if folder == "levels":
+        from sokoban import SokobanProblem
+        return SokobanProblem.from_file(path)
+    if folder == "graphs":
+        from graph import GraphRoutingProblem
+        return GraphRoutingProblem.from_file(path)
+    raise ValueError(f"Cannot deduce the problem type of '{path}'")
+
+# Compute the total cost of a solution
+def solution_cost(problem: Problem[S, A], initial_state: S, solution: Solution) -> float:
+    if solution is None: return None
+    cost, state = 0, initial_state
+    for action in solution:
+        cost += problem.get_cost(state, action)
+        state = problem.get_successor(state, action)
+    return cost
+
+# Return the heuristic with the given name
+def get_heuristic(name: str) -> Callable:
+    if name == "zero":
+        return lambda *_: 0
+    if name == "graph":
+        from graph import graphrouting_heuristic
+        return graphrouting_heuristic
+    if name in ("distance", "parking"):
+        import parking_heuristic
+        return getattr(parking_heuristic, f"{name}_heuristic")
+    if name == "pattern":
+        from sokoban_pdb import pattern_heuristic
+        return pattern_heuristic
+    import sokoban_heuristic
+    return getattr(sokoban_heuristic, f"{name}_heuristic")
+
+# Print a list of rows as an aligned table
+def print_table(header: List[str], rows: List[List[object]]):
+    rows = [[str(cell) for cell in row] for row in rows]
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+    print('  '.join(cell.ljust(width) for cell, width in zip(header, widths)))
+    print('  '.join('-' * width for width in widths))
+    for row in rows:
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)))
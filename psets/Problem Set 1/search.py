@@ -1,21 +1,11 @@
-from problem import HeuristicFunction, Problem, S, A, Solution
+from problem import HeuristicFunction, IncrementalHeuristic, Problem, S, A, Solution
+from typing import Callable, Iterator, List, Optional, Tuple
 from collections import deque
 from helpers.utils import NotImplemented
+from search_stats import SearchStats, with_stats
 
 #TODO: Import any modules you want to use
-import heapq
-
-def pop_frontier(frontier):
-    i = 0
-    min_cost, min_state, curr_path = frontier[0]
-    for index, (cost, state, path) in enumerate(frontier):
-        if (min_cost > cost):
-            min_cost = cost
-            min_state = state
-            curr_path = path
-            i = index
-    del frontier[i]
-    return min_cost, min_state, curr_path
+import heapq, time
 
 # All search functions take a problem and a state
 # If it is an informed search function, it will also receive a heuristic function
@@ -25,95 +15,498 @@ def pop_frontier(frontier):
 # 1. A list of actions which represent the path from the initial state to the final state
 # 2. None if there is no solution
 
-def BreadthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
+# All the search functions also accept an optional keyword argument "stats" (a SearchStats object)
+# If it is given, the search records its work in it (see search_stats.py). Otherwise, no bookkeeping is done.
+
+# Every algorithm is implemented as a step generator which yields its frontier after each expansion and returns the solution
+# This allows running a search step by step (see search_stepper.py) to bound its time or number of expansions,
+# or to interleave it with other work. The search functions below simply run their generator to completion.
+
+# Run a step generator to completion and return its solution
+def run_steps(steps: Iterator) -> Solution:
+    try:
+        while True:
+            next(steps)
+    except StopIteration as stop:
+        return stop.value
+
+# Instead of copying the path taken into every generated node, each node only stores a pointer to its parent
+# A node is a tuple (parent node, action) and the node of the initial state is None
+# The actions are only collected (by following the parent pointers) once a goal is found
+Node = Optional[Tuple["Node", A]]
+
+def reconstruct_path(node: Node, stats: Optional[SearchStats] = None) -> List[A]:
+    if stats is not None:
+        with stats.phase("reconstruct"):
+            return reconstruct_path(node)
+    path = []
+    while node is not None:
+        node, action = node
+        path.append(action)
+    path.reverse()
+    return path
+
+def breadth_first_steps(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Iterator:
     queue = deque()
-    queue.append((initial_state, []))
+    queue.append((initial_state, None))
     visited = set([initial_state])
     while queue:
-        state, path_taken = queue.popleft()
+        state, node = queue.popleft()
+        if stats is not None: stats.expanded += 1
         for action in problem.get_actions(state):
             successor = problem.get_successor(state, action)
-            if successor not in visited and successor not in queue:
+            if stats is not None: stats.generated += 1
+            if successor not in visited:
                 if problem.is_goal(successor):
-                    return path_taken + [action]
-                queue.append((successor, path_taken + [action]))
+                    return reconstruct_path((node, action), stats)
+                queue.append((successor, (node, action)))
                 visited.add(successor)
+            elif stats is not None: stats.duplicates += 1
+        if stats is not None: stats.record_sizes(len(queue), len(visited))
+        yield queue
     return None
 
-def DepthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
-    stack = [(initial_state, [])]
+@with_stats
+def BreadthFirstSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Solution:
+    return run_steps(breadth_first_steps(problem, initial_state, stats))
+
+def depth_first_steps(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Iterator:
+    stack = [(initial_state, None)]
     visited = set([initial_state])
     while stack:
-        state, path_taken = stack.pop()
+        state, node = stack.pop()
         if problem.is_goal(state):
-            return path_taken
+            return reconstruct_path(node, stats)
+        if stats is not None: stats.expanded += 1
         for action in problem.get_actions(state):
             successor = problem.get_successor(state, action)
+            if stats is not None: stats.generated += 1
             if successor not in visited:
                 visited.add(successor)
-                stack.append((successor, path_taken + [action]))
+                stack.append((successor, (node, action)))
+            elif stats is not None: stats.duplicates += 1
+        if stats is not None: stats.record_sizes(len(stack), len(visited))
+        yield stack
     return None
 
-def UniformCostSearch(problem: Problem[S, A], initial_state: S) -> Solution:
-    frontier = [(0, initial_state, [])]  # (cost, state, path)
-    visited = dict([(initial_state, 0)])  # state: cost
+@with_stats
+def DepthFirstSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Solution:
+    return run_steps(depth_first_steps(problem, initial_state, stats))
+
+def uniform_cost_steps(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Iterator:
+    # The frontier is a binary heap of (cost, order, state, node) where "order" is the order in which the state was first added
+    # Ties in cost are broken by that order, so states with equal cost are expanded first in first out
+    frontier = [(0, 0, initial_state, None)]
+    visited = {initial_state: (0, 0)}  # state: (cost, order)
     explored = set()
+    counter = 0
     while frontier:
-        cost, state, path_taken = pop_frontier(frontier)
+        cost, _, state, node = heapq.heappop(frontier)
+        # A state may have older (more expensive) entries left in the heap after its cost was improved, we skip them (lazy deletion)
+        if state in explored:
+            continue
         if problem.is_goal(state):
-            return path_taken
+            return reconstruct_path(node, stats)
 
         explored.add(state)
+        if stats is not None: stats.expanded += 1
         for action in problem.get_actions(state):
             successor = problem.get_successor(state, action)
             new_cost = cost + problem.get_cost(state, action)
-            if successor not in explored and successor not in visited:
-                visited[successor] = new_cost
-                frontier.append((new_cost, successor, path_taken + [action]))
-            elif successor in visited and new_cost < visited[successor]:
-                visited[successor] = new_cost
-                for index, (_, s, _) in enumerate(frontier):
-                    if s == successor:
-                        frontier[index] = (new_cost, successor, path_taken + [action])
-                        break
+            if stats is not None: stats.generated += 1
+            if successor not in visited:
+                counter += 1
+                visited[successor] = (new_cost, counter)
+                heapq.heappush(frontier, (new_cost, counter, successor, (node, action)))
+            elif successor not in explored and new_cost < visited[successor][0]:
+                # Decrease-key: the new entry keeps the original order of the state so it keeps its place among equal costs
+                order = visited[successor][1]
+                visited[successor] = (new_cost, order)
+                heapq.heappush(frontier, (new_cost, order, successor, (node, action)))
+                if stats is not None: stats.reopened += 1
+            elif stats is not None: stats.duplicates += 1
+        if stats is not None: stats.record_sizes(len(frontier), len(visited))
+        yield frontier
     return None
 
-def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
+@with_stats
+def UniformCostSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Solution:
+    return run_steps(uniform_cost_steps(problem, initial_state, stats))
+
+# If the heuristic is an IncrementalHeuristic, every frontier entry also keeps the heuristic memo of its state,
+# and the heuristic of a successor is updated from the memo of its parent
+def astar_steps(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: Optional[SearchStats] = None) -> Iterator:
+    incremental = heuristic if isinstance(heuristic, IncrementalHeuristic) else None
+    if stats is not None and incremental is None: heuristic = stats.count_heuristic(heuristic)
     frontier = []
     counter = 0
     current_costs = {initial_state: 0}
-    heapq.heappush(frontier, (heuristic(problem, initial_state), counter, (initial_state, 0, [])))  # (h, counter, (state, cost, path))
+    if incremental is None:
+        h, memo = heuristic(problem, initial_state), None
+    else:
+        h, memo = incremental.evaluate(problem, initial_state)
+        if stats is not None: stats.heuristic_calls += 1
+    heapq.heappush(frontier, (h, counter, (initial_state, 0, None, memo)))  # (f, counter, (state, cost, node, memo))
     while frontier:
-        _, _, (state, cost,  path_taken) = heapq.heappop(frontier)
+        _, _, (state, cost, node, memo) = heapq.heappop(frontier)
         if problem.is_goal(state):
-            return path_taken
+            return reconstruct_path(node, stats)
 
+        if stats is not None: stats.expanded += 1
         for action in problem.get_actions(state):
             successor = problem.get_successor(state, action)
             n_cost = cost + problem.get_cost(state, action)
+            if stats is not None: stats.generated += 1
             if successor not in current_costs or n_cost < current_costs[successor]:
+                if stats is not None and successor in current_costs: stats.reopened += 1
                 counter += 1
                 current_costs[successor] = n_cost
-                heapq.heappush(frontier, (heuristic(problem, successor) + n_cost, counter, (successor, n_cost, path_taken + [action])))
+                if incremental is None:
+                    h, successor_memo = heuristic(problem, successor), None
+                else:
+                    h, successor_memo = incremental.update(problem, state, memo, action, successor)
+                    if stats is not None: stats.heuristic_calls += 1
+                heapq.heappush(frontier, (h + n_cost, counter, (successor, n_cost, (node, action), successor_memo)))
+            elif stats is not None: stats.duplicates += 1
+        if stats is not None: stats.record_sizes(len(frontier), len(current_costs))
+        yield frontier
 
     return None
 
+@with_stats
+def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: Optional[SearchStats] = None) -> Solution:
+    return run_steps(astar_steps(problem, initial_state, heuristic, stats))
+
 
-def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
+def best_first_steps(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: Optional[SearchStats] = None) -> Iterator:
+    if stats is not None: heuristic = stats.count_heuristic(heuristic)
     frontier = []
     counter = 0
-    heapq.heappush(frontier, (heuristic(problem, initial_state), counter, (initial_state, [])))  # (h, counter, (state, path))
+    heapq.heappush(frontier, (heuristic(problem, initial_state), counter, (initial_state, None)))  # (h, counter, (state, node))
     visited = set([initial_state])
     while frontier:
-        _, _, (state, path_taken) = heapq.heappop(frontier)
+        _, _, (state, node) = heapq.heappop(frontier)
         if problem.is_goal(state):
-            return path_taken
+            return reconstruct_path(node, stats)
 
+        if stats is not None: stats.expanded += 1
         for action in problem.get_actions(state):
             successor = problem.get_successor(state, action)
+            if stats is not None: stats.generated += 1
             if successor not in visited:
                 counter += 1
-                heapq.heappush(frontier, (heuristic(problem, successor), counter, (successor, path_taken + [action])))
+                heapq.heappush(frontier, (heuristic(problem, successor), counter, (successor, (node, action))))
                 visited.add(successor)
+            elif stats is not None: stats.duplicates += 1
+        if stats is not None: stats.record_sizes(len(frontier), len(visited))
+        yield frontier
+
+    return None
+
+@with_stats
+def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: Optional[SearchStats] = None) -> Solution:
+    return run_steps(best_first_steps(problem, initial_state, heuristic, stats))
+
+
+# Iterative Deepening A* runs a series of depth first searches, each one limited to the nodes with f = g + h below a threshold
+# The first threshold is h(initial state) and every following one is the smallest f that exceeded the previous threshold
+# Only the current path is stored so the memory is linear in the depth, and states on the current path are skipped to avoid cycles
+# If "table_size" is not zero, a transposition table remembers the cheapest cost at which each state was reached in this iteration
+# (up to "table_size" states) so that reaching the same state again with a cost that is not cheaper is pruned
+# For IDA*, the peak frontier size is the maximum depth of the stack and the closed set is the transposition table
+# Its frontier is the stack of (state, cost, iterator over the untried actions) along the current path
+def iterative_deepening_astar_steps(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, table_size: int = 0,
+                                    stats: Optional[SearchStats] = None) -> Iterator:
+    if stats is not None: heuristic = stats.count_heuristic(heuristic)
+    if problem.is_goal(initial_state):
+        return []
+    exhausted = object() # A sentinel returned by "next" once all the actions of a state were tried
+    threshold = heuristic(problem, initial_state)
+    while threshold < float('inf'):
+        next_threshold = float('inf')
+        table = {initial_state: 0}
+        on_path = {initial_state}
+        path_taken = []
+        # The stack holds the states on the current path with their costs and the actions that were not tried yet
+        stack = [(initial_state, 0, iter(problem.get_actions(initial_state)))]
+        if stats is not None: stats.expanded += 1
+        while stack:
+            state, cost, actions = stack[-1]
+            action = next(actions, exhausted)
+            if action is exhausted:
+                # All the actions were tried so we backtrack to the parent
+                stack.pop()
+                on_path.remove(state)
+                if path_taken: path_taken.pop()
+                continue
+            successor = problem.get_successor(state, action)
+            if stats is not None: stats.generated += 1
+            if successor in on_path:
+                if stats is not None: stats.duplicates += 1
+                continue
+            n_cost = cost + problem.get_cost(state, action)
+            f = n_cost + heuristic(problem, successor)
+            if f > threshold:
+                next_threshold = min(next_threshold, f)
+                continue
+            if table_size:
+                previous = table.get(successor)
+                if previous is not None and previous <= n_cost:
+                    if stats is not None: stats.duplicates += 1
+                    continue
+                if previous is not None or len(table) < table_size:
+                    if stats is not None and previous is not None: stats.reopened += 1
+                    table[successor] = n_cost
+            path_taken.append(action)
+            # Since the threshold never exceeds the optimal cost, the first goal within the threshold is optimal
+            if problem.is_goal(successor):
+                return path_taken
+            on_path.add(successor)
+            stack.append((successor, n_cost, iter(problem.get_actions(successor))))
+            if stats is not None:
+                stats.expanded += 1
+                stats.record_sizes(len(stack), len(table))
+            yield stack
+        threshold = next_threshold
+    return None
+
+@with_stats
+def IterativeDeepeningAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, table_size: int = 0,
+                                  stats: Optional[SearchStats] = None) -> Solution:
+    return run_steps(iterative_deepening_astar_steps(problem, initial_state, heuristic, table_size, stats))
+
+# Weighted A* orders the frontier by f = g + w * h, with a weight w >= 1
+# It expands fewer nodes than A* by trusting the heuristic more, and with a consistent heuristic
+# the cost of the returned solution is at most w times the optimal cost (w = 1 is exactly A*)
+def weighted_astar_steps(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, weight: float = 2.0,
+                         stats: Optional[SearchStats] = None) -> Iterator:
+    return astar_steps(problem, initial_state, lambda problem, state: weight * heuristic(problem, state), stats)
+
+@with_stats
+def WeightedAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, weight: float = 2.0,
+                        stats: Optional[SearchStats] = None) -> Solution:
+    return run_steps(weighted_astar_steps(problem, initial_state, heuristic, weight, stats))
+
+# Anytime Repairing A* (ARA*) runs a series of weighted A* searches with decreasing weights
+# Each search reuses the work of the previous one: the costs found so far are kept and only the states
+# whose cost was improved since they were expanded (the inconsistent states) are expanded again
+# After each search, it yields (solution, cost, bound) where "bound" is the current suboptimality bound:
+# the found cost is at most "bound" times the optimal cost (assuming a consistent heuristic)
+# If a deadline (as returned by time.perf_counter) is given, the search stops once it is reached
+def anytime_astar_solutions(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, weight: float = 3.0,
+                            decrement: float = 0.5, deadline: Optional[float] = None,
+                            stats: Optional[SearchStats] = None) -> Iterator[Tuple[List[A], float, float]]:
+    if stats is not None: heuristic = stats.count_heuristic(heuristic)
+    inf = float('inf')
+    h_values = {initial_state: heuristic(problem, initial_state)} # The heuristic is computed once per state
+    costs = {initial_state: 0}      # The best known cost of every reached state
+    nodes = {initial_state: None}   # The node of the best known path to every reached state
+    counter = 0
+    frontier = [(weight * h_values[initial_state], counter, 0, initial_state)] # (g + w * h, counter, g, state)
+    closed = set()      # The states expanded in the current search
+    inconsistent = set()  # The states whose cost improved after they were expanded in the current search
+    goal_cost, goal_node = (0, None) if problem.is_goal(initial_state) else (inf, None)
+    while True:
+        # Improve the path: expand until no state in the frontier can lead to a cheaper solution under the current weight
+        while frontier:
+            f, _, cost, state = frontier[0]
+            # Skip the entries whose cost was improved since they were pushed or whose state was expanded (lazy deletion)
+            if cost != costs[state] or state in closed:
+                heapq.heappop(frontier)
+                continue
+            if goal_cost <= f or (deadline is not None and time.perf_counter() >= deadline):
+                break
+            heapq.heappop(frontier)
+            closed.add(state)
+            node = nodes[state]
+            if stats is not None: stats.expanded += 1
+            for action in problem.get_actions(state):
+                successor = problem.get_successor(state, action)
+                n_cost = cost + problem.get_cost(state, action)
+                if stats is not None: stats.generated += 1
+                if n_cost >= costs.get(successor, inf):
+                    if stats is not None: stats.duplicates += 1
+                    continue
+                if stats is not None and successor in costs: stats.reopened += 1
+                costs[successor] = n_cost
+                nodes[successor] = (node, action)
+                if successor not in h_values:
+                    h_values[successor] = heuristic(problem, successor)
+                if problem.is_goal(successor) and n_cost < goal_cost:
+                    goal_cost, goal_node = n_cost, nodes[successor]
+                if successor in closed:
+                    inconsistent.add(successor)
+                else:
+                    counter += 1
+                    heapq.heappush(frontier, (n_cost + weight * h_values[successor], counter, n_cost, successor))
+            if stats is not None: stats.record_sizes(len(frontier), len(costs))
+        timed_out = deadline is not None and time.perf_counter() >= deadline
+        if goal_cost < inf:
+            # Every cheaper solution must pass through a state in the frontier or an inconsistent state,
+            # so the minimum g + h over these states is a lower bound on the optimal cost
+            lower_bound = min((costs[state] + h_values[state] for _, _, cost, state in frontier if cost == costs[state]), default=inf)
+            lower_bound = min([lower_bound] + [costs[state] + h_values[state] for state in inconsistent])
+            bound = 1.0 if lower_bound >= goal_cost else (min(weight, goal_cost / lower_bound) if lower_bound > 0 else weight)
+            yield reconstruct_path(goal_node, stats), goal_cost, bound
+            if bound <= 1.0:
+                return
+        if timed_out or weight <= 1.0 or (not frontier and not inconsistent):
+            return
+        # Decrease the weight, move the inconsistent states back to the frontier and reorder it with the new weight
+        weight = max(1.0, weight - decrement)
+        entries = {state for _, _, cost, state in frontier if cost == costs[state]} | inconsistent
+        frontier = [(costs[state] + weight * h_values[state], counter + index, costs[state], state) for index, state in enumerate(entries)]
+        counter += len(frontier)
+        heapq.heapify(frontier)
+        closed.clear()
+        inconsistent.clear()
+
+# Runs ARA* until the time budget (in seconds) is exhausted or an optimal solution is found, and returns the best solution
+# "report" (if given) is called with (solution, cost, bound) every time a solution is found
+@with_stats
+def AnytimeAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, time_budget: float = 1.0,
+                       weight: float = 3.0, decrement: float = 0.5,
+                       report: Optional[Callable[[List[A], float, float], None]] = None,
+                       stats: Optional[SearchStats] = None) -> Solution:
+    deadline = time.perf_counter() + time_budget
+    best = None
+    for solution, cost, bound in anytime_astar_solutions(problem, initial_state, heuristic, weight, decrement, deadline, stats):
+        best = solution
+        if report is not None:
+            report(solution, cost, bound)
+    return best
+
+# Bidirectional search runs a forward search from the initial state and a backward search from the goal until they meet in the middle
+# It only works for problems with a single goal that can be reversed via "problem.reverse(initial_state)"
+# which must return the problem of going from the goal back to the initial state (such as GraphRoutingProblem)
+# In these problems, an action is the state it leads to, so the backward half of the path is the sequence of states back to the goal
+
+# Join the nodes of the state where both searches met into the full list of actions
+def join_bidirectional_path(forward_node: Node, backward_node: Node, goal: S, stats: Optional[SearchStats] = None) -> List[A]:
+    path = reconstruct_path(forward_node, stats)
+    # The backward actions lead from the goal to the meeting state: [s1, s2, ..., meeting]
+    # so the forward actions after the meeting state are [..., s2, s1, goal]
+    backward_path = reconstruct_path(backward_node, stats)
+    if backward_path:
+        path.extend(reversed(backward_path[:-1]))
+        path.append(goal)
+    return path
+
+# Its frontier is the pair of (forward, backward) queues
+def bidirectional_breadth_first_steps(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Iterator:
+    if problem.is_goal(initial_state):
+        return []
+    reverse = problem.reverse(initial_state)
+    goal = reverse.get_initial_state()
+    # Each direction has a queue holding its current layer and a dictionary mapping every visited state to its node
+    searches = [(problem, deque([initial_state]), {initial_state: None}), (reverse, deque([goal]), {goal: None})]
+    while searches[0][1] and searches[1][1]:
+        # Expand a full layer from the direction with the smaller layer
+        # We cannot stop at the first meeting since another meeting in the same layer may be closer to the other end
+        direction = 0 if len(searches[0][1]) <= len(searches[1][1]) else 1
+        current, queue, nodes = searches[direction]
+        other_nodes = searches[1 - direction][2]
+        best_length, meeting = None, None
+        for _ in range(len(queue)):
+            state = queue.popleft()
+            node = nodes[state]
+            if stats is not None: stats.expanded += 1
+            for action in current.get_actions(state):
+                successor = current.get_successor(state, action)
+                if stats is not None: stats.generated += 1
+                if successor in nodes:
+                    if stats is not None: stats.duplicates += 1
+                    continue
+                nodes[successor] = (node, action)
+                queue.append(successor)
+                if successor in other_nodes:
+                    length = len(reconstruct_path(other_nodes[successor]))
+                    if best_length is None or length < best_length:
+                        best_length, meeting = length, successor
+            yield searches[0][1], searches[1][1]
+        if stats is not None:
+            stats.record_sizes(len(searches[0][1]) + len(searches[1][1]), len(searches[0][2]) + len(searches[1][2]))
+        if meeting is not None:
+            return join_bidirectional_path(searches[0][2][meeting], searches[1][2][meeting], goal, stats)
+    return None
+
+@with_stats
+def BidirectionalBreadthFirstSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Solution:
+    return run_steps(bidirectional_breadth_first_steps(problem, initial_state, stats))
+
+# Bidirectional best first search where each direction is an A* search towards the other end
+# The backward search estimates the cost to the initial state by calling the heuristic on the reversed problem
+# "stop" decides when the best path found so far cannot be improved given the minimum f of both frontiers
+# Its frontier is the pair of (forward, backward) heaps of (f, counter, state)
+def bidirectional_best_first_steps(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction,
+                                   stop: Callable[[float, float, float], bool], stats: Optional[SearchStats] = None) -> Iterator:
+    if stats is not None: heuristic = stats.count_heuristic(heuristic)
+    if problem.is_goal(initial_state):
+        return []
+    reverse = problem.reverse(initial_state)
+    goal = reverse.get_initial_state()
+    counter = 0
+    # Each direction has its problem, a heap of (f, counter, state), the best known cost and node of every state and the closed set
+    searches = []
+    for current, start in ((problem, initial_state), (reverse, goal)):
+        searches.append((current, [(heuristic(current, start), counter, start)], {start: 0}, {start: None}, set()))
+    best_cost, meeting = float('inf'), None
+    while searches[0][1] and searches[1][1]:
+        # Drop the entries of states that were already expanded through a cheaper path (lazy deletion)
+        for _, frontier, _, _, closed in searches:
+            while frontier and frontier[0][2] in closed:
+                heapq.heappop(frontier)
+        if not searches[0][1] or not searches[1][1]:
+            break
+        if stop(best_cost, searches[0][1][0][0], searches[1][1][0][0]):
+            break
+        # Expand from the direction with the smaller frontier
+        direction = 0 if len(searches[0][1]) <= len(searches[1][1]) else 1
+        current, frontier, costs, nodes, closed = searches[direction]
+        _, _, other_costs, _, _ = searches[1 - direction]
+        _, _, state = heapq.heappop(frontier)
+        closed.add(state)
+        cost, node = costs[state], nodes[state]
+        if stats is not None: stats.expanded += 1
+        for action in current.get_actions(state):
+            successor = current.get_successor(state, action)
+            new_cost = cost + current.get_cost(state, action)
+            if stats is not None: stats.generated += 1
+            if successor in closed or new_cost >= costs.get(successor, float('inf')):
+                if stats is not None: stats.duplicates += 1
+                continue
+            if stats is not None and successor in costs: stats.reopened += 1
+            costs[successor] = new_cost
+            nodes[successor] = (node, action)
+            counter += 1
+            heapq.heappush(frontier, (new_cost + heuristic(current, successor), counter, successor))
+            # If the other direction reached this state, we found a path through it
+            if successor in other_costs and new_cost + other_costs[successor] < best_cost:
+                best_cost, meeting = new_cost + other_costs[successor], successor
+        if stats is not None:
+            stats.record_sizes(len(searches[0][1]) + len(searches[1][1]), len(searches[0][2]) + len(searches[1][2]))
+        yield searches[0][1], searches[1][1]
+    if meeting is None:
+        return None
+    return join_bidirectional_path(searches[0][3][meeting], searches[1][3][meeting], goal, stats)
+
+# Bidirectional Dijkstra: every path not found yet goes through a state in each frontier,
+# so it costs at least the sum of the minimum costs of both frontiers
+def bidirectional_uniform_cost_steps(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Iterator:
+    return bidirectional_best_first_steps(problem, initial_state, lambda *_: 0,
+                                          lambda best, forward, backward: forward + backward >= best, stats)
+
+@with_stats
+def BidirectionalUniformCostSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Solution:
+    return run_steps(bidirectional_uniform_cost_steps(problem, initial_state, stats))
+
+# Bidirectional A* (with a consistent heuristic): every path not found yet goes through a state in each frontier,
+# so it costs at least the minimum f of either frontier
+def bidirectional_astar_steps(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction,
+                              stats: Optional[SearchStats] = None) -> Iterator:
+    return bidirectional_best_first_steps(problem, initial_state, heuristic,
+                                          lambda best, forward, backward: max(forward, backward) >= best, stats)
 
-    return None
\ No newline at end of file
+@with_stats
+def BidirectionalAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: Optional[SearchStats] = None) -> Solution:
+    return run_steps(bidirectional_astar_steps(problem, initial_state, heuristic, stats))
@@ -0,0 +1,193 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+import asyncio, time, traceback
+
+from problem import Problem
+from search_stats import SearchStats
+
+# This file contains an asyncio front end that serves many search queries concurrently
+# - Incoming requests are queued and dispatched in batches to a pool of worker processes
+# - Identical requests that are in flight at the same time share a single search
+# - Each worker keeps the problems it loaded in memory, so a problem file is only parsed once per worker
+#
+# Example:
+#   async with SearchService(workers=2) as service:
+#       response = await service.query(SearchRequest("graphs/graph2.json", start="A", goal="F"))
+
+# A search query. "start" and "goal" are node names that override the start and goal of a graph routing problem
+# The heuristic is a name known by problems.get_heuristic, by default it is chosen based on the problem type
+# If "timeout" (in seconds) is given, the search is stopped once it is reached and the response status is "timeout"
+@dataclass(frozen=True)
+class SearchRequest:
+    path: str
+    start: Optional[str] = None
+    goal: Optional[str] = None
+    algorithm: str = "astar"
+    heuristic: Optional[str] = None
+    timeout: Optional[float] = None
+
+# The answer to a query. The status is "solved", "unsolvable", "timeout" or "failed"
+# The actions are converted to strings so that the response is small and does not depend on the problem classes
+@dataclass
+class SearchResponse:
+    request: SearchRequest
+    status: str
+    solution: Optional[List[str]] = None
+    cost: Optional[float] = None
+    expanded: int = 0
+    elapsed: float = 0.0    # The time spent searching in the worker (in seconds)
+    error: str = ""
+
+# The problems loaded by the current worker process: path -> (problem, node names -> graph nodes)
+loaded_problems: Dict[str, Tuple[Problem, Dict[str, object]]] = {}
+
+# Return the problem of a request, loading it only the first time its path is requested by this worker
+def get_problem(request: SearchRequest) -> Problem:
+    from problems import load_problem
+    from graph import GraphRoutingProblem
+    if request.path not in loaded_problems:
+        problem = load_problem(request.path)
+        nodes = {node.name: node for node in problem.adjacency} if isinstance(problem, GraphRoutingProblem) else {}
+        loaded_problems[request.path] = (problem, nodes)
+    problem, nodes = loaded_problems[request.path]
+    if request.start is None and request.goal is None:
+        return problem
+    if not isinstance(problem, GraphRoutingProblem):
+        raise ValueError("Only graph routing problems accept a start and a goal")
+    # The new problem shares the graph of the loaded one so it is cheap to create
+    start = nodes[request.start] if request.start is not None else problem.start
+    goal = nodes[request.goal] if request.goal is not None else problem.goal
+    return GraphRoutingProblem(start, goal, problem.adjacency, problem.reverse_adjacency)
+
+# Return the default heuristic name for a problem
+def default_heuristic(problem: Problem) -> str:
+    from graph import GraphRoutingProblem
+    from sokoban import SokobanProblem
+    if isinstance(problem, GraphRoutingProblem): return "graph"
+    if isinstance(problem, SokobanProblem): return "strong"
+    return "zero"
+
+# Solve a single request (in a worker process)
+def solve_request(request: SearchRequest) -> SearchResponse:
+    from problems import get_heuristic, solution_cost
+    from search_stepper import SearchStepper
+    from graph import GraphRoutingProblem
+    from helpers.utils import fetch_recorded_calls
+    start = time.perf_counter()
+    try:
+        problem = get_problem(request)
+        initial_state = problem.get_initial_state()
+        heuristic = None
+        if request.algorithm in ("astar", "gbfs", "idastar", "wastar", "biastar"):
+            heuristic = get_heuristic(request.heuristic or default_heuristic(problem))
+        stats = SearchStats()
+        stepper = SearchStepper.create(request.algorithm, problem, initial_state, heuristic, stats=stats)
+        done = stepper.run(timeout=request.timeout)
+        # The graph problem records every call to get_actions (for the autograder), which would grow forever in a long running worker
+        fetch_recorded_calls(GraphRoutingProblem.get_actions)
+        elapsed = time.perf_counter() - start
+        if not done:
+            return SearchResponse(request, "timeout", expanded=stats.expanded, elapsed=elapsed)
+        if stepper.solution is None:
+            return SearchResponse(request, "unsolvable", expanded=stats.expanded, elapsed=elapsed)
+        cost = solution_cost(problem, initial_state, stepper.solution)
+        # Parking actions are tuples (car index, direction) which we write as the car index followed by the direction
+        solution = [''.join(str(part) for part in action) if isinstance(action, tuple) else str(action) for action in stepper.solution]
+        return SearchResponse(request, "solved", solution, cost, stats.expanded, elapsed)
+    except Exception:
+        return SearchResponse(request, "failed", elapsed=time.perf_counter() - start, error=traceback.format_exc())
+
+# Solve a batch of requests in one call, so that the batch is sent to the worker in a single message
+def solve_batch(requests: List[SearchRequest]) -> List[SearchResponse]:
+    return [solve_request(request) for request in requests]
+
+# The service queues the requests and runs "workers" dispatchers, each one sending batches of up to "batch_size" queued
+# requests to the process pool and waiting for their responses
+class SearchService:
+    def __init__(self, workers: int = 2, batch_size: int = 8) -> None:
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue: Optional[asyncio.Queue] = None
+        self.in_flight: Dict[SearchRequest, asyncio.Future] = {}  # The pending requests and the futures of their responses
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.dispatchers: List[asyncio.Task] = []
+        self.searches = 0       # The number of searches sent to the workers
+        self.deduplicated = 0   # The number of queries answered by a search that was already in flight
+
+    async def start(self):
+        # We prefer fork (on Linux) since the workers inherit the imported modules
+        context = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=context)
+        self.queue = asyncio.Queue()
+        self.dispatchers = [asyncio.create_task(self.dispatch()) for _ in range(self.workers)]
+
+    async def close(self):
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        await asyncio.gather(*self.dispatchers, return_exceptions=True)
+        self.dispatchers = []
+        # Fail the queries that were not answered
+        for future in self.in_flight.values():
+            if not future.done():
+                future.set_exception(RuntimeError("The search service was closed"))
+        self.in_flight.clear()
+        self.pool.shutdown(cancel_futures=True)
+
+    async def __aenter__(self) -> "SearchService":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    # Answer a query. If an identical query is in flight, it waits for the response of that query instead of searching again
+    async def query(self, request: SearchRequest) -> SearchResponse:
+        future = self.in_flight.get(request)
+        if future is not None:
+            self.deduplicated += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self.in_flight[request] = future
+            self.queue.put_nowait(request)
+        # The future is shielded so that cancelling one of the waiting queries does not cancel the others
+        return await asyncio.shield(future)
+
+    # Take batches of requests from the queue and solve them in the process pool
+    async def dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            self.searches += len(batch)
+            try:
+                responses = await loop.run_in_executor(self.pool, solve_batch, batch)
+            except Exception as error:
+                # The worker crashed (or the pool was shut down), so every query in the batch fails
+                responses = [SearchResponse(request, "failed", error=repr(error)) for request in batch]
+            for request, response in zip(batch, responses):
+                future = self.in_flight.pop(request, None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+
+# A stand-in for a remote client which sends its queries to a service running in the same event loop
+# It records the latency (in seconds) of every query it sent
+class LocalClient:
+    def __init__(self, service: SearchService) -> None:
+        self.service = service
+        self.latencies: List[float] = []
+
+    async def route(self, path: str, start: str, goal: str, algorithm: str = "astar") -> SearchResponse:
+        return await self.send(SearchRequest(path, start, goal, algorithm))
+
+    async def solve(self, path: str, algorithm: str = "astar", heuristic: Optional[str] = None,
+                    timeout: Optional[float] = None) -> SearchResponse:
+        return await self.send(SearchRequest(path, algorithm=algorithm, heuristic=heuristic, timeout=timeout))
+
+    async def send(self, request: SearchRequest) -> SearchResponse:
+        start = time.perf_counter()
+        response = await self.service.query(request)
+        self.latencies.append(time.perf_counter() - start)
+        return response
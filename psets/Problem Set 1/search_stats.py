@@ -0,0 +1,70 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+from contextlib import contextmanager
+from functools import wraps
+import time
+
+from problem import HeuristicFunction
+
+# SearchStats records how much work a search did
+# Every search function in "search.py" accepts an optional "stats" argument, and fills it if it is given
+# If the same object is passed to multiple searches, the counters and times are accumulated and the peaks are maximized
+@dataclass
+class SearchStats:
+    expanded: int = 0           # The number of states whose actions were generated
+    generated: int = 0          # The number of successors generated
+    duplicates: int = 0         # The number of generated successors that were pruned since they were already reached
+    reopened: int = 0           # The number of already reached states that were added again to the frontier with a cheaper cost
+    heuristic_calls: int = 0    # The number of heuristic evaluations
+    peak_frontier: int = 0      # The maximum size of the frontier (including stale entries that were not popped yet)
+    peak_closed: int = 0        # The maximum size of the set (or dictionary) of reached states
+    wall_time: Dict[str, float] = field(default_factory=dict)   # The wall clock time (in seconds) spent in each phase
+    cpu_time: Dict[str, float] = field(default_factory=dict)    # The CPU time (in seconds) spent in each phase
+
+    # Update the peak frontier and closed set sizes
+    def record_sizes(self, frontier: int, closed: int):
+        if frontier > self.peak_frontier: self.peak_frontier = frontier
+        if closed > self.peak_closed: self.peak_closed = closed
+
+    # Measure the wall and CPU time spent inside a "with" block and add it to the given phase
+    @contextmanager
+    def phase(self, name: str):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        finally:
+            self.wall_time[name] = self.wall_time.get(name, 0.0) + time.perf_counter() - wall_start
+            self.cpu_time[name] = self.cpu_time.get(name, 0.0) + time.process_time() - cpu_start
+
+    # Wrap a heuristic function to count how many times it is called
+    def count_heuristic(self, heuristic: HeuristicFunction) -> HeuristicFunction:
+        def counted_heuristic(problem, state):
+            self.heuristic_calls += 1
+            return heuristic(problem, state)
+        return counted_heuristic
+
+    def __str__(self) -> str:
+        lines = [
+            f"Expanded: {self.expanded}",
+            f"Generated: {self.generated}",
+            f"Duplicates: {self.duplicates}",
+            f"Reopened: {self.reopened}",
+            f"Heuristic calls: {self.heuristic_calls}",
+            f"Peak frontier size: {self.peak_frontier}",
+            f"Peak closed size: {self.peak_closed}",
+        ]
+        for name in self.wall_time:
+            lines.append(f"Time ({name}): {self.wall_time[name]:.4f}s wall, {self.cpu_time[name]:.4f}s CPU")
+        return '\n'.join(lines)
+
+# A decorator for search functions which adds the optional keyword argument "stats"
+# If stats is given, the whole call is timed as the "total" phase and stats is passed to the search function
+# Otherwise, the search function is called directly with stats=None so it skips all the bookkeeping
+def with_stats(search_fn: Callable) -> Callable:
+    @wraps(search_fn)
+    def search(*args, stats: Optional[SearchStats] = None, **kwargs):
+        if stats is None:
+            return search_fn(*args, stats=None, **kwargs)
+        with stats.phase("total"):
+            return search_fn(*args, stats=stats, **kwargs)
+    return search
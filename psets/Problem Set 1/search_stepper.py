@@ -0,0 +1,82 @@
+from typing import Any, Generic, Iterator, Optional
+import time
+
+from problem import HeuristicFunction, Problem, S, A, Solution
+from search_stats import SearchStats
+import search
+
+# SearchStepper runs a search step by step, where a step is the expansion of one state
+# It wraps a step generator from "search.py" (such as search.astar_steps) and allows:
+# - Expanding a given number of states with "step", then resuming later from where the search stopped
+# - Running with a budget on the number of expansions and/or a timeout (in seconds) with "run"
+# - Inspecting the current frontier (the algorithm's own container, which must not be modified) and the statistics
+# The timeout is cooperative: it is checked after every expansion, so no thread has to be interrupted
+#
+# Example:
+#   stepper = SearchStepper.create("astar", problem, problem.get_initial_state(), heuristic)
+#   while not stepper.run(timeout=0.1):
+#       print(stepper.expanded, "states expanded so far")
+#   print(stepper.solution)
+class SearchStepper(Generic[S, A]):
+    # The step generators that can be created by name with "SearchStepper.create"
+    ALGORITHMS = {
+        "bfs": search.breadth_first_steps,
+        "dfs": search.depth_first_steps,
+        "ucs": search.uniform_cost_steps,
+        "astar": search.astar_steps,
+        "gbfs": search.best_first_steps,
+        "idastar": search.iterative_deepening_astar_steps,
+        "wastar": search.weighted_astar_steps,
+        "bibfs": search.bidirectional_breadth_first_steps,
+        "biucs": search.bidirectional_uniform_cost_steps,
+        "biastar": search.bidirectional_astar_steps,
+    }
+
+    def __init__(self, steps: Iterator, stats: Optional[SearchStats] = None) -> None:
+        self.steps = steps
+        self.stats = stats      # The statistics filled by the step generator (if it was given one)
+        self.frontier: Any = None   # The frontier after the last expansion
+        self.expanded = 0       # The number of expansions done so far
+        self.done = False       # Whether the search finished
+        self.solution: Solution = None  # The solution once the search is done (None if there is no solution)
+
+    # Create a stepper for the algorithm with the given name (a key of ALGORITHMS)
+    # The heuristic is only needed by the informed algorithms, and extra keyword arguments (e.g. weight) are passed to the generator
+    @classmethod
+    def create(cls, algorithm: str, problem: Problem[S, A], initial_state: S, heuristic: Optional[HeuristicFunction] = None,
+               stats: Optional[SearchStats] = None, **kwargs) -> "SearchStepper[S, A]":
+        steps_fn = cls.ALGORITHMS[algorithm]
+        if heuristic is None:
+            return cls(steps_fn(problem, initial_state, stats=stats, **kwargs), stats)
+        return cls(steps_fn(problem, initial_state, heuristic, stats=stats, **kwargs), stats)
+
+    # Expand up to "count" states and return whether the search is done
+    def step(self, count: int = 1) -> bool:
+        return self.run(max_expansions=count)
+
+    # Run until the search is done, "max_expansions" states were expanded or "timeout" seconds passed
+    # Returns whether the search is done. If it is not, calling "step" or "run" again resumes the search
+    def run(self, max_expansions: Optional[int] = None, timeout: Optional[float] = None) -> bool:
+        if self.done:
+            return True
+        if self.stats is not None:
+            with self.stats.phase("total"):
+                return self._run(max_expansions, timeout)
+        return self._run(max_expansions, timeout)
+
+    def _run(self, max_expansions: Optional[int], timeout: Optional[float]) -> bool:
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        count = 0
+        try:
+            while max_expansions is None or count < max_expansions:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                self.frontier = next(self.steps)
+                count += 1
+        except StopIteration as stop:
+            self.done = True
+            self.solution = stop.value
+            self.frontier = None
+        finally:
+            self.expanded += count
+        return self.done
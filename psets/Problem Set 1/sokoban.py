@@ -1,8 +1,8 @@
 from dataclasses import dataclass
-from typing import FrozenSet, Iterable
+from typing import Callable, FrozenSet, Iterable, List, NamedTuple
 from enum import Enum
 
-from mathutils import Direction, Point
+from mathutils import Direction, Point, zobrist_key
 from problem import Problem
 from helpers.utils import track_call_count
 
@@ -26,26 +26,88 @@ class SokobanTile(str, Enum):
 # we only need the default equality which compares objects by pointers.
 # The layout contains the problem details that are unchangeable across states such as:
 #   The walkable area (locations without walls) and the locations of the goals
+# The walkable cells are also numbered once (row by row) so that a position can be stored as an integer index:
+#   cells[index] is the position of a cell and cell_indices[position] is its index
+# Since the layout is shared by every state, the moves are also precomputed once for every cell and direction (in the order of Direction):
+#   neighbors[index][direction] is the index of the adjacent cell in that direction (or -1 if it is a wall)
+#   pushes[index][direction] is the index of the cell after the adjacent one, where a crate would be pushed (or -1 if either is a wall)
+#   player_keys[index] and crate_keys[index] are the Zobrist keys of the player and of a crate in the cell
 @dataclass(eq=False, frozen=True)
 class SokobanLayout:
-    __slots__ = ("width", "height", "walkable", "goals")
+    __slots__ = ("width", "height", "walkable", "goals", "cells", "cell_indices", "neighbors", "pushes", "player_keys", "crate_keys")
     width: int
     height: int
     walkable: FrozenSet[Point]
     goals: FrozenSet[Point]
+    # The tables above are not dataclass fields since they are computed from the walkable area
+    # They are only declared in __slots__ since a class variable with the same name as a slot is not allowed
+
+    def __post_init__(self):
+        cells = tuple(sorted(self.walkable, key=lambda position: (position.y, position.x)))
+        cell_indices = {position: index for index, position in enumerate(cells)}
+        vectors = [direction.to_vector() for direction in Direction]
+        neighbors = tuple(tuple(cell_indices.get(cell + vector, -1) for vector in vectors) for cell in cells)
+        pushes = tuple(tuple(-1 if neighbor < 0 else neighbors[neighbor][direction] for direction, neighbor in enumerate(row))
+                       for row in neighbors)
+        object.__setattr__(self, "cells", cells)
+        object.__setattr__(self, "cell_indices", cell_indices)
+        object.__setattr__(self, "neighbors", neighbors)
+        object.__setattr__(self, "pushes", pushes)
+        object.__setattr__(self, "player_keys", tuple(player_key(cell) for cell in cells))
+        object.__setattr__(self, "crate_keys", tuple(crate_key(cell) for cell in cells))
+
+    # Frozen dataclasses with slots cannot be unpickled by assigning their fields,
+    # so we pickle the layout as a call to the constructor (needed to send layouts between processes)
+    def __reduce__(self):
+        return (SokobanLayout, (self.width, self.height, self.walkable, self.goals))
+
+# The Zobrist keys of the player and of a crate at a given position
+# The Zobrist hash of a state is the xor of the key of the player position and the keys of all the crate positions,
+# so a move only needs to xor out the old positions and xor in the new ones
+def player_key(position: Point) -> int:
+    return zobrist_key(0, position.x, position.y)
+
+def crate_key(position: Point) -> int:
+    return zobrist_key(1, position.x, position.y)
 
 # For the sokoban state, we use dataclass with frozen=True to automatically implement:
-#   the constructor, the == operator, the hash function and to make the class immutable
+#   the constructor, the == operator and to make the class immutable
 # Now it can be added to sets and used as keys in dictionaries
 # This will contain a reference to the sokoban layout and it will contain environment details that change across states such as:
 #   The player location and the locations of the crates 
+# The hash is the Zobrist hash of the state, which is computed once (or updated incrementally by SokobanProblem.get_successor)
+# and stored in the "hash_value" slot (which is not a dataclass field so it is ignored by the constructor and the == operator)
+# The == operator still compares the player and the crates, so two different states with the same hash are never confused
 @dataclass(frozen=True)
 class SokobanState:
-    __slots__ = ("layout", "player", "crates")
+    __slots__ = ("layout", "player", "crates", "hash_value")
     layout: SokobanLayout
     player: Point
     crates: FrozenSet[Point]
 
+    def __post_init__(self):
+        hash_value = player_key(self.player)
+        for crate in self.crates:
+            hash_value ^= crate_key(crate)
+        object.__setattr__(self, "hash_value", hash_value)
+
+    # Create a state whose hash is already known without recomputing it
+    @staticmethod
+    def with_hash(layout: SokobanLayout, player: Point, crates: FrozenSet[Point], hash_value: int) -> 'SokobanState':
+        state = object.__new__(SokobanState)
+        object.__setattr__(state, "layout", layout)
+        object.__setattr__(state, "player", player)
+        object.__setattr__(state, "crates", crates)
+        object.__setattr__(state, "hash_value", hash_value)
+        return state
+
+    def __hash__(self) -> int:
+        return self.hash_value
+
+    # Similar to the layout, the state is pickled as a call to the constructor
+    def __reduce__(self):
+        return (SokobanState, (self.layout, self.player, self.crates))
+
     # This operator will convert the state to a string containing the grid representation of the level at the current state
     def __str__(self) -> str:
         def position_to_str(position):
@@ -68,6 +130,9 @@ AllSokobanActions = [
     Direction.LEFT
 ]
 
+# The directions in the order of the Direction enum, which is the order of the actions and of the layout tables
+AllDirections = list(Direction)
+
 # This is the implementation of the sokoban problem
 class SokobanProblem(Problem[SokobanState, Direction]):
     # The problem will contain the sokoban layout and the inital state
@@ -81,41 +146,56 @@ class SokobanProblem(Problem[SokobanState, Direction]):
         return self.layout.goals == state.crates
 
     # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
+    # The moves are looked up in the tables of the layout instead of adding vectors to the player position
     @track_call_count
     def get_actions(self, state: SokobanState) -> Iterable[Direction]:
+        layout = self.layout
+        cells, crates = layout.cells, state.crates
+        index = layout.cell_indices[state.player]
         actions = []
-        for direction in Direction:
-            position = state.player + direction.to_vector()
+        for direction, neighbor, push in zip(AllDirections, layout.neighbors[index], layout.pushes[index]):
             # Disallow walking into walls
-            if position not in self.layout.walkable: continue
-            # Check if walking into a crate
-            if position in state.crates:
-                # make sure that the crate is not pushed into a wall or another crate
-                crate_position = position + direction.to_vector()
-                if crate_position not in self.layout.walkable or crate_position in state.crates:
-                    continue
+            if neighbor < 0: continue
+            # Check if walking into a crate and make sure that the crate is not pushed into a wall or another crate
+            if cells[neighbor] in crates and (push < 0 or cells[push] in crates):
+                continue
             actions.append(direction)
         return actions
 
     def get_successor(self, state: SokobanState, action: Direction) -> SokobanState:
-        player = state.player + action.to_vector()
-        crates = state.crates
-        if player not in self.layout.walkable:
+        layout = self.layout
+        cells, crates = layout.cells, state.crates
+        index = layout.cell_indices[state.player]
+        neighbor = layout.neighbors[index][action]
+        if neighbor < 0:
             # If we try to walk into a wall, then this action is wrong
             raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
+        player = cells[neighbor]
+        # The hash is updated incrementally since only the player and at most one crate move
+        hash_value = state.hash_value ^ layout.player_keys[index] ^ layout.player_keys[neighbor]
         if player in crates:
-            crate_position = player + action.to_vector()
-            if crate_position not in self.layout.walkable or crate_position in crates:
+            push = layout.pushes[index][action]
+            if push < 0 or cells[push] in crates:
                 # If we try to push a crate into a wall or another crate, then this action is wrong
                 raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
             # If we walk to a crate, we push it
-            crates = crates.symmetric_difference({player,crate_position})
-        return SokobanState(state.layout, player, crates)
+            crates = crates.symmetric_difference({player, cells[push]})
+            hash_value ^= layout.crate_keys[neighbor] ^ layout.crate_keys[push]
+        return SokobanState.with_hash(layout, player, crates, hash_value)
 
     def get_cost(self, state: SokobanState, action: Direction) -> float:
         # All actions have the same cost
         return 1
 
+    # A state is packed as a tuple of integers: the player coordinates followed by the sorted crate coordinates
+    # The layout is not included since it is the same for every state of the problem
+    def pack_state(self, state: SokobanState) -> tuple:
+        return (*state.player, *(coordinate for crate in sorted(map(tuple, state.crates)) for coordinate in crate))
+
+    def unpack_state(self, packed: tuple) -> SokobanState:
+        crates = frozenset(Point(packed[i], packed[i+1]) for i in range(2, len(packed), 2))
+        return SokobanState(self.layout, Point(packed[0], packed[1]), crates)
+
     # Read a sokoban problem from text containing a grid of tiles
     @staticmethod
     def from_text(text: str) -> 'SokobanProblem':
@@ -148,4 +228,112 @@ class SokobanProblem(Problem[SokobanState, Direction]):
     @staticmethod
     def from_file(path: str) -> 'SokobanProblem':
         with open(path, 'r') as f:
-            return SokobanProblem.from_text(f.read())
\ No newline at end of file
+            return SokobanProblem.from_text(f.read())
+
+# Return the indices of the set bits of a bitmask in increasing order
+def bit_indices(mask: int) -> List[int]:
+    indices = []
+    while mask:
+        lowest = mask & -mask
+        indices.append(lowest.bit_length() - 1)
+        mask ^= lowest
+    return indices
+
+# This is a compact sokoban state where positions are the cell indices of the layout:
+#   The player is the index of its cell and the crates are a bitmask where bit i is set if cell i contains a crate
+# We use a NamedTuple instead of a dataclass since it is a plain tuple, so it is much faster to create, hash and compare
+# The layout is compared by identity (like in SokobanState) so the comparison only depends on the player and the crates
+class SokobanBitboardState(NamedTuple):
+    layout: SokobanLayout
+    player: int
+    crates: int
+
+    # Convert a SokobanState to the compact representation
+    @staticmethod
+    def from_state(state: SokobanState) -> 'SokobanBitboardState':
+        cell_indices = state.layout.cell_indices
+        crates = 0
+        for crate in state.crates:
+            crates |= 1 << cell_indices[crate]
+        return SokobanBitboardState(state.layout, cell_indices[state.player], crates)
+
+    # Convert the state back to a SokobanState
+    def to_state(self) -> SokobanState:
+        cells = self.layout.cells
+        return SokobanState(self.layout, cells[self.player], frozenset(cells[index] for index in bit_indices(self.crates)))
+
+    # The state is printed exactly like a SokobanState
+    def __str__(self) -> str:
+        return str(self.to_state())
+
+# This is the sokoban problem working on compact states
+# It has the same actions (in the same order) and costs as SokobanProblem so every search returns the same solution,
+# but the positions are cell indices and the crates are tested with bit operations instead of looking up Points in sets
+class SokobanBitboardProblem(Problem[SokobanBitboardState, Direction]):
+    def __init__(self, problem: SokobanProblem) -> None:
+        super().__init__()
+        self.problem = problem
+        self.layout = problem.layout
+        self.initial_state = SokobanBitboardState.from_state(problem.initial_state)
+        self.goal_mask = SokobanBitboardState.from_state(SokobanState(self.layout, problem.initial_state.player, self.layout.goals)).crates
+
+    def get_initial_state(self) -> SokobanBitboardState:
+        return self.initial_state
+
+    def is_goal(self, state: SokobanBitboardState) -> bool:
+        return state.crates == self.goal_mask
+
+    # Like SokobanProblem, we use @track_call_count to count the number of explored nodes
+    @track_call_count
+    def get_actions(self, state: SokobanBitboardState) -> Iterable[Direction]:
+        actions = []
+        layout = self.layout
+        crates = state.crates
+        for direction, position, crate_position in zip(AllDirections, layout.neighbors[state.player], layout.pushes[state.player]):
+            # Disallow walking into walls
+            if position < 0: continue
+            # If walking into a crate, make sure that the crate is not pushed into a wall or another crate
+            if crates >> position & 1 and (crate_position < 0 or crates >> crate_position & 1):
+                continue
+            actions.append(direction)
+        return actions
+
+    def get_successor(self, state: SokobanBitboardState, action: Direction) -> SokobanBitboardState:
+        layout = self.layout
+        player = layout.neighbors[state.player][action]
+        crates = state.crates
+        if player < 0:
+            # If we try to walk into a wall, then this action is wrong
+            raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
+        if crates >> player & 1:
+            crate_position = layout.pushes[state.player][action]
+            if crate_position < 0 or crates >> crate_position & 1:
+                # If we try to push a crate into a wall or another crate, then this action is wrong
+                raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
+            # If we walk to a crate, we push it
+            crates ^= (1 << player) | (1 << crate_position)
+        return SokobanBitboardState(state.layout, player, crates)
+
+    def get_cost(self, state: SokobanBitboardState, action: Direction) -> float:
+        # All actions have the same cost
+        return 1
+
+    # The layout is the same for every state of the problem so a state is packed as (player, crates)
+    def pack_state(self, state: SokobanBitboardState) -> tuple:
+        return (state.player, state.crates)
+
+    def unpack_state(self, packed: tuple) -> SokobanBitboardState:
+        return SokobanBitboardState(self.layout, *packed)
+
+    # Adapt a heuristic written for SokobanProblem (such as strong_heuristic) to this problem
+    # It converts every state back to a SokobanState so it is only meant for heuristics that have no compact version
+    def adapt_heuristic(self, heuristic: Callable[[SokobanProblem, SokobanState], float]) -> Callable[['SokobanBitboardProblem', SokobanBitboardState], float]:
+        return lambda _, state: heuristic(self.problem, state.to_state())
+
+    @staticmethod
+    def from_text(text: str) -> 'SokobanBitboardProblem':
+        return SokobanBitboardProblem(SokobanProblem.from_text(text))
+
+    @staticmethod
+    def from_file(path: str) -> 'SokobanBitboardProblem':
+        return SokobanBitboardProblem(SokobanProblem.from_file(path))
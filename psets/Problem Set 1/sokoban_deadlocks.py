@@ -0,0 +1,158 @@
+from functools import lru_cache
+from typing import AbstractSet, Collection, FrozenSet, List, Optional, Set, Tuple
+
+from mathutils import Direction
+from sokoban import SokobanLayout
+
+# This file contains the deadlock analysis for Sokoban
+# A deadlock is a state from which the goal cannot be reached whatever the player does. We detect three kinds:
+#   1. Dead squares: cells from which a crate can never reach any goal (computed once per layout).
+#   2. Freeze deadlocks: crates that can never move again (blocked along both axes by walls or other frozen crates),
+#      where at least one of them is not on a goal.
+#   3. 2x2 blocks: 4 cells forming a square where every cell is a wall or a crate, with at least one crate not on a goal.
+#      This is a special case of a freeze deadlock, but it is much cheaper to check.
+# Every deadlock stays a deadlock after any action (the crates involved can never move, or only onto dead squares),
+# so returning infinity for deadlocked states keeps a consistent heuristic consistent.
+# All the functions work on cell indices of the layout (see SokobanLayout) and "crates" is a set of cell indices.
+#
+# Example:
+#   analysis = DeadlockAnalysis.of(layout)
+#   analysis.is_deadlocked({layout.cell_indices[crate] for crate in state.crates})
+
+# The pairs of opposite directions along each axis (horizontal then vertical)
+AXES = ((Direction.LEFT, Direction.RIGHT), (Direction.UP, Direction.DOWN))
+
+# Return the cell indices of the goals of a layout
+def goal_cells(layout: SokobanLayout) -> FrozenSet[int]:
+    return frozenset(layout.cell_indices[goal] for goal in layout.goals)
+
+# Return the dead squares of a layout: the cells from which no goal can be reached by pushing a crate
+# They are found by pulling a crate backwards from every goal: a crate at a cell can come from the adjacent cell in a direction
+# if the player could stand behind it, so the live cells are the cells reachable by these pulls
+def dead_squares(layout: SokobanLayout) -> FrozenSet[int]:
+    live = set(goal_cells(layout))
+    stack = list(live)
+    while stack:
+        cell = stack.pop()
+        for neighbor, behind in zip(layout.neighbors[cell], layout.pushes[cell]):
+            # The crate can be pushed from "neighbor" to "cell" if the player stands on "behind"
+            if neighbor >= 0 and behind >= 0 and neighbor not in live:
+                live.add(neighbor)
+                stack.append(neighbor)
+    return frozenset(range(len(layout.cells))) - live
+
+# Return the cells that are corners (walls on two adjacent sides) and not goals
+# This is the analysis that the heuristic used before the dead squares were computed, and it is kept as a baseline
+def corner_squares(layout: SokobanLayout) -> FrozenSet[int]:
+    goals = goal_cells(layout)
+    corners = set()
+    for cell, neighbors in enumerate(layout.neighbors):
+        horizontal = any(neighbors[direction] < 0 for direction in AXES[0])
+        vertical = any(neighbors[direction] < 0 for direction in AXES[1])
+        if horizontal and vertical and cell not in goals:
+            corners.add(cell)
+    return frozenset(corners)
+
+# Return the 2x2 squares that contain a cell, each one as the set of its other cells that are not walls
+# If the two sides of the cell in the square are walls, the diagonal cell does not matter so it is left out
+def block_squares(layout: SokobanLayout, cell: int) -> Tuple[FrozenSet[int], ...]:
+    neighbors = layout.neighbors
+    squares = []
+    for horizontal in AXES[0]:
+        for vertical in AXES[1]:
+            side, other_side = neighbors[cell][horizontal], neighbors[cell][vertical]
+            if side >= 0:
+                diagonal = neighbors[side][vertical]
+            elif other_side >= 0:
+                diagonal = neighbors[other_side][horizontal]
+            else:
+                diagonal = -1
+            squares.append(frozenset(square_cell for square_cell in (side, other_side, diagonal) if square_cell >= 0))
+    return tuple(squares)
+
+# The tables needed to check the deadlocks of the states of a layout. They are computed once per layout (see "of")
+class DeadlockAnalysis:
+    __slots__ = ("layout", "goals", "dead", "patterns", "axes", "squares")
+
+    # The dead squares can be replaced (e.g. by the corners only) and the freeze and 2x2 block patterns can be disabled
+    # to compare the analyses
+    def __init__(self, layout: SokobanLayout, dead: Optional[Collection[int]] = None, patterns: bool = True) -> None:
+        self.layout = layout
+        self.goals = goal_cells(layout)
+        self.dead = dead_squares(layout) if dead is None else frozenset(dead)
+        self.patterns = patterns
+        # For each cell, the two sides along each axis
+        self.axes = tuple(tuple((neighbors[first], neighbors[second]) for first, second in AXES) for neighbors in layout.neighbors)
+        # For each cell, the other cells of the 2x2 squares it belongs to
+        self.squares = tuple(block_squares(layout, cell) for cell in range(len(layout.cells)))
+
+    # Return the analysis of a layout (cached)
+    # The layouts are compared by identity (see SokobanLayout), so the cache is keyed on their walkable cells and goals instead:
+    # every parse of the same level shares one analysis, and the cache holds at most 16 analyses (with their layouts).
+    # The cell indices only depend on the walkable cells, so the analysis works on the states of every parse.
+    @staticmethod
+    def of(layout: SokobanLayout) -> "DeadlockAnalysis":
+        return cached_analysis(layout.width, layout.height, layout.walkable, layout.goals)
+
+    # Check if the crate at "cell" is frozen: it cannot be pushed along either axis
+    # A crate is blocked along an axis if there is a wall on either side, if both sides are dead squares
+    # or if there is a frozen crate on either side
+    # The crates on the current path of the check are treated as walls to avoid cycles (they are frozen if the check succeeds)
+    # The crates found to be frozen are appended to "frozen", and removed again if the check fails
+    def is_frozen(self, crates: AbstractSet[int], cell: int, path: Set[int], frozen: List[int]) -> bool:
+        dead = self.dead
+        path.add(cell)
+        size = len(frozen)
+        result = True
+        for first, second in self.axes[cell]:
+            if first < 0 or second < 0 or first in path or second in path: continue
+            if first in dead and second in dead: continue
+            if first in crates and self.is_frozen(crates, first, path, frozen): continue
+            if second in crates and self.is_frozen(crates, second, path, frozen): continue
+            result = False
+            break
+        path.remove(cell)
+        if result:
+            frozen.append(cell)
+        else:
+            del frozen[size:]
+        return result
+
+    # Check if the crate at "cell" is part of a freeze deadlock: it is frozen along with crates where at least one is not on a goal
+    def is_freeze_deadlock(self, crates: AbstractSet[int], cell: int) -> bool:
+        frozen = []
+        if not self.is_frozen(crates, cell, set(), frozen):
+            return False
+        goals = self.goals
+        return any(crate not in goals for crate in frozen)
+
+    # Check if the crate at "cell" is part of a 2x2 square of walls and crates where at least one crate is not on a goal
+    def is_block_deadlock(self, crates: AbstractSet[int], cell: int) -> bool:
+        goals = self.goals
+        for square in self.squares[cell]:
+            if square <= crates and (cell not in goals or not square <= goals):
+                return True
+        return False
+
+    # Check if the state is deadlocked after the crate at "cell" was moved (only the patterns around that crate are checked)
+    def is_deadlocked_after_push(self, crates: AbstractSet[int], cell: int) -> bool:
+        if cell in self.dead:
+            return True
+        if not self.patterns:
+            return False
+        return self.is_block_deadlock(crates, cell) or self.is_freeze_deadlock(crates, cell)
+
+    # Check if a state is deadlocked by checking every crate that is not on a goal
+    # (a deadlock always involves such a crate, since every crate on a goal is fine)
+    def is_deadlocked(self, crates: AbstractSet[int]) -> bool:
+        goals, dead = self.goals, self.dead
+        off_goal = [crate for crate in crates if crate not in goals]
+        if any(crate in dead for crate in off_goal):
+            return True
+        if not self.patterns:
+            return False
+        return any(self.is_block_deadlock(crates, crate) or self.is_freeze_deadlock(crates, crate) for crate in off_goal)
+
+@lru_cache(maxsize=16)
+def cached_analysis(width: int, height: int, walkable: FrozenSet, goals: FrozenSet) -> DeadlockAnalysis:
+    return DeadlockAnalysis(SokobanLayout(width, height, walkable, goals))
@@ -1,5 +1,7 @@
-from typing import Dict, FrozenSet, List
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+from problem import IncrementalHeuristic
 from sokoban import SokobanProblem, SokobanState
+from sokoban_deadlocks import DeadlockAnalysis
 from mathutils import Direction, Point, manhattan_distance
 
 # This heuristic returns the distance between the player and the nearest crate as an estimate for the path cost
@@ -21,73 +23,38 @@ import itertools
 # walkable: FrozenSet[Point]
 # goals: FrozenSet[Point]
 
-def is_unwalkable(p: Point, problem: SokobanProblem) -> bool:
+def calculate_dist(problem: SokobanProblem) -> Tuple[Tuple[float, ...], ...]:
     '''
-    Checks if a position is unwalkable (i.e., a deadlock position)
-    A position is unwalkable if it is a corner (i.e., has walls on two adjacent sides)
+    For each goal, perform a BFS to calculate the distance from every cell to that goal
+    Returns a table with a row per cell index which holds the distances of the cell to the goals
+    (in the order of the layout goals, infinite if a goal cannot be reached)
+    The cost matrix of a state is then made of the rows of its crates, without any per-entry lookup
     '''
-    directions = [
-        Direction.UP,
-        Direction.DOWN,
-        Direction.LEFT,
-        Direction.RIGHT
-    ]
-
-    # lambda function to check if a position is a wall
-    is_wall = lambda p: p not in problem.layout.walkable
-
-    # check for corner deadlock (UL, UR, DL, DR)
-    for i in range(2):
-        dir = p + directions[i].to_vector()
-        left = p + directions[2].to_vector()
-        right = p + directions[3].to_vector()
-        if is_wall(dir) and (is_wall(left) or is_wall(right)):
-            return True
-    return False
-
-def compute_deadlocks(problem: SokobanProblem) -> FrozenSet[Point]:
-    '''
-    Computes all deadlock positions in the sokoban layout
-    A deadlock position is a position where if a crate is pushed there, it can never be moved to a goal
-    '''
-    deadlocks = set()
     layout = problem.layout
-    for p in layout.walkable:
-        if p in layout.goals:
-            continue
-        if is_unwalkable(p, problem):
-            deadlocks.add(p)
-    return frozenset(deadlocks)
-
-
-def calculate_dist(problem: SokobanProblem) -> Dict[Point, Dict[Point, int]]:
-    '''
-    For each goal, perform a BFS to calculate the distance to all reachable points
-    Returns a dictionary mapping each goal to a dictionary of point distances
-    '''
-    goals = problem.layout.goals
-    layout = problem.layout
-    total_dist = dict()
-    for goal in goals:
-        queue = deque([(goal, 0)])
-        visited = set([goal])
-        dist = dict()
+    cell_count = len(layout.cells)
+    inf = float('inf')
+    columns = []
+    for goal in layout.goals:
+        # The BFS runs on the cell indices using the neighbor and push tables of the layout
+        start = layout.cell_indices[goal]
+        dist = [inf] * cell_count
+        dist[start] = 0
+        queue = deque([start])
         while queue:
-            current, cost = queue.popleft()
-            dist[current] = cost
-            for direction in Direction:
-                neighbor = current + direction.to_vector() # position of neighbor
-                push = neighbor + direction.to_vector() # position of push
-                if neighbor in layout.walkable and push in layout.walkable:
-                    if neighbor not in visited:
-                        visited.add(neighbor)
-                        queue.append((neighbor, cost + 1))
-        total_dist[goal] = dist
-    return total_dist
+            current = queue.popleft()
+            cost = dist[current] + 1
+            for neighbor, push in zip(layout.neighbors[current], layout.pushes[current]):
+                # neighbor is the index of the adjacent cell and push is the index of the cell after it (-1 for walls)
+                if neighbor >= 0 and push >= 0 and dist[neighbor] == inf:
+                    dist[neighbor] = cost
+                    queue.append(neighbor)
+        columns.append(dist)
+    return tuple(zip(*columns)) if columns else tuple(() for _ in range(cell_count))
 
 def minimum_iteration(matrix : List[List[float]]) -> float:
     '''
-    Finds the minimum value in each row and returns the sum of these minimums
+    Finds the minimum cost matching by trying every assignment of the rows to the columns
+    It takes O(n!) time so it is only used for tiny matrices (and as a reference to check the Hungarian algorithm against)
     '''
     workers = len(matrix)
     jobs = len(matrix[0]) if workers > 0 else 0
@@ -101,173 +68,192 @@ def minimum_iteration(matrix : List[List[float]]) -> float:
         return float('inf')
     return current_min
 
+def augment(matrix: List[List[float]], u: List[float], v: List[float], match: List[int], i: int) -> bool:
+    '''
+    Assigns the row i (1-indexed) with the shortest augmenting path of the Hungarian algorithm (a Dijkstra search over the reduced costs)
+    u and v are the potentials of the rows and columns (1-indexed, where column 0 is a dummy column)
+    and match[j] is the row assigned to column j (0 if none). They are all updated in place
+    Returns False if no free column can be reached with a finite cost
+    '''
+    jobs = len(v) - 1
+    inf = float('inf')
+    match[0] = i
+    j0 = 0
+    min_v = [inf] * (jobs + 1)
+    used = [False] * (jobs + 1)
+    way = [0] * (jobs + 1)
+    while True:
+        used[j0] = True
+        i0 = match[j0]
+        row = matrix[i0 - 1]
+        u_i0 = u[i0]
+        delta = inf
+        j1 = -1
+        for j in range(1, jobs + 1):
+            if not used[j]:
+                current = row[j - 1] - u_i0 - v[j]
+                if current < min_v[j]:
+                    min_v[j] = current
+                    way[j] = j0
+                if min_v[j] < delta:
+                    delta = min_v[j]
+                    j1 = j
+        if j1 < 0 or delta == inf:
+            return False
+        for j in range(jobs + 1):
+            if used[j]:
+                u[match[j]] += delta
+                v[j] -= delta
+            else:
+                min_v[j] -= delta
+        j0 = j1
+        if match[j0] == 0:
+            break
+    # Flip the assignments along the augmenting path
+    while j0:
+        j1 = way[j0]
+        match[j0] = match[j1]
+        j0 = j1
+    return True
 
-def strong_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
+def hungarian_assignment(matrix: List[List[float]]) -> Tuple[float, List[float], List[float], List[int]]:
     '''
-    This heuristic computes the minimum cost to move all crates to goals using the Hungarian Algorithm
-    It also checks for deadlocks and returns infinity if any crate is in a deadlock position
+    Implementation of the Hungarian Algorithm (Kuhn-Munkres) to find the minimum cost matching in O(n^2 m) time
+    Every row (crate) is assigned to a different column (goal), so the matrix must have at least as many columns as rows
+    Unreachable pairs have an infinite cost, and the cost is infinity if the rows cannot all be assigned to reachable columns
+    Returns the cost, the potentials of the rows and columns and the row assigned to each column (see augment)
     '''
+    workers = len(matrix)
+    jobs = len(matrix[0]) if workers > 0 else 0
+    u = [0.0] * (workers + 1)
+    v = [0.0] * (jobs + 1)
+    match = [0] * (jobs + 1)
+    for i in range(1, workers + 1):
+        if not augment(matrix, u, v, match, i):
+            return float('inf'), u, v, match
+    return sum(matrix[match[j] - 1][j - 1] for j in range(1, jobs + 1) if match[j]), u, v, match
+
+def hungarian(matrix: List[List[float]]) -> float:
+    return hungarian_assignment(matrix)[0]
+
+# Matrices with at most this many rows are solved by enumerating the assignments, which is faster than the Hungarian algorithm
+ENUMERATION_LIMIT = 3
+
+# Return the matrix of the distances from every crate (rows, given as cell indices) to every goal (columns),
+# infinite if the goal is unreachable. The rows are shared with the distance table so they must not be modified
+def crate_goal_matrix(problem: SokobanProblem, crates: Iterable[int]) -> List[Sequence[float]]:
+    dist = problem.cache()["dist"]
+    return [dist[crate] for crate in crates]
+
+# Compute the tables used by the strong heuristic once per problem and return the problem cache where they are stored
+def heuristic_tables(problem: SokobanProblem) -> Dict:
     cache = problem.cache()
     if "deadlocks" not in cache:
-        cache["deadlocks"] = compute_deadlocks(problem)
+        cache["deadlocks"] = DeadlockAnalysis.of(problem.layout)
     if "dist" not in cache:
         cache["dist"] = calculate_dist(problem)
-    
-    deadlocks = cache["deadlocks"]
-    dist = cache["dist"]
+    return cache
+
+def strong_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
+    '''
+    This heuristic computes the minimum cost to move all crates to goals using the Hungarian Algorithm
+    It also checks for deadlocks and returns infinity if any crate is in a dead square, frozen off a goal or in a 2x2 block
+    '''
+    deadlocks = heuristic_tables(problem)["deadlocks"]
 
     if problem.is_goal(state):
         return 0.0
     
-    if any(crate in deadlocks for crate in state.crates):
+    # Check for the dead squares, freeze and 2x2 block deadlocks (on the cell indices of the crates)
+    cell_indices = problem.layout.cell_indices
+    crates = [cell_indices[crate] for crate in state.crates]
+    if deadlocks.is_deadlocked(set(crates)):
         return float('inf')
 
-    crates = list(state.crates)
-    goals = list(problem.layout.goals)
-    crates_number = len(crates)
-    distances = [[1e9] * crates_number for _ in range(crates_number)]
+    # Use the Hungarian algorithm on the cost matrix to find the minimum sum
+    matrix = crate_goal_matrix(problem, crates)
+    if len(matrix) <= ENUMERATION_LIMIT:
+        return minimum_iteration(matrix)
+    return hungarian(matrix)
 
-    # Calculate the cost matrix
-    for i in range(crates_number):
-        crate = crates[i]
-        for j in range(crates_number):
-            goal = goals[j]
-            distances[i][j] = dist[goal].get(crate, 1e9)
-    
-    # Use the minimum iteration method to find the minimum sum
-    total_sum = minimum_iteration(distances)
-    return total_sum
 
+# The memo of the incremental strong heuristic: the optimal matching of a state
+# The matrix has a row per crate (rows maps the cell index of each crate to its 1-indexed row) and a column per goal,
+# padded with rows of zeros so that it is square and every goal is matched
+# With at most ENUMERATION_LIMIT crates, the matching is enumerated again instead of repaired, so only the value and rows are kept
+class Matching:
+    __slots__ = ("value", "rows", "matrix", "u", "v", "match")
 
-# ---------------- Unused Hungarian Algorithm Implementation ---------------- #
-
-def find_path(location: tuple, zero_matrix: List[List[int]]):
-    '''
-    Finds an augmenting path in the zero matrix
-    '''
-    path = [location]
-    while True:
-        # find starred zero in this column
-        row_star = [i for i in range(len(zero_matrix)) if zero_matrix[i][path[-1][1]] == 1]
-        if len(row_star) == 0:
-            break
-        else:
-            path.append((row_star[0], path[-1][1]))
-            col_prime = [j for j in range(len(zero_matrix[0])) if zero_matrix[path[-1][0]][j] == 2][0]
-            path.append((path[-1][0], col_prime))
-    return path
-
-def mark_zeroes(matrix: List[List[float]]):
-    '''
-    Marks the zeroes in the matrix and returns the number of rows and columns covered
-    '''
-    workers = len(matrix)
-    jobs = len(matrix[0]) if workers > 0 else 0
-    zero_matrix = [[0 for _ in range(jobs)] for _ in range(workers)]
-    rows_covered = [False] * workers
-    cols_covered = [False] * jobs
-    used_cols = [False] * jobs
-    
-    # For each row, find an arbitrary zero and mark it (I mark the first zero I find that still works within the constraints)
-    for i in range(workers):
-        for j in range(jobs):
-            if matrix[i][j] == 0 and not used_cols[j]:
-                zero_matrix[i][j] = 1  # Star the zero
-                used_cols[j] = True
-                break
-    
-    done = False
-    while not done:
-        # Cover columns containing a starred zero
-        for j in range(jobs):
-            if any(zero_matrix[i][j] == 1 for i in range(workers)):
-                cols_covered[j] = True
-        found = False
-        for i in range(workers):
-            for j in range(jobs):
-                if matrix[i][j] == 0 and not rows_covered[i] and not cols_covered[j]:
-                    zero_matrix[i][j] = 2  # Prime the zero
-                    found_starred = False
-                    # Check if there is a starred zero in the same row
-                    for col in range(jobs):
-                        if zero_matrix[i][col] == 1:
-                            rows_covered[i] = True
-                            cols_covered[col] = False
-                            found_starred = True
-                            break
-                    if not found_starred:
-                        path = find_path((i, j), zero_matrix)
-                        # For all zeros in the path, unstar starred zeros and star primed zeros
-                        for r, c in path:
-                            zero_matrix[r][c] = zero_matrix[r][c] - 1
-                    # Clear all covers and erase all primes
-                    rows_covered = [False] * workers
-                    cols_covered = [False] * jobs
-                    for r in range(workers):
-                        for c in range(jobs):
-                            if zero_matrix[r][c] == 2:
-                                zero_matrix[r][c] = 0
-                    found = True
-        done = not found
-    
-    num_covered = sum(cols_covered) + sum(rows_covered)
-    return num_covered, zero_matrix, rows_covered, cols_covered
+    def __init__(self, value: float, rows: Dict[int, int], matrix: Optional[List[Sequence[float]]] = None,
+                 u: Optional[List[float]] = None, v: Optional[List[float]] = None, match: Optional[List[int]] = None) -> None:
+        self.value = value
+        self.rows = rows
+        self.matrix = matrix
+        self.u = u
+        self.v = v
+        self.match = match
 
-def kuhn_munkres(matrix : List[List[float]]) -> float:
+class IncrementalStrongHeuristic(IncrementalHeuristic[SokobanState, Direction]):
     '''
-    Implementation of the Hungarian Algorithm (Kuhn-Munkres) to find the minimum cost matching
+    This heuristic has the same values as strong_heuristic but it repairs the matching of the parent state instead of solving it again
+    A successor moves at most one crate, so only the row of that crate changes: the crate is unassigned, its row potential is lowered
+    to keep the potentials feasible, and a single augmenting path assigns it again in O(n^2) time
+    The moved crate is found from the action (the player steps onto it), so the other crates are never compared
+    The deadlock checks of a successor only look at the patterns around the moved crate (the full scan is only done by evaluate)
+    Like strong_heuristic, the matchings of at most ENUMERATION_LIMIT crates are enumerated, which is faster than the repair
     '''
-    workers = len(matrix)
-    jobs = len(matrix[0]) if workers > 0 else 0
-    original = [row[:] for row in matrix]
-    
-    # Step 1: Minimization of rows
-    for i in range(workers):
-        row_min = min(matrix[i])
-        for j in range(jobs):
-            if matrix[i][j] < 1e9:
-                matrix[i][j] -= row_min
-    
-    # Step 2: Minimization of columns
-    for j in range(jobs):
-        col_min = min(matrix[i][j] for i in range(workers))
-        for i in range(workers):
-            if matrix[i][j] < 1e9:
-                matrix[i][j] -= col_min
-    
-    # Step 3: Cover zeros with minimum number of lines
-    done = False
-    while not done:
-        num_covered, zero_matrix, rows_covered, cols_covered = mark_zeroes(matrix)
-        
-        if num_covered == min(workers, jobs):
-            done = True
-        else:
-            uncovered_values = [matrix[i][j] for i in range(workers) for j in range(jobs) 
-                              if not rows_covered[i] and not cols_covered[j]]
-            
-            if uncovered_values:
-                min_uncovered = min(uncovered_values)
-                for i in range(workers):
-                    for j in range(jobs):
-                        if not rows_covered[i]:
-                            matrix[i][j] -= min_uncovered
-                        if cols_covered[j]:
-                            matrix[i][j] += min_uncovered
-            else:
-                done = True
-                
-    # Calculate the total cost based on the original matrix
-    total_cost = 0.0
-    for i in range(workers):
-        for j in range(jobs):
-            if zero_matrix[i][j] == 1:  # Find the starred zeros
-                total_cost += original[i][j]
+    def evaluate(self, problem: SokobanProblem, state: SokobanState) -> Tuple[float, Optional[Matching]]:
+        cache = heuristic_tables(problem)
+        cell_indices = problem.layout.cell_indices
+        crates = [cell_indices[crate] for crate in state.crates]
+        if cache["deadlocks"].is_deadlocked(set(crates)):
+            return float('inf'), None
+        rows = {crate: row for row, crate in enumerate(crates, 1)}
+        matrix = crate_goal_matrix(problem, crates)
+        if len(crates) <= ENUMERATION_LIMIT:
+            value = minimum_iteration(matrix)
+            return value, (None if value == float('inf') else Matching(value, rows))
+        columns = len(problem.layout.goals)
+        matrix += [[0] * columns for _ in range(columns - len(crates))]
+        value, u, v, match = hungarian_assignment(matrix)
+        if value == float('inf'):
+            return value, None
+        return value, Matching(value, rows, matrix, u, v, match)
 
-    # Return infinity if cost is too high
-    if total_cost >= 1e9:
-        return float('inf')
-        
-    return total_cost
-# -------------------------------------------------------------------------- #
+    def update(self, problem: SokobanProblem, state: SokobanState, memo: Optional[Matching],
+               action: Direction, successor: SokobanState) -> Tuple[float, Optional[Matching]]:
+        inf = float('inf')
+        # A deadlocked state (or one where the crates cannot all reach goals) stays so after any action
+        if memo is None:
+            return inf, None
+        # If the player did not step onto a crate, no crate was pushed and the matching does not change
+        if successor.player not in state.crates:
+            return memo.value, memo
+        cache = heuristic_tables(problem)
+        layout = problem.layout
+        old = layout.cell_indices[successor.player]
+        new = layout.neighbors[old][action]
+        # Copy the parent's rows, replacing the row of the moved crate
+        rows = dict(memo.rows)
+        row = rows.pop(old)
+        rows[new] = row
+        # The parent is not deadlocked, so only the patterns around the moved crate are checked (the keys of rows are the crate cells)
+        if cache["deadlocks"].is_deadlocked_after_push(rows.keys(), new):
+            return inf, None
+        if memo.matrix is None:
+            value = minimum_iteration(crate_goal_matrix(problem, rows))
+            return value, (None if value == inf else Matching(value, rows))
+        costs = cache["dist"][new]
+        matrix = memo.matrix[:]
+        matrix[row - 1] = costs
+        u, v, match = memo.u[:], memo.v[:], memo.match[:]
+        match[match.index(row, 1)] = 0
+        # The lowest row potential such that no reduced cost of the row is negative
+        u[row] = min(cost - v[j] for j, cost in enumerate(costs, 1))
+        if u[row] == inf or not augment(matrix, u, v, match, row):
+            return inf, None
+        value = sum(matrix[match[j] - 1][j - 1] for j in range(1, len(match)))
+        return value, Matching(value, rows, matrix, u, v, match)
 
+# The instance to pass to the search functions (A* detects that it is incremental, the others call it as a plain heuristic)
+incremental_strong_heuristic = IncrementalStrongHeuristic()
@@ -0,0 +1,106 @@
+from typing import IO, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+import re
+
+from sokoban import SokobanProblem, SokobanTile
+
+# This file contains a loader for level packs: files that contain many Sokoban levels, in the XSB or SOK formats
+# - The levels are separated by lines that are not board rows (empty lines, comments starting with ';', "Title: ..." lines, etc.)
+# - The board rows may use '-' or '_' for floors, 'p'/'P' for the player (on a goal) and 'b'/'B' for crates (on goals)
+# - In the SOK format, a row can be run-length encoded ("4#" is "####") and '|' separates rows written on the same line
+# Unlike the level files read by SokobanProblem.from_file, the rows of a pack keep their leading spaces (which are outside the level),
+# so every cell that the player cannot reach through floors is turned into a wall before the level is parsed.
+# The packs are read line by line and the levels are yielded one at a time, so a large pack is never loaded at once.
+#
+# Example:
+#   for level in read_pack("levels.xsb"):
+#       problem = level.to_problem()
+
+# A level of a pack. "index" is its 1-based position in the pack, "title" is the value of its "Title:" line (if any)
+# and "board" holds its decoded rows. The board is only checked when it is converted to text, so that an invalid level
+# does not stop reading the rest of the pack
+class PackLevel(NamedTuple):
+    pack: str
+    index: int
+    title: Optional[str]
+    board: Tuple[str, ...]
+
+    @property
+    def name(self) -> str:
+        return f"{self.pack}#{self.index}"
+
+    @property
+    def text(self) -> str:
+        return normalize_board(self.board)
+
+    def to_problem(self) -> SokobanProblem:
+        return SokobanProblem.from_text(self.text)
+
+# The characters that the formats use for each tile, other than the ones of SokobanTile
+TILE_ALIASES = str.maketrans({'-': ' ', '_': ' ', 'p': '@', 'P': '+', 'b': '$', 'B': '*'})
+BOARD_ROW = re.compile(r"^[ #@+$*.\-_pPbB0-9|]*#[ #@+$*.\-_pPbB0-9|]*$")
+RUN_LENGTH = re.compile(r"(\d+)(.)")
+
+# Check if a line is (or contains) a row of a board
+def is_board_row(line: str) -> bool:
+    return BOARD_ROW.match(line) is not None
+
+# Decode a line of board rows: expand the run-lengths, split the rows separated by '|' and replace the aliases
+def decode_rows(line: str) -> List[str]:
+    line = RUN_LENGTH.sub(lambda match: match.group(2) * int(match.group(1)), line)
+    return [row.translate(TILE_ALIASES) for row in line.split('|')]
+
+# Convert the rows of a board into the text format read by SokobanProblem.from_text
+# Every cell that cannot be reached from the player without crossing a wall is replaced by a wall
+def normalize_board(rows: Sequence[str]) -> str:
+    width = max(len(row) for row in rows)
+    grid = [list(row.ljust(width)) for row in rows]
+    players = [(x, y) for y, row in enumerate(grid) for x, tile in enumerate(row)
+               if tile in (SokobanTile.PLAYER, SokobanTile.PLAYER_ON_GOAL)]
+    if len(players) != 1:
+        raise ValueError(f"A level must have exactly one player (found {len(players)})")
+    inside = {players[0]}
+    stack = [players[0]]
+    while stack:
+        x, y = stack.pop()
+        for neighbor_x, neighbor_y in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if 0 <= neighbor_y < len(grid) and 0 <= neighbor_x < width and (neighbor_x, neighbor_y) not in inside \
+                    and grid[neighbor_y][neighbor_x] != SokobanTile.WALL:
+                inside.add((neighbor_x, neighbor_y))
+                stack.append((neighbor_x, neighbor_y))
+    for y, row in enumerate(grid):
+        for x, tile in enumerate(row):
+            if (x, y) not in inside:
+                if tile not in (SokobanTile.WALL, SokobanTile.EMPTY):
+                    raise ValueError(f"The tile '{tile}' at ({x}, {y}) cannot be reached by the player")
+                row[x] = SokobanTile.WALL
+    return '\n'.join(''.join(row) for row in grid)
+
+# Read the levels of a pack from an iterable of lines (such as an open file)
+# The metadata of a level (such as its title) comes after its board, so a level is only yielded once the next board starts
+def parse_pack(lines: Iterable[str], pack: str = "") -> Iterator[PackLevel]:
+    index = 0
+    board: List[str] = []   # The rows of the current level
+    complete = False        # Whether the board of the current level ended (and we are reading its metadata)
+    title: Optional[str] = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.strip() and is_board_row(line):
+            if complete:
+                index += 1
+                yield PackLevel(pack, index, title, tuple(board))
+                board, complete, title = [], False, None
+            board.extend(decode_rows(line))
+        elif board:
+            complete = True
+            if line.lower().startswith("title:"):
+                title = line[len("title:"):].strip()
+    if board:
+        yield PackLevel(pack, index + 1, title, tuple(board))
+
+# Read the levels of a pack file (or of an already open file)
+def read_pack(file: Union[str, IO[str]]) -> Iterator[PackLevel]:
+    if isinstance(file, str):
+        with open(file) as opened:
+            yield from parse_pack(opened, file)
+    else:
+        yield from parse_pack(file, getattr(file, "name", ""))
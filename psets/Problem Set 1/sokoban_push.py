@@ -0,0 +1,151 @@
+from collections import deque
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from mathutils import Direction
+from problem import Problem
+from sokoban import AllDirections, SokobanBitboardProblem, SokobanBitboardState, SokobanProblem, SokobanState, bit_indices
+from sokoban_deadlocks import DeadlockAnalysis
+from helpers.utils import track_call_count
+
+# This file contains a push-level formulation of the Sokoban problem
+# In SokobanProblem, every single step of the player is an action, so most states only differ in where the player stands.
+# Here, an action is a crate push and the player walks freely between pushes, so:
+#   - A state is the crates and the region that the player can reach without pushing a crate.
+#     The region is represented by its top-left cell (the reachable cell with the lowest index in the layout),
+#     so states that only differ by the position of the player within the same region are equal.
+#   - An action is (crate cell index, direction) which walks the player behind the crate then pushes it once.
+#   - Every push costs 1, so the optimal solutions minimize the number of pushes (not the number of moves).
+# States are SokobanBitboardState where the player is the top-left reachable cell.
+# Once a solution is found, "to_moves" expands the pushes back into player moves (Directions) that can be played in SokobanProblem.
+# By default, the pushes that lead to a deadlock (see sokoban_deadlocks.py) are not returned by get_actions.
+# Only the patterns around the pushed crate are checked, since the state before the push was not deadlocked.
+
+PushAction = Tuple[int, Direction]
+
+class SokobanPushProblem(Problem[SokobanBitboardState, PushAction]):
+    # The initial state defaults to the initial state of the problem
+    def __init__(self, problem: SokobanProblem, initial_state: Optional[SokobanState] = None, prune_deadlocks: bool = True) -> None:
+        super().__init__()
+        self.problem = problem
+        self.bitboard = SokobanBitboardProblem(problem)
+        self.layout = problem.layout
+        self.deadlocks = DeadlockAnalysis.of(self.layout) if prune_deadlocks else None
+        self.moves = self.layout.neighbors
+        self.directions = AllDirections
+        self.goal_mask = self.bitboard.goal_mask
+        self.start = SokobanBitboardState.from_state(initial_state or problem.get_initial_state())
+        self.initial_state = self.normalize(self.start.player, self.start.crates)
+
+    # Return the bitmask of the cells reachable by the player from the given cell without pushing a crate
+    def reachable(self, player: int, crates: int) -> int:
+        moves = self.moves
+        region = 1 << player
+        stack = [player]
+        while stack:
+            for neighbor in moves[stack.pop()]:
+                if neighbor >= 0 and not (region | crates) >> neighbor & 1:
+                    region |= 1 << neighbor
+                    stack.append(neighbor)
+        return region
+
+    # Return the state where the player is replaced by the top-left cell of its reachable region
+    def normalize(self, player: int, crates: int) -> SokobanBitboardState:
+        region = self.reachable(player, crates)
+        return SokobanBitboardState(self.layout, (region & -region).bit_length() - 1, crates)
+
+    def get_initial_state(self) -> SokobanBitboardState:
+        return self.initial_state
+
+    def is_goal(self, state: SokobanBitboardState) -> bool:
+        return state.crates == self.goal_mask
+
+    # A crate can be pushed in a direction if the player can reach the cell behind it and the cell in front of it is free
+    # (and if the push does not lead to a deadlock when they are pruned)
+    # We use @track_call_count to count the number of explored nodes
+    @track_call_count
+    def get_actions(self, state: SokobanBitboardState) -> Iterable[PushAction]:
+        moves = self.moves
+        crates = state.crates
+        region = self.reachable(state.player, crates)
+        deadlocks = self.deadlocks
+        crate_cells = set(bit_indices(crates)) if deadlocks is not None else None
+        actions = []
+        for crate in bit_indices(crates):
+            neighbors = moves[crate]
+            for direction in self.directions:
+                behind, target = neighbors[direction.rotate(2)], neighbors[direction]
+                if behind >= 0 and region >> behind & 1 and target >= 0 and not crates >> target & 1:
+                    if deadlocks is not None:
+                        # Move the crate in the set of crate cells, check the patterns around it, then move it back
+                        crate_cells.remove(crate)
+                        crate_cells.add(target)
+                        deadlocked = deadlocks.is_deadlocked_after_push(crate_cells, target)
+                        crate_cells.remove(target)
+                        crate_cells.add(crate)
+                        if deadlocked: continue
+                    actions.append((crate, direction))
+        return actions
+
+    def get_successor(self, state: SokobanBitboardState, action: PushAction) -> SokobanBitboardState:
+        crate, direction = action
+        target = self.moves[crate][direction]
+        # After the push, the player stands where the crate was
+        return self.normalize(crate, state.crates ^ (1 << crate) ^ (1 << target))
+
+    def get_cost(self, state: SokobanBitboardState, action: PushAction) -> float:
+        # All pushes have the same cost
+        return 1
+
+    def pack_state(self, state: SokobanBitboardState) -> tuple:
+        return (state.player, state.crates)
+
+    def unpack_state(self, packed: tuple) -> SokobanBitboardState:
+        return SokobanBitboardState(self.layout, *packed)
+
+    # Return the shortest list of moves that walks the player from a cell to another without pushing a crate
+    def walk(self, player: int, target: int, crates: int) -> List[Direction]:
+        moves = self.moves
+        parents = {player: None}
+        queue = deque([player])
+        while queue:
+            cell = queue.popleft()
+            if cell == target:
+                break
+            for direction, neighbor in zip(self.directions, moves[cell]):
+                if neighbor >= 0 and not crates >> neighbor & 1 and neighbor not in parents:
+                    parents[neighbor] = (cell, direction)
+                    queue.append(neighbor)
+        path = []
+        cell = target
+        while parents[cell] is not None:
+            cell, direction = parents[cell]
+            path.append(direction)
+        path.reverse()
+        return path
+
+    # Expand a list of pushes (from the initial state) into the player moves that perform them
+    def to_moves(self, pushes: List[PushAction]) -> List[Direction]:
+        player, crates = self.start.player, self.start.crates
+        path = []
+        for crate, direction in pushes:
+            path.extend(self.walk(player, self.moves[crate][direction.rotate(2)], crates))
+            path.append(direction)
+            crates ^= (1 << crate) ^ (1 << self.moves[crate][direction])
+            player = crate
+        return path
+
+    # Adapt a heuristic written for SokobanProblem (such as strong_heuristic) to this problem
+    # The heuristic must estimate the number of pushes to be admissible here (strong_heuristic does, weak_heuristic does not)
+    def adapt_heuristic(self, heuristic: Callable[[SokobanProblem, SokobanState], float]) -> Callable[['SokobanPushProblem', SokobanBitboardState], float]:
+        return lambda _, state: heuristic(self.problem, state.to_state())
+
+# Wrap a search function for SokobanProblem so that it searches over pushes and returns the solution as player moves
+# If a heuristic is given (as the first argument after the state), it is adapted to the push states
+def push_search(search_fn: Callable) -> Callable:
+    def search(problem: SokobanProblem, state: SokobanState, *args, **kwargs):
+        push_problem = SokobanPushProblem(problem, state)
+        if args:
+            args = (push_problem.adapt_heuristic(args[0]),) + args[1:]
+        pushes = search_fn(push_problem, push_problem.get_initial_state(), *args, **kwargs)
+        return None if pushes is None else push_problem.to_moves(pushes)
+    return search
@@ -0,0 +1,135 @@
+from dataclasses import asdict, dataclass
+from functools import partial
+from typing import Iterator, List, Optional, Tuple
+import argparse, csv, multiprocessing as mp, os, resource, time, traceback
+
+from problem import Solution
+from search_stats import SearchStats
+from sokoban_pack import PackLevel, read_pack
+
+# This file solves all the levels of one or more level packs (see sokoban_pack.py) with a pool of worker processes
+# - Each level runs in a fresh worker process, so the peak memory (RSS) reported for a level only counts that level
+# - The time limit is checked by the search after every expansion (see search_stepper.py)
+# - The memory limit caps the address space of the worker, so an allocation beyond it raises a MemoryError in the search
+# The results are printed as a table once all the levels are done, and can also be written to a CSV file
+#
+# Example:
+#   python solve_pack.py packs/microban.xsb -a astar -hf strong -w 4 -t 10 -m 2048 -o results.csv
+
+# The result of a level. The status is "solved", "unsolvable", "timeout", "memory" (the memory limit was reached) or "failed"
+@dataclass
+class LevelResult:
+    pack: str
+    index: int
+    title: Optional[str]
+    status: str
+    solution: str = ""
+    length: int = 0         # The number of moves of the solution
+    expanded: int = 0
+    time: float = 0.0       # The time spent on the level in the worker (in seconds)
+    peak_rss: float = 0.0   # The peak resident memory of the worker (in MB)
+    error: str = ""
+
+# Return the peak resident memory of the current process in MB (ru_maxrss is in KB on Linux and in bytes on macOS)
+def peak_rss() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+# Search for the solution of a level
+# Returns whether the search was done before the time limit and the solution as player moves (None if there is no solution)
+def search_level(level: PackLevel, args: argparse.Namespace, stats: SearchStats) -> Tuple[bool, Solution]:
+    from problems import get_heuristic
+    from search_stepper import SearchStepper
+    from sokoban_push import SokobanPushProblem
+    problem = level.to_problem()
+    target = SokobanPushProblem(problem) if args.pushes else problem
+    heuristic = None
+    if args.algorithm in ("astar", "gbfs", "idastar", "wastar"):
+        heuristic = get_heuristic(args.heuristic)
+        if args.pushes: heuristic = target.adapt_heuristic(heuristic)
+    stepper = SearchStepper.create(args.algorithm, target, target.get_initial_state(), heuristic, stats=stats)
+    if not stepper.run(timeout=args.time_limit):
+        return False, None
+    solution = stepper.solution
+    if solution is not None and args.pushes:
+        solution = target.to_moves(solution)
+    return True, solution
+
+# Solve a single level (in a worker process)
+def solve_level(level: PackLevel, args: argparse.Namespace) -> LevelResult:
+    if args.memory_limit:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (args.memory_limit * 1024 * 1024, hard))
+    start = time.perf_counter()
+    stats = SearchStats()
+    status, error = "failed", ""
+    try:
+        done, solution = search_level(level, args, stats)
+        elapsed = time.perf_counter() - start
+        if not done or solution is None:
+            status = "timeout" if not done else "unsolvable"
+            return LevelResult(level.pack, level.index, level.title, status, expanded=stats.expanded, time=elapsed, peak_rss=peak_rss())
+        return LevelResult(level.pack, level.index, level.title, "solved", ''.join(str(action) for action in solution),
+                           len(solution), stats.expanded, elapsed, peak_rss())
+    except MemoryError:
+        status = "memory"
+    except Exception:
+        error = traceback.format_exc()
+    # The result is only built after leaving the "except" block, which releases the traceback and the search it references
+    return LevelResult(level.pack, level.index, level.title, status, expanded=stats.expanded, time=time.perf_counter() - start,
+                       peak_rss=peak_rss(), error=error)
+
+# Read the levels of all the packs one after the other
+def read_packs(paths: List[str]) -> Iterator[PackLevel]:
+    for path in paths:
+        yield from read_pack(path)
+
+def main(args: argparse.Namespace):
+    from problems import print_table
+    # We prefer fork (on Linux) since the workers inherit the imported modules
+    context = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+    results: List[LevelResult] = []
+    start = time.perf_counter()
+    # maxtasksperchild=1 starts a new worker for every level, so that the memory of a level is not reused (or counted) by the next
+    with context.Pool(args.workers, maxtasksperchild=1) as pool:
+        for result in pool.imap_unordered(partial(solve_level, args=args), read_packs(args.packs)):
+            results.append(result)
+            print(f"[{len(results)}] {result.pack}#{result.index}: {result.status} ({result.time:.2f}s)", flush=True)
+            if result.error and args.verbose:
+                print(result.error)
+    elapsed = time.perf_counter() - start
+    # Sort the results by pack (in the given order) then by level index
+    order = {path: index for index, path in enumerate(args.packs)}
+    results.sort(key=lambda result: (order[result.pack], result.index))
+    print()
+    print_table(["Level", "Title", "Status", "Length", "Expanded", "Time (s)", "Peak RSS (MB)", "Solution"], [
+        [f"{result.pack}#{result.index}", result.title or "", result.status, result.length, result.expanded,
+         f"{result.time:.3f}", f"{result.peak_rss:.1f}", result.solution]
+        for result in results
+    ])
+    solved = sum(result.status == "solved" for result in results)
+    print(f"\nSolved {solved}/{len(results)} levels in {elapsed:.2f}s with {args.workers} workers")
+    if args.output:
+        with open(args.output, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(LevelResult.__dataclass_fields__))
+            writer.writeheader()
+            for result in results:
+                writer.writerow(asdict(result))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve all the levels of Sokoban level packs (XSB or SOK files)")
+    parser.add_argument("packs", nargs="+", help="paths to the level packs")
+    parser.add_argument("--algorithm", "-a", default="astar",
+                        choices=["bfs", "dfs", "ucs", "astar", "gbfs", "idastar", "wastar"],
+                        help="the search algorithm (the bidirectional searches need a reversible problem, which Sokoban is not)")
+    parser.add_argument("--heuristic", "-hf", default="strong", choices=["zero", "weak", "strong", "pattern", "incremental_strong"],
+                        help="the heuristic used by the informed search algorithms")
+    parser.add_argument("--pushes", "-p", action="store_true", default=False,
+                        help="search over crate pushes instead of single player steps (minimizes the number of pushes)")
+    parser.add_argument("--workers", "-w", type=int, default=os.cpu_count(), help="the number of worker processes")
+    parser.add_argument("--time-limit", "-t", type=float, default=60.0, help="the time limit of each level (in seconds)")
+    parser.add_argument("--memory-limit", "-m", type=int, default=0,
+                        help="the address space limit of each worker (in MB, 0 for no limit)")
+    parser.add_argument("--output", "-o", help="write the results to this CSV file")
+    parser.add_argument("--verbose", "-v", action="store_true", default=False, help="print the errors of the failed levels")
+    main(parser.parse_args())